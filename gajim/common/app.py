@@ -27,6 +27,7 @@
 import sys
 import weakref
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from gi.repository import Gdk
 from gi.repository import GLib
@@ -46,6 +47,7 @@
     from gajim.common.call_manager import CallManager
     from gajim.common.cert_store import CertificateStore
     from gajim.common.commands import ChatCommands  # noqa: F401
+    from gajim.common.disk_cache import DiskCacheManager
     from gajim.common.preview import PreviewManager
     from gajim.common.storage.archive.storage import MessageArchiveStorage
     from gajim.common.storage.cache import CacheStorage
@@ -102,6 +104,8 @@ def __init__(self):
 
 call_manager = cast('CallManager', None)
 
+disk_cache = cast('DiskCacheManager', None)
+
 preview_manager = cast('PreviewManager', None)
 
 task_manager = cast('TaskManager', None)
@@ -130,6 +134,11 @@ def __init__(self):
 
 _tasks: dict[int, list[Any]] = defaultdict(list)
 
+# Disk and CPU bound work like encrypting files runs in this shared pool,
+# so it never starts an unbounded number of threads
+MAX_WORKER_THREADS = min(4, os.cpu_count() or 1)
+_thread_pool: ThreadPoolExecutor | None = None
+
 
 def print_version() -> None:
     log('gajim').info('Gajim Version: %s', gajim.__version__)
@@ -540,10 +549,28 @@ def get_stored_bob_data(algo_hash: str) -> bytes | None:
         if filepath.exists():
             with open(str(filepath), 'r+b') as file:
                 data = file.read()
+            disk_cache.record_access(filepath)
             return data
     return None
 
 
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool  # pylint: disable=global-statement
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=MAX_WORKER_THREADS, thread_name_prefix='gajim-worker')
+    return _thread_pool
+
+
+def shutdown_thread_pool() -> None:
+    global _thread_pool  # pylint: disable=global-statement
+    if _thread_pool is None:
+        return
+
+    _thread_pool.shutdown(wait=False, cancel_futures=True)
+    _thread_pool = None
+
+
 def register_task(self, task):
     _tasks[id(self)].append(task)
 
@@ -83,6 +83,7 @@ def _init_core(self) -> bool:
 
             app.storage.archive = MessageArchiveStorage()
             app.storage.archive.init()
+            app.storage.archive.schedule_maintenance()
         except Exception as error:
             app.ged.raise_event(DBMigrationError(exception=error))
             log.exception('Failed to init storage')
@@ -96,6 +97,9 @@ def _init_core(self) -> bool:
         from gajim.common.call_manager import CallManager
         app.call_manager = CallManager()
 
+        from gajim.common.disk_cache import DiskCacheManager
+        app.disk_cache = DiskCacheManager()
+
         from gajim.common.preview import PreviewManager
         app.preview_manager = PreviewManager()
 
@@ -244,10 +248,10 @@ def _on_disconnect(event: AccountDisconnected) -> None:
 
     def _shutdown_core(self) -> None:
         # Commit any outstanding SQL transactions
-        app.storage.archive.cleanup_chat_history()
         app.storage.cache.shutdown()
         app.storage.archive.shutdown()
         app.settings.shutdown()
+        app.shutdown_thread_pool()
         self.end_profiling()
         logind.shutdown()
 
@@ -27,6 +27,11 @@
 
 MAX_MESSAGE_CORRECTION_DELAY = 300
 
+# XEP-0047: The largest block size is proposed for in-band bytestreams,
+# smaller ones are used if the peer does not accept it
+IBB_MAX_BLOCK_SIZE = 65535
+IBB_MIN_BLOCK_SIZE = 4096
+
 
 class EncryptionInfoMsg(Enum):
     BAD_OMEMO_CONFIG = _('This chat’s configuration is unsuitable for '
@@ -0,0 +1,266 @@
+# This file is part of Gajim.
+#
+# SPDX-License-Identifier: GPL-3.0-only
+
+from __future__ import annotations
+
+from typing import Literal
+from typing import NamedTuple
+
+import logging
+import os
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import Future
+from pathlib import Path
+
+from gi.repository import GLib
+
+from gajim.common import app
+from gajim.common import configpaths
+from gajim.common.storage.cache import DiskCacheRow
+from gajim.common.storage.cache import DiskCacheUsage
+
+log = logging.getLogger('gajim.c.disk_cache')
+
+CacheKindT = Literal['downloads', 'thumbnails', 'avatars', 'bob']
+CacheFileT = tuple[CacheKindT, str]
+ProtectedFilesFuncT = Callable[[], Iterable[CacheFileT]]
+
+# Seconds after startup until the cache directories are scanned
+INITIAL_SCAN_DELAY = 60
+EVICTION_INTERVAL = 3600
+
+# Evict until the cache uses less than this fraction of the budget, so
+# eviction does not run again after every new file
+EVICTION_TARGET_RATIO = 0.9
+
+# Files which are still being written, see Preview.part_path
+TEMPORARY_SUFFIXES = ('.part', '.decrypted')
+
+
+class DiskCacheStats(NamedTuple):
+    usage: list[DiskCacheUsage]
+    size: int
+    max_size: int
+    evicted_count: int
+    evicted_size: int
+
+
+class DiskCacheManager:
+    '''
+    Keeps downloads, thumbnails, avatars and BoB data within the
+    'disk_cache_max_size' budget.
+
+    Accesses are tracked in the cache DB, the least recently used files
+    are removed in a worker thread. Files returned by the registered
+    protected files functions (e.g. files shown in open chats) are never
+    removed.
+    '''
+
+    def __init__(self) -> None:
+        self._dirs: dict[CacheKindT, Path] = {
+            'downloads': configpaths.get('MY_DATA') / 'downloads',
+            'thumbnails': configpaths.get('MY_CACHE') / 'downloads.thumb',
+            'avatars': configpaths.get('AVATAR'),
+            'bob': configpaths.get('BOB'),
+        }
+
+        self._protected_files_funcs: list[ProtectedFilesFuncT] = []
+        self._scan_finished = False
+        self._eviction_running = False
+        self._evicted_count = 0
+        self._evicted_size = 0
+
+        GLib.timeout_add_seconds(INITIAL_SCAN_DELAY, self._start_scan)
+        GLib.timeout_add_seconds(EVICTION_INTERVAL, self._on_eviction_timeout)
+
+    def get_kind(self, path: Path) -> CacheKindT | None:
+        for kind, dir_ in self._dirs.items():
+            if path.parent == dir_:
+                return kind
+        return None
+
+    def record_access(self, path: Path, size: int | None = None) -> None:
+        '''
+        Record that a file of the cache was written or read
+
+        :param size:  The size of a newly written file, None if the file
+                      was only read
+        '''
+
+        kind = self.get_kind(path)
+        if kind is None:
+            log.warning('Not a cache file: %s', path)
+            return
+
+        app.storage.cache.touch_disk_cache_file(kind, path.name, size)
+
+    def register_protected_files_func(self,
+                                      func: ProtectedFilesFuncT) -> None:
+        self._protected_files_funcs.append(func)
+
+    def unregister_protected_files_func(self,
+                                        func: ProtectedFilesFuncT) -> None:
+        self._protected_files_funcs.remove(func)
+
+    def _get_protected_files(self) -> set[CacheFileT]:
+        protected: set[CacheFileT] = set()
+        for func in self._protected_files_funcs:
+            try:
+                protected.update(func())
+            except Exception:
+                log.exception('Error while getting protected files')
+        return protected
+
+    @staticmethod
+    def _get_max_size() -> int:
+        return app.settings.get('disk_cache_max_size') * 1024 * 1024
+
+    def get_stats(self) -> DiskCacheStats:
+        usage = app.storage.cache.get_disk_cache_usage()
+        return DiskCacheStats(usage=usage,
+                              size=sum(kind.size for kind in usage),
+                              max_size=self._get_max_size(),
+                              evicted_count=self._evicted_count,
+                              evicted_size=self._evicted_size)
+
+    def _log_stats(self) -> None:
+        stats = self.get_stats()
+        for usage in stats.usage:
+            log.info('%s: %s files, %s',
+                     usage.kind,
+                     usage.files,
+                     GLib.format_size(usage.size))
+
+        log.info('Total: %s of %s, evicted %s files (%s) since startup',
+                 GLib.format_size(stats.size),
+                 GLib.format_size(stats.max_size),
+                 stats.evicted_count,
+                 GLib.format_size(stats.evicted_size))
+
+    def _start_scan(self) -> bool:
+        # Files which were stored before the access tracking existed, or
+        # which were added/removed by someone else, are picked up here
+        scan_started = int(time.time())
+        future = app.get_thread_pool().submit(_scan_dirs, self._dirs.copy())
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self._on_scan_finished, f, scan_started))
+        return False
+
+    def _on_scan_finished(self,
+                          future: Future[list[DiskCacheRow]],
+                          scan_started: int) -> None:
+
+        try:
+            files = future.result()
+        except Exception:
+            log.exception('Scanning cache directories failed')
+            return
+
+        app.storage.cache.sync_disk_cache_files(files, scan_started)
+        self._scan_finished = True
+        log.info('Scanned %s cache files', len(files))
+        self.evict()
+
+    def _on_eviction_timeout(self) -> bool:
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        if not self._scan_finished or self._eviction_running:
+            return
+
+        max_size = self._get_max_size()
+        stats = self.get_stats()
+        if max_size == 0 or stats.size <= max_size:
+            self._log_stats()
+            return
+
+        protected = self._get_protected_files()
+        target_size = int(max_size * EVICTION_TARGET_RATIO)
+        size = stats.size
+
+        candidates: list[DiskCacheRow] = []
+        for row in app.storage.cache.get_disk_cache_lru():
+            if size <= target_size:
+                break
+
+            if (row.kind, row.name) in protected:
+                continue
+
+            candidates.append(row)
+            size -= row.size or 0
+
+        if not candidates:
+            log.warning('Cache exceeds limit, but all files are in use')
+            return
+
+        log.info('Evicting %s files, %s',
+                 len(candidates),
+                 GLib.format_size(stats.size - size))
+
+        self._eviction_running = True
+        paths = [(row, self._dirs[row.kind] / row.name)
+                 for row in candidates]
+        future = app.get_thread_pool().submit(_remove_files, paths)
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self._on_files_removed, f))
+
+    def _on_files_removed(self, future: Future[list[DiskCacheRow]]) -> None:
+        self._eviction_running = False
+        try:
+            removed = future.result()
+        except Exception:
+            log.exception('Removing cache files failed')
+            return
+
+        app.storage.cache.remove_disk_cache_files(
+            [(row.kind, row.name) for row in removed])
+
+        self._evicted_count += len(removed)
+        self._evicted_size += sum(row.size or 0 for row in removed)
+        self._log_stats()
+
+
+def _scan_dirs(dirs: dict[CacheKindT, Path]) -> list[DiskCacheRow]:
+    # Runs in a worker thread
+    files: list[DiskCacheRow] = []
+    for kind, dir_ in dirs.items():
+        try:
+            entries = os.scandir(dir_)
+        except FileNotFoundError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.name.endswith(TEMPORARY_SUFFIXES):
+                    continue
+
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                files.append(DiskCacheRow(kind,
+                                          entry.name,
+                                          stat.st_size,
+                                          int(stat.st_mtime)))
+    return files
+
+
+def _remove_files(paths: list[tuple[DiskCacheRow, Path]]
+                  ) -> list[DiskCacheRow]:
+    # Runs in a worker thread
+    removed: list[DiskCacheRow] = []
+    for row, path in paths:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as error:
+            log.warning('Unable to remove %s: %s', path, error)
+            continue
+        removed.append(row)
+    return removed
@@ -19,11 +19,25 @@
 
 from __future__ import annotations
 
+from typing import Any
 from typing import ClassVar
 from typing import Literal
 
+import functools
+import hashlib
+from base64 import b64encode
 from collections.abc import Callable
 
+# XEP-0300 algorithms supported by nbxmpp.Hashes2
+HASH_FUNCTIONS: dict[str, Callable[[], Any]] = {
+    'sha-256': hashlib.sha256,
+    'sha-512': hashlib.sha512,
+    'sha3-256': hashlib.sha3_256,
+    'sha3-512': hashlib.sha3_512,
+    'blake2b-256': functools.partial(hashlib.blake2b, digest_size=32),
+    'blake2b-512': functools.partial(hashlib.blake2b, digest_size=64),
+}
+
 
 class FilesProp:
     _files_props: ClassVar[dict[tuple[str, str], FileProp]] = {}
@@ -151,7 +165,19 @@ def __init__(self, account: str, sid: str) -> None:
         self.direction: Literal['<', '>'] | None = None
         self.syn_id: str | None = None
         self.seq: int | None = None
+        # In-band bytestream data IQs which were sent but not acknowledged
+        # yet, and whether the next chunks are being read and encoded
+        self.ibb_pending: int = 0
+        self.ibb_encoding: bool = False
         self.hash_: str | None = None
+        # Hash of the data, updated while it is transferred
+        self.hash_obj: Any = None
+        self.hashed_len: int = 0
+        self.transferred_hash: str | None = None
+        # Called when transferred_hash is set
+        self.hash_cb: Callable[[], None] | None = None
+        # Called when the checksum of a received file arrives
+        self.checksum_cb: Callable[[], None] | None = None
         self.fd: int | None = None
         # Type of the session, if it is 'jingle' or 'si'
         self.session_type: str | None = None
@@ -172,6 +198,38 @@ def setsid(self, value: str) -> None:
 
     sid = property(getsid, setsid)
 
+    def start_hashing(self, offset: int = 0) -> None:
+        '''
+        Hash the data while it is transferred, so the file does not need
+        to be read again afterwards. Resumed transfers are not hashed,
+        because the beginning of the file is not transferred.
+        '''
+
+        self.hash_obj = None
+        self.hashed_len = 0
+        self.transferred_hash = None
+        if offset or self.algo is None:
+            return
+
+        hash_func = HASH_FUNCTIONS.get(self.algo)
+        if hash_func is not None:
+            self.hash_obj = hash_func()
+
+    def update_hash(self, data: bytes) -> None:
+        if self.hash_obj is None:
+            return
+
+        self.hash_obj.update(data)
+        self.hashed_len += len(data)
+        if self.size is None or self.hashed_len < self.size:
+            return
+
+        digest = self.hash_obj.digest()
+        self.transferred_hash = b64encode(digest).decode('ascii')
+        self.hash_obj = None
+        if self.hash_cb is not None:
+            self.hash_cb()
+
 
 if __name__ == '__main__':
     import doctest
@@ -0,0 +1,148 @@
+# This file is part of Gajim.
+#
+# SPDX-License-Identifier: GPL-3.0-only
+
+from __future__ import annotations
+
+from typing import Any
+
+import logging
+import math
+import sys
+from collections.abc import Callable
+
+from gi.repository import GLib
+from nbxmpp import idlequeue
+
+log = logging.getLogger('gajim.c.idlequeue')
+
+# Milliseconds between select() calls while sockets are plugged, GLib
+# can not watch sockets on Windows
+SELECT_POLL_INTERVAL = 20
+
+
+class TimeEventsMixin:
+    '''
+    Runs read timeouts and alarms of the idlequeue from a GLib timeout at
+    their due time, instead of checking them periodically. No timeout is
+    scheduled while there is nothing to do.
+    '''
+
+    alarms: dict[float, list[Callable[[], Any]]]
+    read_timeouts: dict[int, dict[float, Callable[[], Any] | None]]
+
+    def __init__(self) -> None:
+        self._time_source_id: int | None = None
+        self._time_source_due: float | None = None
+        super().__init__()
+
+    def set_alarm(self, alarm_cb: Callable[[], Any], seconds: float) -> float:
+        alarm_time = super().set_alarm(alarm_cb, seconds)  # pyright: ignore
+        self._schedule_time_events()
+        return alarm_time
+
+    def remove_alarm(self,
+                     alarm_cb: Callable[[], Any],
+                     alarm_time: float) -> bool:
+
+        removed = super().remove_alarm(  # pyright: ignore
+            alarm_cb, alarm_time)
+        self._schedule_time_events()
+        return removed
+
+    def set_read_timeout(self,
+                         fd: int,
+                         seconds: float,
+                         func: Callable[[], Any] | None = None) -> None:
+
+        super().set_read_timeout(fd, seconds, func)  # pyright: ignore
+        self._schedule_time_events()
+
+    def remove_timeout(self, fd: int, timeout: float | None = None) -> None:
+        super().remove_timeout(fd, timeout)  # pyright: ignore
+        self._schedule_time_events()
+
+    def _get_next_due_time(self) -> float | None:
+        due_times = list(self.alarms)
+        for timeouts in self.read_timeouts.values():
+            due_times.extend(timeouts)
+        return min(due_times, default=None)
+
+    def _schedule_time_events(self) -> None:
+        due = self._get_next_due_time()
+        if due is None:
+            self._remove_time_source()
+            return
+
+        if self._time_source_id is not None:
+            assert self._time_source_due is not None
+            if self._time_source_due <= due:
+                # Timeouts are removed and set again for every transferred
+                # chunk, an early wakeup is cheaper than replacing the
+                # GLib source every time
+                return
+            self._remove_time_source()
+
+        delay = max(due - self.current_time(), 0)  # pyright: ignore
+        self._time_source_due = due
+        self._time_source_id = GLib.timeout_add(math.ceil(delay * 1000),
+                                                self._on_time_event)
+
+    def _remove_time_source(self) -> None:
+        if self._time_source_id is None:
+            return
+        GLib.source_remove(self._time_source_id)
+        self._time_source_id = None
+        self._time_source_due = None
+
+    def _on_time_event(self) -> bool:
+        self._time_source_id = None
+        self._time_source_due = None
+        try:
+            self._check_time_events()  # pyright: ignore
+        finally:
+            self._schedule_time_events()
+        return GLib.SOURCE_REMOVE
+
+
+class GlibIdleQueue(TimeEventsMixin, idlequeue.GlibIdleQueue):
+    '''
+    Plugged sockets are watched with GLib.io_add_watch() and serviced as
+    soon as they are ready, timeouts run at their due time
+    '''
+
+
+class SelectIdleQueue(TimeEventsMixin, idlequeue.SelectIdleQueue):
+    '''
+    Polls plugged sockets with select(), but only while there are any
+    '''
+
+    def __init__(self) -> None:
+        self._poll_source_id: int | None = None
+        super().__init__()
+
+    def _add_idle(self, fd: int, flags: int) -> None:
+        super()._add_idle(fd, flags)
+        if self._poll_source_id is None:
+            self._poll_source_id = GLib.timeout_add(SELECT_POLL_INTERVAL,
+                                                    self._poll)
+
+    def _poll(self) -> bool:
+        try:
+            self.process()
+        except Exception:
+            # Keep polling, the remaining sockets still need to be served
+            log.exception('Error while processing idlequeue')
+
+        if self.read_fds or self.write_fds:
+            return GLib.SOURCE_CONTINUE
+
+        self._poll_source_id = None
+        return GLib.SOURCE_REMOVE
+
+
+def get_idlequeue() -> idlequeue.IdleQueue:
+    if sys.platform == 'win32':
+        # GLib can not watch sockets on Windows
+        return SelectIdleQueue()
+    return GlibIdleQueue()
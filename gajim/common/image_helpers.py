@@ -120,17 +120,44 @@ def scale_pixbuf_from_data(data: bytes, size: int) -> GdkPixbuf.Pixbuf | None:
     return scale_pixbuf(pixbuf, size)
 
 
-def create_thumbnail(data: bytes, size: int, mime_type: str) -> bytes | None:
+def create_thumbnail(
+    source: bytes | Path, size: int, mime_type: str
+) -> bytes | None:
+    '''
+    Create a thumbnail from image data or from an image file. A file is
+    decoded from disk instead of being read into memory as a whole.
+    '''
 
     try:
-        thumbnail = create_thumbnail_with_pil(data, size)
+        thumbnail = create_thumbnail_with_pil(source, size)
     except (Image.DecompressionBombError, Image.DecompressionBombWarning):
         # Don't try to process image further
         return None
 
     if thumbnail is not None:
         return thumbnail
-    return create_thumbnail_with_pixbuf(data, size, mime_type)
+
+    if isinstance(source, Path):
+        return create_thumbnail_from_file_with_pixbuf(source, size)
+    return create_thumbnail_with_pixbuf(source, size, mime_type)
+
+
+def create_thumbnail_from_file_with_pixbuf(path: Path, size: int) -> bytes | None:
+    pixbuf_format, width, height = GdkPixbuf.Pixbuf.get_file_info(str(path))
+    if pixbuf_format is None:
+        log.warning('Unknown image format: %s', path)
+        return None
+
+    if size > width and size > height:
+        return path.read_bytes()
+
+    try:
+        thumbnail = GdkPixbuf.Pixbuf.new_from_file_at_scale(str(path), size, size, True)
+    except GLib.Error as error:
+        log.warning('Loading pixbuf failed: %s', error)
+        return None
+
+    return _save_thumbnail(thumbnail)
 
 
 def create_thumbnail_with_pixbuf(
@@ -168,6 +195,10 @@ def create_thumbnail_with_pixbuf(
         log.warning('scale_simple() returned None')
         return None
 
+    return _save_thumbnail(thumbnail)
+
+
+def _save_thumbnail(thumbnail: GdkPixbuf.Pixbuf) -> bytes | None:
     try:
         _error, bytes_ = thumbnail.save_to_bufferv('png', [], [])
     except GLib.Error as err:
@@ -176,13 +207,17 @@ def create_thumbnail_with_pixbuf(
     return bytes_
 
 
-def create_thumbnail_with_pil(data: bytes, size: int) -> bytes | None:
-    input_file = BytesIO(data)
+def create_thumbnail_with_pil(source: bytes | Path, size: int) -> bytes | None:
+    if isinstance(source, Path):
+        input_file = source.open('rb')
+    else:
+        input_file = BytesIO(source)
     output_file = BytesIO()
     try:
         image = Image.open(input_file)  # type: ignore
     except (Image.DecompressionBombError, Image.DecompressionBombWarning) as error:
         log.warning('Decompression bomb detected: %s', error)
+        input_file.close()
         raise
     except Exception as error:
         log.warning('making pil thumbnail failed: %s', error)
@@ -194,6 +229,8 @@ def create_thumbnail_with_pil(data: bytes, size: int) -> bytes | None:
     image_width, image_height = image.size
     if size > image_width and size > image_height:
         image.close()
+        input_file.seek(0)
+        data = input_file.read()
         input_file.close()
         output_file.close()
         return data
@@ -212,6 +249,8 @@ def create_thumbnail_with_pil(data: bytes, size: int) -> bytes | None:
             )
     except Exception as error:
         log.warning('saving pil thumbnail failed: %s', error)
+        image.close()
+        input_file.close()
         return None
 
     bytes_ = output_file.getvalue()
@@ -251,6 +251,13 @@ def _fill_content(self, content: nbxmpp.Node) -> None:
                              }
                 self.session.connection.get_module('Jingle').set_file_info(
                     file_info)
+            elif self.file_props.algo and not self.file_props.hash_:
+                # The hash is computed while sending and sent as checksum
+                # after the last byte, announce the algorithm so the
+                # receiver can hash while receiving too
+                file_tag.addChild('hash-used',
+                                  attrs={'algo': self.file_props.algo},
+                                  namespace=Namespace.HASHES_2)
         desc = file_tag.setTag('desc')
         if self.file_props.desc:
             desc.setData(self.file_props.desc)
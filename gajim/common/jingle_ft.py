@@ -12,7 +12,6 @@
 from typing import TYPE_CHECKING
 
 import logging
-import threading
 import uuid
 from enum import IntEnum
 from enum import unique
@@ -34,6 +33,7 @@
 from gajim.common.jingle_ftstates import StateInitialized
 from gajim.common.jingle_ftstates import StateTransfering
 from gajim.common.jingle_ftstates import StateTransportReplace
+from gajim.common.jingle_transport import JingleTransportIBB
 from gajim.common.jingle_transport import JingleTransportSocks5
 from gajim.common.jingle_transport import TransportType
 from gajim.common.storage.archive import models as mod
@@ -239,6 +239,8 @@ def _raise_event(self,
             if name == 'hash':
                 file_props.algo = child.getAttr('algo')
                 file_props.hash_ = val
+            if name == 'hash-used':
+                file_props.algo = child.getAttr('algo')
             if name == 'date':
                 file_props.date = val
 
@@ -285,18 +287,27 @@ def __send_hash(self) -> None:
         }
         self.session.connection.get_module('Jingle').set_file_info(file_info)
 
+    def _on_file_hashed(self) -> None:
+        # All data was read and hashed while sending
+        if self.file_props.hash_ is not None:
+            # The hash was already sent with the offer
+            return
+        self.__send_hash()
+
     def _compute_hash(self) -> nbxmpp.Hashes2 | None:
         # Calculates the hash and returns a xep-300 hash stanza
         if self.file_props.algo is None:
             return
-        try:
-            file_ = open(self.file_props.file_name, 'rb')
-        except OSError:
-            # can't open file
-            return
         h = nbxmpp.Hashes2()
-        hash_ = h.calculateHash(self.file_props.algo, file_)
-        file_.close()
+        hash_ = self.file_props.transferred_hash
+        if hash_ is None:
+            try:
+                file_ = open(self.file_props.file_name, 'rb')
+            except OSError:
+                # can't open file
+                return
+            hash_ = h.calculateHash(self.file_props.algo, file_)
+            file_.close()
         # DEBUG
         # hash_ = '1294809248109223'
         if not hash_:
@@ -325,12 +336,11 @@ def __on_session_accept(self,
             self.__state_changed(State.TRANSFERRING)
             raise nbxmpp.NodeProcessed
         self.file_props.streamhosts = self.transport.remote_candidates
-        # Calculate file hash in a new thread
-        # if we haven't sent the hash already.
+        # If we haven't sent the hash already, it is computed while
+        # sending and sent when the last byte was read
         if self.file_props.hash_ is None and self.file_props.algo and \
                 not self.werequest:
-            self.hash_thread = threading.Thread(target=self.__send_hash)
-            self.hash_thread.start()
+            self.file_props.hash_cb = self._on_file_hashed
         for host in self.file_props.streamhosts:
             host['initiator'] = self.session.initiator
             host['target'] = self.session.responder
@@ -343,9 +353,18 @@ def __on_session_accept(self,
                                              self._on_connect_error,
                                              receiving=False)
             raise nbxmpp.NodeProcessed
+        self._update_ibb_block_size(content)
         self.__state_changed(State.TRANSFERRING)
         raise nbxmpp.NodeProcessed
 
+    def _update_ibb_block_size(self, content: nbxmpp.Node) -> None:
+        # The peer may accept a smaller block size than we proposed
+        transport = content.getTag('transport', namespace=Namespace.JINGLE_IBB)
+        if transport is None or not isinstance(self.transport,
+                                               JingleTransportIBB):
+            return
+        self.transport.set_block_size(transport.getAttr('block-size'))
+
     def __on_session_terminate(self,
                                stanza: nbxmpp.Node,
                                content: nbxmpp.Node,
@@ -370,6 +389,7 @@ def __on_transport_accept(self,
                               ) -> None:
         log.info('__on_transport_accept')
         if content.getTag('transport').getNamespace() == Namespace.JINGLE_IBB:
+            self._update_ibb_block_size(content)
             self.__state_changed(State.TRANSFERRING)
 
     def __on_transport_replace(self,
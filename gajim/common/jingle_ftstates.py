@@ -14,6 +14,7 @@
 
 from gajim.common import app
 from gajim.common import types
+from gajim.common.jingle_transport import JingleTransportIBB
 from gajim.common.jingle_transport import TransportType
 from gajim.common.socks5 import Socks5ReceiverClient
 from gajim.common.socks5 import Socks5SenderClient
@@ -145,9 +146,11 @@ class StateTransfering(JingleFileTransferStates):
     def _start_ibb_transfer(self, con: types.Client) -> None:
         self.jft.file_props.transport_sid = self.jft.transport.sid
         fp = open(self.jft.file_props.file_name, 'rb')
+        assert isinstance(self.jft.transport, JingleTransportIBB)
         con.get_module('IBB').send_open(self.jft.session.peerjid,
                                         self.jft.file_props.sid,
-                                        fp)
+                                        fp,
+                                        self.jft.transport.get_block_size())
 
     def _start_sock5_transfer(self) -> None:
         # It tells whether we start the transfer as client or server
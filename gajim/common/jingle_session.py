@@ -534,6 +534,9 @@ def __on_session_info(self,
                                                        self.sid)
                     file_props.algo = algo
                     file_props.hash_ = hash_.getData()
+                    if file_props.checksum_cb is not None:
+                        # The transfer was completed before
+                        file_props.checksum_cb()
                     raise nbxmpp.NodeProcessed
         self.__send_error(stanza, 'feature-not-implemented', 'unsupported-info',
                           type_='modify')
@@ -27,6 +27,7 @@
 
 from gajim.common import app
 from gajim.common.client import Client
+from gajim.common.const import IBB_MAX_BLOCK_SIZE
 from gajim.common.file_props import FileProp
 from gajim.common.jingle_content import JingleContent
 
@@ -409,12 +410,30 @@ def __init__(self,
         if block_sz:
             self.block_sz = block_sz
         else:
-            self.block_sz = '4096'
+            self.block_sz = str(IBB_MAX_BLOCK_SIZE)
 
         self.connection = None
         self.sid: str | None = None
-        if node and node.getAttr('sid'):
-            self.sid = node.getAttr('sid')
+        if node:
+            if node.getAttr('sid'):
+                self.sid = node.getAttr('sid')
+            self.set_block_size(node.getAttr('block-size'))
+
+    def set_block_size(self, block_size: str | None) -> None:
+        '''
+        Use the block size of the peer's transport, if it is smaller than
+        ours
+        '''
+        try:
+            size = int(block_size or '')
+        except ValueError:
+            return
+
+        if 0 < size < int(self.block_sz):
+            self.block_sz = str(size)
+
+    def get_block_size(self) -> int:
+        return int(self.block_sz)
 
     def make_transport(self) -> nbxmpp.Node:
         transport = nbxmpp.Node('transport')
@@ -186,6 +186,8 @@ def parse_bob_data(stanza: Iq) -> Path | None:
             log.exception(stanza)
             return None
 
+        app.disk_cache.record_access(filepath, len(bob_data))
+
     log.info('BoB data stored: %s', algo_hash)
     return filepath
 
@@ -211,5 +213,7 @@ def store_bob_data(bob_data: BobData | None) -> Path | None:
             log.exception('Unable to save data')
             return None
 
+        app.disk_cache.record_access(filepath, len(bob_data.data))
+
     log.info('BoB data stored: %s', algo_hash)
     return filepath
@@ -14,6 +14,7 @@
 import weakref
 from collections import defaultdict
 from collections.abc import Callable
+from collections.abc import Hashable
 
 from nbxmpp.errors import StanzaError
 from nbxmpp.namespaces import Namespace
@@ -200,7 +201,7 @@ def __init__(self,
                  properties: PresenceProperties,
                  callback: Callable[..., Any]
                  ) -> None:
-        Task.__init__(self)
+        Task.__init__(self, account=account, jid=properties.jid)
         self._account = account
         self._callback = weakref.WeakMethod(callback)
 
@@ -212,9 +213,18 @@ def __init__(self,
         self._from_muc = properties.from_muc
 
     def execute(self) -> None:
+        # The task is finished when the caps module removes it, which
+        # sets it obsolete
         callback = self._callback()
-        if callback is not None:
-            callback(self)
+        if callback is None:
+            self.set_finished()
+            return
+        callback(self)
+
+    def get_coalesce_key(self) -> Hashable:
+        # Only query one entity at a time for the same hash, the result
+        # makes the tasks of the other entities obsolete
+        return (self._account, self.entity.method, self.entity.hash)
 
     def preconditions_met(self) -> bool:
         try:
@@ -194,6 +194,9 @@ def _on_cancel_upload(self,
         request.cancel()
 
     def _start_transfer(self, transfer: HTTPFileTransfer) -> None:
+        if transfer.state.is_cancelled:
+            return
+
         if transfer.encryption is not None and not transfer.is_encrypted:
             transfer.set_encrypting()
             if transfer.encryption == 'OMEMO':
@@ -434,11 +437,19 @@ def set_finished(self) -> None:
         super().set_finished()
         self._cleanup()
 
+    def set_encrypted(self) -> None:
+        '''
+        Called after the encrypted file was written to payload_path
+        '''
+        self._is_encrypted = True
+
     def set_encrypted_data(self, data: bytes) -> None:
         self._temp_path.write_bytes(data)
         self._is_encrypted = True
 
     def get_data(self) -> bytes:
+        # Loads the whole file into memory, encryption plugins should
+        # stream from path to payload_path and call set_encrypted()
         return self._path.read_bytes()
 
     def process_result(self, result: HTTPUploadData) -> None:
@@ -6,9 +6,14 @@
 
 from __future__ import annotations
 
+from typing import BinaryIO
+
+import base64
 import time
+from concurrent.futures import Future
 
 import nbxmpp
+from gi.repository import GLib
 from nbxmpp.errors import StanzaError
 from nbxmpp.namespaces import Namespace
 from nbxmpp.protocol import Iq
@@ -19,11 +24,17 @@
 
 from gajim.common import app
 from gajim.common import types
+from gajim.common.const import IBB_MAX_BLOCK_SIZE
+from gajim.common.const import IBB_MIN_BLOCK_SIZE
 from gajim.common.file_props import FileProp
 from gajim.common.file_props import FilesProp
 from gajim.common.helpers import to_user_string
 from gajim.common.modules.base import BaseModule
 
+# Data IQs which are sent without waiting for the previous ones to be
+# acknowledged
+IBB_WINDOW_SIZE = 8
+
 
 class IBB(BaseModule):
 
@@ -88,6 +99,7 @@ def _ibb_received(self,
             file_props.continue_cb = None
             file_props.syn_id = stanza.getID()
             file_props.fp = open(file_props.file_name, 'wb')  # pylint: disable=consider-using-with  # noqa: E501
+            file_props.start_hashing()
             self.send_reply(stanza)
 
         elif properties.ibb.type == 'close':
@@ -124,6 +136,7 @@ def _on_data_received(self,
         file_props.seq += 1
         file_props.started = True
         file_props.fp.write(ibb.data)
+        file_props.update_hash(ibb.data)
         current_time = time.time()
         file_props.elapsed_time += current_time - file_props.last_time
         file_props.last_time = current_time
@@ -132,11 +145,18 @@ def _on_data_received(self,
         if file_props.received_len >= file_props.size:
             file_props.completed = True
 
-    def send_open(self, to: str, sid: str, fp: FileProp) -> FileProp:
-        self._log.info('Send open to %s, sid: %s', to, sid)
+    def send_open(self,
+                  to: str,
+                  sid: str,
+                  fp: FileProp,
+                  block_size: int = IBB_MAX_BLOCK_SIZE
+                  ) -> FileProp:
+
+        self._log.info('Send open to %s, sid: %s, block size: %s',
+                       to, sid, block_size)
         file_props = FilesProp.getFilePropBySid(sid)
         file_props.direction = '>'
-        file_props.block_size = 4096
+        file_props.block_size = min(block_size, IBB_MAX_BLOCK_SIZE)
         file_props.fp = fp
         file_props.seq = -1
         file_props.error = 0
@@ -147,22 +167,38 @@ def send_open(self, to: str, sid: str, fp: FileProp) -> FileProp:
         file_props.completed = False
         file_props.disconnect_cb = None
         file_props.continue_cb = None
+        file_props.ibb_pending = 0
+        file_props.ibb_encoding = False
+        file_props.start_hashing()
+        self._send_open(to, file_props)
+        return file_props
+
+    def _send_open(self, to: str, file_props: FileProp) -> None:
         self._nbxmpp('IBB').send_open(to,
                                       file_props.transport_sid,
-                                      4096,
+                                      file_props.block_size,
                                       callback=self._on_open_result,
-                                      user_data=file_props)
-        return file_props
+                                      user_data=(to, file_props))
 
     def _on_open_result(self, task: Task) -> None:
+        to, file_props = task.get_user_data()
         try:
             task.finish()
         except StanzaError as error:
+            if (error.condition == 'resource-constraint' and
+                    file_props.block_size > IBB_MIN_BLOCK_SIZE):
+                # The peer does not accept the block size, try a smaller one
+                file_props.block_size = max(file_props.block_size // 2,
+                                            IBB_MIN_BLOCK_SIZE)
+                self._log.info('Block size rejected, retry with %s',
+                               file_props.block_size)
+                self._send_open(to, file_props)
+                return
+
             app.socks5queue.error_cb('Error', to_user_string(error))
             self._log.warning(error)
             return
 
-        file_props = task.get_user_data()
         self.send_data(file_props)
 
     def send_close(self, file_props: FileProp) -> None:
@@ -201,40 +237,135 @@ def _on_close_result(self, task: Task) -> None:
             return
 
     def send_data(self, file_props: FileProp) -> None:
+        '''
+        Keep up to IBB_WINDOW_SIZE data IQs outstanding. The next chunks
+        are read and base64 encoded in a worker thread.
+        '''
+
+        if not file_props.connected or file_props.ibb_encoding:
+            return
+
         if file_props.completed:
-            self.send_close(file_props)
+            if file_props.ibb_pending == 0:
+                self.send_close(file_props)
+            return
+
+        count = IBB_WINDOW_SIZE - file_props.ibb_pending
+        if count <= 0:
+            return
+
+        file_props.ibb_encoding = True
+        future = app.get_thread_pool().submit(
+            _read_chunks,
+            file_props.fp,
+            file_props.block_size,
+            count,
+            file_props.size - file_props.received_len)
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self._on_chunks_read, f, file_props))
+
+    def _on_chunks_read(self,
+                        future: Future[list[tuple[bytes, str]]],
+                        file_props: FileProp
+                        ) -> None:
+
+        file_props.ibb_encoding = False
+        if not file_props.connected:
+            # The transfer was stopped meanwhile
             return
 
-        chunk = file_props.fp.read(file_props.block_size)
-        if chunk:
-            file_props.seq += 1
-            file_props.started = True
-            if file_props.seq == 65536:
-                file_props.seq = 0
-
-            self._log.info('Send data to %s, sid: %s',
-                           file_props.receiver, file_props.transport_sid)
-            self._nbxmpp('IBB').send_data(file_props.receiver,
-                                          file_props.transport_sid,
-                                          file_props.seq,
-                                          chunk,
-                                          callback=self._on_data_result,
-                                          user_data=file_props)
-            current_time = time.time()
-            file_props.elapsed_time += current_time - file_props.last_time
-            file_props.last_time = current_time
-            file_props.received_len += len(chunk)
-            if file_props.size == file_props.received_len:
-                file_props.completed = True
-            app.socks5queue.progress_transfer_cb(self._account, file_props)
-
-    def _on_data_result(self, task: Task) -> None:
         try:
-            task.finish()
-        except StanzaError as error:
+            chunks = future.result()
+        except Exception as error:
+            self._log.warning('Unable to read file: %s', error)
+            file_props.error = -7
+            self.send_close(file_props)
+            return
+
+        if not chunks:
+            # The file is shorter than announced
+            if file_props.ibb_pending == 0:
+                self.send_close(file_props)
+            return
+
+        for chunk, data in chunks:
+            self._send_chunk(file_props, chunk, data)
+
+        app.socks5queue.progress_transfer_cb(self._account, file_props)
+
+    def _send_chunk(self,
+                    file_props: FileProp,
+                    chunk: bytes,
+                    data: str
+                    ) -> None:
+
+        file_props.seq += 1
+        file_props.started = True
+        if file_props.seq == 65536:
+            file_props.seq = 0
+
+        file_props.update_hash(chunk)
+
+        self._log.debug('Send data to %s, sid: %s, seq: %s',
+                        file_props.receiver,
+                        file_props.transport_sid,
+                        file_props.seq)
+        iq = _make_ibb_data(file_props.receiver,
+                            file_props.transport_sid,
+                            file_props.seq,
+                            data)
+        self._con.connection.SendAndCallForResponse(
+            iq, self._on_data_result, {'file_props': file_props})
+        file_props.ibb_pending += 1
+
+        current_time = time.time()
+        file_props.elapsed_time += current_time - file_props.last_time
+        file_props.last_time = current_time
+        file_props.received_len += len(chunk)
+        if file_props.size == file_props.received_len:
+            file_props.completed = True
+
+    def _on_data_result(self,
+                        _nbxmpp_client: types.xmppClient,
+                        stanza: Iq,
+                        file_props: FileProp
+                        ) -> None:
+
+        file_props.ibb_pending -= 1
+        if not file_props.connected:
+            return
+
+        if not nbxmpp.isResultNode(stanza):
+            error = StanzaError(stanza)
             app.socks5queue.error_cb('Error', to_user_string(error))
             self._log.warning(error)
+            self.send_close(file_props)
             return
 
-        file_props = task.get_user_data()
         self.send_data(file_props)
+
+
+def _read_chunks(file: BinaryIO,
+                 block_size: int,
+                 count: int,
+                 remaining: int
+                 ) -> list[tuple[bytes, str]]:
+
+    # Runs in a worker thread
+    chunks: list[tuple[bytes, str]] = []
+    while len(chunks) < count and remaining > 0:
+        chunk = file.read(min(block_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        chunks.append((chunk, base64.b64encode(chunk).decode('ascii')))
+    return chunks
+
+
+def _make_ibb_data(jid: str, sid: str, seq: int, data: str) -> Iq:
+    iq = Iq('set', to=jid)
+    ibb_data = iq.addChild('data',
+                           {'sid': sid, 'seq': seq},
+                           namespace=Namespace.IBB)
+    ibb_data.setData(data)
+    return iq
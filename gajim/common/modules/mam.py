@@ -66,6 +66,9 @@ def __init__(self, con: types.Client) -> None:
         # Holds archive jids where catch up was successful
         self._catch_up_finished: list[str] = []
 
+        # Holds archive jids for which writes are batched
+        self._batch_jids: set[str] = set()
+
         self._con.connect_signal('state-changed', self._on_client_state_changed)
         self._con.connect_signal('resume-failed', self._on_client_resume_failed)
 
@@ -97,6 +100,25 @@ def _on_client_state_changed(self,
     def _reset_state(self) -> None:
         self._mam_query_ids.clear()
         self._catch_up_finished.clear()
+        for jid in list(self._batch_jids):
+            self._end_batch(jid)
+
+    def _begin_batch(self, jid: JID | str) -> None:
+        # Messages of a query are stored in one transaction per result page
+        jid = str(jid)
+        if jid in self._batch_jids:
+            return
+
+        self._batch_jids.add(jid)
+        app.storage.archive.begin_batch()
+
+    def _end_batch(self, jid: JID | str) -> None:
+        jid = str(jid)
+        if jid not in self._batch_jids:
+            return
+
+        self._batch_jids.discard(jid)
+        app.storage.archive.end_batch()
 
     def _remove_query_id(self, jid: JID) -> None:
         self._mam_query_ids.pop(jid, None)
@@ -406,35 +428,41 @@ def _execute_query(self,
             self._catch_up_finished.remove(jid)
 
         queryid = self._get_query_id(jid)
+        self._begin_batch(jid)
 
-        result = yield self.make_query(jid,
-                                       queryid,
-                                       after=mam_id,
-                                       start=start_date)
+        try:
+            result = yield self.make_query(jid,
+                                           queryid,
+                                           after=mam_id,
+                                           start=start_date)
 
-        self._remove_query_id(result.jid)
+            self._remove_query_id(result.jid)
 
-        raise_if_error(result)
+            raise_if_error(result)
 
-        while not result.complete:
-            app.storage.archive.upsert_row(
-                mod.MAMArchiveState(
-                    account_=self._account,
-                    remote_jid_=result.jid,
-                    to_stanza_id=result.rsm.last,
+            while not result.complete:
+                app.storage.archive.upsert_row(
+                    mod.MAMArchiveState(
+                        account_=self._account,
+                        remote_jid_=result.jid,
+                        to_stanza_id=result.rsm.last,
+                    )
                 )
-            )
+                app.storage.archive.commit_batch()
 
-            queryid = self._get_query_id(result.jid)
+                queryid = self._get_query_id(result.jid)
 
-            result = yield self.make_query(result.jid,
-                                           queryid,
-                                           after=result.rsm.last,
-                                           start=start_date)
+                result = yield self.make_query(result.jid,
+                                               queryid,
+                                               after=result.rsm.last,
+                                               start=start_date)
 
-            self._remove_query_id(result.jid)
+                self._remove_query_id(result.jid)
 
-            raise_if_error(result)
+                raise_if_error(result)
+
+        finally:
+            self._end_batch(jid)
 
         self._catch_up_finished.append(result.jid)
         self._log.info('Request finished: %s, last mam id: %s',
@@ -459,6 +487,7 @@ def request_archive_interval(self,
         if queryid is None:
             queryid = self._get_query_id(jid)
         self._mam_query_ids[jid] = queryid
+        self._begin_batch(jid)
 
         self.make_query(jid,
                         queryid,
@@ -476,9 +505,11 @@ def _on_interval_result(self, task: Task) -> None:
             result = task.finish()
         except (StanzaError, MalformedStanzaError) as error:
             self._remove_query_id(error.jid)
+            self._end_batch(error.jid)
             return
 
         self._remove_query_id(result.jid)
+        app.storage.archive.commit_batch()
 
         if start_date:
             timestamp = start_date
@@ -496,6 +527,8 @@ def _on_interval_result(self, task: Task) -> None:
                 )
             )
 
+            self._end_batch(result.jid)
+
             app.ged.raise_event(ArchivingIntervalFinished(
                 account=self._account,
                 query_id=queryid))
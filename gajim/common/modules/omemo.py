@@ -11,7 +11,6 @@
 from typing import Any
 
 import binascii
-import threading
 from collections.abc import Callable
 from pathlib import Path
 
@@ -33,7 +32,6 @@
 from nbxmpp.structs import PresenceProperties
 from nbxmpp.structs import StanzaHandler
 from nbxmpp.task import Task
-from omemo_dr.aes import aes_encrypt_file
 from omemo_dr.const import OMEMOTrust
 from omemo_dr.exceptions import DecryptionFailed
 from omemo_dr.exceptions import DuplicateMessage
@@ -66,6 +64,8 @@
 from gajim.common.modules.util import prepare_stanza
 from gajim.common.storage.omemo import OMEMOStorage
 from gajim.common.structs import OutgoingMessage
+from gajim.common.util.crypto import aes_encrypt_file
+from gajim.common.util.crypto import EncryptionCancelled
 from gajim.common.util.decorators import lru_cache_with_ttl
 
 ALLOWED_TAGS = [
@@ -305,24 +305,31 @@ def encrypt_file(self,
                      callback: Callable[..., Any]
                      ) -> None:
 
-        thread = threading.Thread(target=self._encrypt_file_thread,
-                                  args=(transfer, callback))
-        thread.daemon = True
-        thread.start()
+        app.get_thread_pool().submit(
+            self._encrypt_file_thread, transfer, callback)
 
-    @staticmethod
-    def _encrypt_file_thread(transfer: HTTPFileTransfer,
+    def _encrypt_file_thread(self,
+                             transfer: HTTPFileTransfer,
                              callback: Callable[..., Any],
-                             *args: Any,
-                             **kwargs: Any
                              ) -> None:
 
-        result = aes_encrypt_file(transfer.get_data())
-        transfer.size = len(result.payload)
+        try:
+            result = aes_encrypt_file(
+                transfer.path,
+                transfer.payload_path,
+                is_cancelled=lambda: transfer.state.is_cancelled)
+        except EncryptionCancelled:
+            self._log.info('File encryption cancelled')
+            return
+        except Exception as error:
+            self._log.exception('Failed to encrypt file')
+            GLib.idle_add(transfer.set_error, 'misc', str(error))
+            return
+
         fragment = binascii.hexlify(result.iv + result.key).decode()
         transfer.set_uri_transform_func(
             lambda uri: f'aesgcm{uri[5:]}#{fragment}')
-        transfer.set_encrypted_data(result.payload)
+        transfer.set_encrypted()
         GLib.idle_add(callback, transfer)
 
     def _send_key_transport_message(self,
@@ -21,6 +21,7 @@
 from nbxmpp.structs import DiscoInfo
 from nbxmpp.structs import PresenceProperties
 from nbxmpp.structs import StanzaHandler
+from nbxmpp.task import Task as nbxmpp_Task
 
 from gajim.common import app
 from gajim.common import types
@@ -85,6 +86,8 @@ def _request_vcard(self,
 
         self._log.info('Received: %s %s', contact.jid, avatar_sha)
         app.app.avatar_storage.save_avatar(avatar)
+        # Request the avatar again if it is removed from the disk cache
+        self._requested_shas.remove(avatar_sha)
 
         if isinstance(contact, BareContact | GroupchatContact):
             contact.set_avatar_sha(avatar_sha)
@@ -151,12 +154,14 @@ def _process_update(self,
         else:
             self._log.info('Update: %s %s', jid, avatar_sha)
 
-            if avatar_sha == contact.avatar_sha:
-                self._log.info('Avatar already known: %s %s', jid, avatar_sha)
-                return
-
+            # The file may have been removed from the disk cache, even
+            # if the avatar is known
             if app.app.avatar_storage.avatar_exists(avatar_sha):
-                # Check if the avatar is already in storage
+                if avatar_sha == contact.avatar_sha:
+                    self._log.info(
+                        'Avatar already known: %s %s', jid, avatar_sha)
+                    return
+
                 self._log.info('Found avatar in storage')
                 contact.set_avatar_sha(avatar_sha)
                 contact.update_avatar(avatar_sha)
@@ -224,15 +229,21 @@ def __init__(self,
                  callback: Callable[..., Any]
                  ) -> None:
 
-        Task.__init__(self)
+        Task.__init__(self, account=contact.account, jid=contact.jid)
         self._contact = contact
         self._sha = sha
         self._callback = weakref.WeakMethod(callback)
 
     def execute(self) -> None:
         callback = self._callback()
-        if callback is not None:
-            callback(self._contact, self._sha)
+        if callback is None:
+            self.set_finished()
+            return
+
+        callback(self._contact, self._sha, callback=self._on_finished)
+
+    def _on_finished(self, _task: nbxmpp_Task) -> None:
+        self.set_finished()
 
     def preconditions_met(self) -> bool:
         try:
@@ -6,12 +6,15 @@
 
 from typing import Any
 from typing import cast
+from typing import NamedTuple
 
 import logging
 import os
 import re
 import uuid
 from collections.abc import Callable
+from collections.abc import Iterator
+from concurrent.futures import Future
 from dataclasses import dataclass
 from dataclasses import field
 from pathlib import Path
@@ -28,13 +31,12 @@
 from gajim.common import configpaths
 from gajim.common import regex
 from gajim.common.const import MIME_TYPES
+from gajim.common.disk_cache import CacheFileT
 from gajim.common.helpers import get_tls_error_phrases
 from gajim.common.helpers import load_file_async
-from gajim.common.helpers import write_file_async
 from gajim.common.i18n import _
 from gajim.common.image_helpers import create_thumbnail
 from gajim.common.image_helpers import get_pixbuf_from_data
-from gajim.common.preview_helpers import aes_decrypt
 from gajim.common.preview_helpers import filename_from_uri
 from gajim.common.preview_helpers import get_image_paths
 from gajim.common.preview_helpers import get_previewable_mime_types
@@ -43,6 +45,8 @@
 from gajim.common.preview_helpers import split_geo_uri
 from gajim.common.storage.archive import models as mod
 from gajim.common.types import GdkPixbufType
+from gajim.common.util.crypto import aes_decrypt_file
+from gajim.common.util.crypto import DecryptionFailed
 from gajim.common.util.http import create_http_request
 
 log = logging.getLogger('gajim.c.preview')
@@ -56,6 +60,9 @@
 
 AudioSampleT = list[tuple[float, float]]
 
+# Bytes read from a download to guess its mime type from the content
+MIME_SNIFF_SIZE = 4096
+
 
 @dataclass
 class AudioPreviewState:
@@ -68,6 +75,12 @@ class AudioPreviewState:
     is_audio_analyzed = False
 
 
+class ThumbnailResult(NamedTuple):
+    mime_type: str
+    thumbnail: bytes | None
+    pixbuf: GdkPixbufType | None
+
+
 class Preview:
     def __init__(self,
                  uri: str,
@@ -176,13 +189,19 @@ def orig_exists(self) -> bool:
             return False
         return self.orig_path.exists()
 
-    def create_thumbnail(self, data: bytes) -> bool:
-        self.thumbnail = create_thumbnail(data, self.size, self.mime_type)
+    @property
+    def part_path(self) -> Path:
+        # The download is written to this file, it is renamed
+        # (or decrypted) to orig_path once it is complete
+        assert self.orig_path is not None
+        return self.orig_path.with_name(f'{self.orig_path.name}.part')
+
+    def set_thumbnail_result(self, result: ThumbnailResult) -> None:
+        self.mime_type = result.mime_type
+        self.thumbnail = result.thumbnail
         if self.thumbnail is None:
             self.info_message = _('Creating thumbnail failed')
             log.warning('Creating thumbnail failed for: %s', self.orig_path)
-            return False
-        return True
 
     def update_widget(self, data: GdkPixbufType | None = None) -> None:
         self._widget.update(self, data)
@@ -204,6 +223,8 @@ def __init__(self) -> None:
             log.error('Failed to create: %s', self._thumb_dir)
 
         self._previews: dict[str, Preview] = {}
+        app.disk_cache.register_protected_files_func(
+            self._get_protected_files)
 
         # Holds active audio preview sessions
         # for resuming after switching chats
@@ -222,6 +243,15 @@ def get_preview(self, preview_id: str) -> Preview | None:
     def clear_previews(self) -> None:
         self._previews.clear()
 
+    def _get_protected_files(self) -> Iterator[CacheFileT]:
+        # Previews are cleared when switching chats, so these are the
+        # files shown in the current chat
+        for preview in self._previews.values():
+            if preview.orig_path is not None:
+                yield 'downloads', preview.orig_path.name
+            if preview.thumb_path is not None:
+                yield 'thumbnails', preview.thumb_path.name
+
     def get_audio_state(self,
                         preview_id: int
                         ) -> AudioPreviewState:
@@ -354,9 +384,9 @@ def create_preview(self,
 
         elif not preview.thumb_exists:
             assert preview.orig_path is not None
-            load_file_async(preview.orig_path,
-                            self._on_orig_load_finished,
-                            preview)
+            preview.file_size = os.path.getsize(preview.orig_path)
+            app.disk_cache.record_access(preview.orig_path, preview.file_size)
+            self._create_thumbnail_async(preview, None)
 
         else:
             assert preview.thumb_path is not None
@@ -386,28 +416,6 @@ def _process_web_uri(self,
                        from_us,
                        context=context)
 
-    def _on_orig_load_finished(self,
-                               data: bytes | None,
-                               error: Gio.AsyncResult,
-                               preview: Preview) -> None:
-        if preview.thumb_path is None or preview.orig_path is None:
-            return
-
-        if data is None:
-            log.error('%s: %s', preview.orig_path.name, error)
-            return
-
-        preview.mime_type = guess_mime_type(preview.orig_path, data)
-        preview.file_size = os.path.getsize(preview.orig_path)
-        if preview.is_previewable:
-            if preview.create_thumbnail(data):
-                assert preview.thumbnail is not None
-                write_file_async(preview.thumb_path,
-                                 preview.thumbnail,
-                                 self._on_thumb_write_finished,
-                                 preview)
-        preview.update_widget()
-
     @staticmethod
     def _on_thumb_load_finished(data: bytes | None,
                                 error: Gio.AsyncResult,
@@ -423,6 +431,8 @@ def _on_thumb_load_finished(data: bytes | None,
         preview.thumbnail = data
         preview.mime_type = guess_mime_type(preview.orig_path, data)
         preview.file_size = os.path.getsize(preview.orig_path)
+        app.disk_cache.record_access(preview.thumb_path)
+        app.disk_cache.record_access(preview.orig_path)
 
         try:
             pixbuf = get_pixbuf_from_data(preview.thumbnail)
@@ -460,6 +470,7 @@ def download_content(self,
         request.connect('accept-certificate', self._accept_certificate)
         request.connect('content-sniffed', self._on_content_sniffed, force)
         request.connect('response-progress', self._on_response_progress)
+        request.set_response_body_from_path(preview.part_path)
 
         request.send('GET', preview.request_uri, callback=self._on_finished)
 
@@ -529,6 +540,7 @@ def _on_finished(self, request: HTTPRequest) -> None:
         preview.download_in_progress = False
 
         if not request.is_complete():
+            preview.part_path.unlink(missing_ok=True)
             error = request.get_error_string()
             log.warning('Download failed: %s - %s', preview.request_uri, error)
             if request.get_error() != HTTPRequestError.CANCELLED:
@@ -538,94 +550,141 @@ def _on_finished(self, request: HTTPRequest) -> None:
 
         preview.info_message = None
 
-        data = request.get_data()
-        if not data:
-            return
-
+        key, iv = None, None
         if preview.is_aes_encrypted:
-            if preview.key is not None and preview.iv is not None:
-                try:
-                    data = aes_decrypt(preview.key, preview.iv, data)
-                except Exception as error:
-                    log.exception('Decryption failed')
-                    preview.info_message = _('Decryption failed')
-                    preview.update_widget()
-                    return
+            key, iv = preview.key, preview.iv
 
-        if preview.mime_type == 'application/octet-stream':
-            if preview.orig_path is not None:
-                preview.mime_type = guess_mime_type(preview.orig_path, data)
+        assert preview.orig_path is not None
+        future = app.get_thread_pool().submit(
+            _store_download, preview.part_path, preview.orig_path, key, iv)
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self._on_download_stored, f, preview))
 
-        write_file_async(preview.orig_path,
-                         data,
-                         self._on_orig_write_finished,
-                         preview)
+    def _on_download_stored(self,
+                            future: Future[None],
+                            preview: Preview
+                            ) -> None:
 
-        if not app.settings.get('enable_file_preview'):
+        assert preview.orig_path is not None
+        try:
+            future.result()
+        except DecryptionFailed as error:
+            log.warning('Decryption failed: %s', error)
+            preview.info_message = _('Decryption failed')
             preview.update_widget()
             return
-
-        if preview.is_previewable:
-            if preview.create_thumbnail(data):
-                assert preview.thumb_path is not None
-                write_file_async(preview.thumb_path,
-                                 preview.thumbnail,
-                                 self._on_thumb_write_finished,
-                                 preview)
-            else:
-                preview.update_widget()
-
-    @staticmethod
-    def _on_orig_write_finished(_result: bool,
-                                error: GLib.Error | None,
-                                preview: Preview) -> None:
-        if preview.orig_path is None:
-            return
-
-        if error is not None:
-            log.error('%s: %s', preview.orig_path.name, error)
+        except Exception as error:
+            log.exception('Storing download failed')
+            preview.info_message = _('Download failed (%s)') % error
+            preview.update_widget()
             return
 
         log.info('File stored: %s', preview.orig_path.name)
         preview.file_size = os.path.getsize(preview.orig_path)
-        if not preview.is_previewable:
-            # Don’t update preview if thumb is already displayed,
-            # but update preview for audio files
+        app.disk_cache.record_access(preview.orig_path, preview.file_size)
+
+        mime_type = None
+        if preview.mime_type != 'application/octet-stream':
+            mime_type = preview.mime_type
+
+        if (not app.settings.get('enable_file_preview') or
+                (mime_type is not None and not preview.is_previewable)):
             preview.update_widget()
+            return
+
+        self._create_thumbnail_async(preview, mime_type)
 
     @staticmethod
-    def _on_thumb_write_finished(_result: bool,
-                                 error: GLib.Error | None,
-                                 preview: Preview) -> None:
-        if preview.thumb_path is None:
-            return
+    def _create_thumbnail_async(preview: Preview,
+                                mime_type: str | None
+                                ) -> None:
+
+        assert preview.orig_path is not None
+        assert preview.thumb_path is not None
+        future = app.get_thread_pool().submit(_create_thumbnail,
+                                              preview.orig_path,
+                                              preview.thumb_path,
+                                              preview.size,
+                                              mime_type)
+        future.add_done_callback(
+            lambda f: GLib.idle_add(_on_thumbnail_created, f, preview))
 
-        if error is not None:
-            log.error('%s: %s', preview.thumb_path.name, error)
-            if not preview.thumb_exists:
-                # Generating a preview can fail if the file already exists
-                # Only abort if thumbnail has not been stored in preview
-                return
+    def cancel_download(self, preview: Preview) -> None:
+        preview.request.cancel()
+        preview.download_in_progress = False
 
-        log.info('Thumbnail stored: %s ', preview.thumb_path.name)
 
-        if preview.thumbnail is None:
-            return
+def _store_download(part_path: Path,
+                    orig_path: Path,
+                    key: bytes | None,
+                    iv: bytes | None
+                    ) -> None:
 
-        try:
-            pixbuf = get_pixbuf_from_data(preview.thumbnail)
-        except Exception as err:
-            log.error('Unable to load: %s, %s',
-                      preview.thumb_path.name,
-                      err)
+    # Runs in a worker thread
+    try:
+        if key is None or iv is None:
+            part_path.replace(orig_path)
             return
 
-        if pixbuf is None:
-            log.error('Unable to load pixbuf')
-            return
+        decrypted_path = orig_path.with_name(f'{orig_path.name}.decrypted')
+        aes_decrypt_file(part_path, decrypted_path, key, iv)
+        decrypted_path.replace(orig_path)
+    finally:
+        part_path.unlink(missing_ok=True)
 
-        preview.update_widget(data=pixbuf)
 
-    def cancel_download(self, preview: Preview) -> None:
-        preview.request.cancel()
-        preview.download_in_progress = False
+def _create_thumbnail(orig_path: Path,
+                      thumb_path: Path,
+                      size: int,
+                      mime_type: str | None
+                      ) -> ThumbnailResult:
+
+    # Runs in a worker thread, only the result is passed to the main loop
+    if mime_type is None:
+        with orig_path.open('rb') as file:
+            mime_type = guess_mime_type(orig_path, file.read(MIME_SNIFF_SIZE))
+
+    if mime_type not in PREVIEWABLE_MIME_TYPES:
+        return ThumbnailResult(mime_type, None, None)
+
+    # The original is decoded from disk, it can be much larger than
+    # the thumbnail
+    thumbnail = create_thumbnail(orig_path, size, mime_type)
+    if thumbnail is None:
+        return ThumbnailResult(mime_type, None, None)
+
+    thumb_path.write_bytes(thumbnail)
+    log.info('Thumbnail stored: %s ', thumb_path.name)
+
+    return ThumbnailResult(
+        mime_type, thumbnail, get_pixbuf_from_data(thumbnail))
+
+
+def _on_thumbnail_created(future: Future[ThumbnailResult],
+                          preview: Preview
+                          ) -> None:
+
+    try:
+        result = future.result()
+    except Exception:
+        log.exception('Creating thumbnail failed for: %s', preview.orig_path)
+        preview.info_message = _('Creating thumbnail failed')
+        preview.update_widget()
+        return
+
+    if result.mime_type not in PREVIEWABLE_MIME_TYPES:
+        preview.mime_type = result.mime_type
+        preview.update_widget()
+        return
+
+    if result.thumbnail is not None:
+        assert preview.thumb_path is not None
+        app.disk_cache.record_access(
+            preview.thumb_path, len(result.thumbnail))
+
+    preview.set_thumbnail_result(result)
+    if result.pixbuf is None:
+        preview.update_widget()
+        return
+
+    preview.update_widget(data=result.pixbuf)
@@ -14,10 +14,6 @@
 from urllib.parse import unquote
 from urllib.parse import urlparse
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import algorithms
-from cryptography.hazmat.primitives.ciphers import Cipher
-from cryptography.hazmat.primitives.ciphers.modes import GCM
 from gi.repository import GdkPixbuf
 from gi.repository import Gio
 from gi.repository import GLib
@@ -141,16 +137,6 @@ def filename_from_uri(uri: str) -> str:
     return path.name
 
 
-def aes_decrypt(key: bytes, iv: bytes, payload: bytes) -> bytes:
-    # Use AES256 GCM with the given key and iv to decrypt the payload
-    data = payload[:-16]
-    tag = payload[-16:]
-    decryptor = Cipher(algorithms.AES(key),
-                       GCM(iv, tag=tag),
-                       backend=default_backend()).decryptor()
-    return decryptor.update(data) + decryptor.finalize()
-
-
 def contains_audio_streams(file_path: Path) -> bool:
     # Check if it is really an audio file
 
@@ -101,7 +101,8 @@ class PRECISIdentifierClass:
 class XMPP:
     _id = PRECIS.IdentifierClass
     _excl      = '"&\'/:<>@'  # <#section-3.3.1>
-    localpart  = fr'(?:(?![{_excl}{_id.Disallowed}])[{_id.Valid}])+'
+    localpart_char = fr'(?![{_excl}{_id.Disallowed}])[{_id.Valid}]'
+    localpart  = fr'(?:{localpart_char})+'
     # ^ doesn't take into account "contextual rules" <rfc7564#section-4.2.2>
     ifqdn      = fr'[{iunreserved}{sub_delims}]+'
     # ^ probably correct
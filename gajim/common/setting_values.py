@@ -102,7 +102,10 @@ class _ACCOUNTDEFAULT:
     'autoawaytime',
     'autoxatime',
     'chat_handle_position',
+    'conversation_cache_max_rows',
+    'conversation_cache_size',
     'dark_theme',
+    'disk_cache_max_size',
     'file_transfers_port',
     'gc_sync_threshold_private_default',
     'gc_sync_threshold_public_default',
@@ -182,6 +185,8 @@ class _ACCOUNTDEFAULT:
     'confirm_block': '',
     'confirm_close_muc': True,
     'confirm_on_window_delete': True,
+    'conversation_cache_max_rows': 2000,
+    'conversation_cache_size': 5,
     'dark_theme': 2,
     'date_format': '%x',
     'date_time_format': '%c',
@@ -189,6 +194,7 @@ class _ACCOUNTDEFAULT:
     'dev_use_message_label': True,
     'developer_modus': False,
     'dictionary_url': 'WIKTIONARY',
+    'disk_cache_max_size': 0,
     'enable_emoji_shortcodes': True,
     'enable_keepassxc_integration': False,
     'enable_negative_priority': False,
@@ -656,6 +662,12 @@ class WorkspaceSettings(TypedDict):
         'confirm_close_muc': _('Ask before closing a group chat tab/window.'),
         'confirm_on_window_delete': _(
             'Ask before quitting when Gajim’s window is closed'),
+        'conversation_cache_max_rows': _(
+            'Maximum number of rows kept in memory for recently shown '
+            'chats.'),
+        'conversation_cache_size': _(
+            'Number of recently shown chats which are kept in memory, so '
+            'switching back to them is instant. 0 disables the cache.'),
         'date_format': 'https://docs.python.org/3/library/time.html#time.strftime',  # noqa: E501
         'date_time_format': 'https://docs.python.org/3/library/time.html#time.strftime',  # noqa: E501
         'dev_force_bookmark_2': _('Force Bookmark 2 usage'),
@@ -664,6 +676,11 @@ class WorkspaceSettings(TypedDict):
         'dictionary_url': _(
             'Either a custom URL with %%s in it (where %%s is the word/phrase)'
             ' or "WIKTIONARY" (which means use Wikitionary).'),
+        'disk_cache_max_size': _(
+            'Maximum size in MiB of downloaded files, thumbnails, avatars '
+            'and other cached data. The least recently used files are '
+            'removed if the limit is exceeded, including downloaded files. '
+            '0 disables the limit.'),
         'enable_negative_priority': _(
             'If enabled, you will be able to set a negative priority to your '
             'account in the Accounts window. BE CAREFUL, when you are logged '
@@ -70,18 +70,29 @@
 
 log = logging.getLogger('gajim.c.settings')
 
-CURRENT_USER_VERSION = 6
+CURRENT_USER_VERSION = 7
+
+ACCOUNT_SETTINGS_SQL = '''
+    CREATE TABLE accounts (
+            account TEXT PRIMARY KEY
+    );
+
+    CREATE TABLE account_setting_values (
+            account TEXT NOT NULL,
+            category TEXT NOT NULL,
+            jid TEXT NOT NULL,
+            setting TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (account, category, jid, setting)
+    ) WITHOUT ROWID;
+'''
 
 CREATE_SQL = '''
     CREATE TABLE settings (
             name TEXT UNIQUE,
             settings TEXT
     );
-
-    CREATE TABLE account_settings (
-            account TEXT UNIQUE,
-            settings TEXT
-    );
+    {account_settings}
 
     INSERT INTO settings(name, settings) VALUES ('app', '{{}}');
     INSERT INTO settings(name, settings) VALUES ('soundevents', '{{}}');
@@ -91,7 +102,8 @@
     INSERT INTO settings(name, settings) VALUES ('workspaces', '{workspaces}');
 
     PRAGMA user_version={version};
-    '''.format(status=json.dumps(STATUS_PRESET_EXAMPLES),  # noqa: UP032
+    '''.format(account_settings=ACCOUNT_SETTINGS_SQL,  # noqa: UP032
+               status=json.dumps(STATUS_PRESET_EXAMPLES),
                proxies=json.dumps(PROXY_EXAMPLES),
                workspaces=json.dumps(INITAL_WORKSPACE),
                version=CURRENT_USER_VERSION)
@@ -368,7 +380,7 @@ def _migrate(self) -> None:
                     account_settings['account']['active'] = True
 
             for account in self._account_settings:
-                self._commit_account_settings(account)
+                self._commit_legacy_account_settings(account)
 
             self._set_user_version(3)
 
@@ -403,10 +415,22 @@ def _migrate(self) -> None:
                 settings['address'] = str(address)
 
             for account in self._account_settings:
-                self._commit_account_settings(account)
+                self._commit_legacy_account_settings(account)
 
             self._set_user_version(6)
 
+        if version < 7:
+            # Store each account setting in its own row instead of
+            # one JSON document per account
+            self._con.executescript(ACCOUNT_SETTINGS_SQL)
+            for account in self._account_settings:
+                self._con.execute(
+                    'INSERT INTO accounts(account) VALUES(?)', (account,))
+                self._commit_account_settings(account, schedule=False)
+
+            self._con.execute('DROP TABLE account_settings')
+            self._set_user_version(7)
+
     def _migrate_old_config(self) -> None:
         if self._in_memory:
             return
@@ -606,6 +630,27 @@ def _load_settings(self) -> None:
                                                   object_hook=json_decoder)
 
     def _load_account_settings(self) -> None:
+        if self._get_user_version() < 7:
+            self._load_legacy_account_settings()
+            return
+
+        accounts = self._con.execute('SELECT * FROM accounts').fetchall()
+        for row in accounts:
+            log.info('Load account settings: %s', row.account)
+            self._account_settings[row.account] = {'account': {},
+                                                   'contact': {},
+                                                   'group_chat': {}}
+
+        values = self._con.execute(
+            'SELECT * FROM account_setting_values').fetchall()
+        for row in values:
+            settings = self._account_settings[row.account][row.category]
+            if row.category != 'account':
+                settings = settings.setdefault(row.jid, {})
+            settings[row.setting] = json.loads(row.value,
+                                               object_hook=json_decoder)
+
+    def _load_legacy_account_settings(self) -> None:
         account_settings = self._con.execute(
             'SELECT * FROM account_settings').fetchall()
         for row in account_settings:
@@ -614,16 +659,74 @@ def _load_account_settings(self) -> None:
                 row.settings,
                 object_hook=json_decoder)
 
+    def _commit_legacy_account_settings(self, account: str) -> None:
+        # Only for migrations of databases before user version 7
+        log.info('Set account settings: %s', account)
+        self._con.execute(
+            'UPDATE account_settings SET settings = ? WHERE account = ?',
+            (json.dumps(self._account_settings[account], cls=Encoder), account))
+
+        self._commit()
+
     def _commit_account_settings(self,
                                  account: str,
                                  schedule: bool = True) -> None:
+        '''
+        Replace all stored settings of the account, use
+        _commit_account_setting() if only one setting changed
+        '''
+
         log.info('Set account settings: %s', account)
         self._con.execute(
-            'UPDATE account_settings SET settings = ? WHERE account = ?',
-            (json.dumps(self._account_settings[account], cls=Encoder), account))
+            'DELETE FROM account_setting_values WHERE account = ?',
+            (account,))
+
+        rows: list[tuple[str, str, str, str, str]] = []
+        for category, settings in self._account_settings[account].items():
+            if category == 'account':
+                settings = {'': settings}
+
+            for jid, jid_settings in settings.items():
+                for setting, value in jid_settings.items():
+                    rows.append((account,
+                                 category,
+                                 str(jid),
+                                 setting,
+                                 json.dumps(value, cls=Encoder)))
+
+        self._con.executemany(
+            'INSERT INTO account_setting_values'
+            '(account, category, jid, setting, value) VALUES(?, ?, ?, ?, ?)',
+            rows)
 
         self._commit(schedule=schedule)
 
+    def _commit_account_setting(self,
+                                account: str,
+                                category: str,
+                                jid: JID | str,
+                                setting: str,
+                                value: SETTING_TYPE | None) -> None:
+
+        log.info('Set account setting: %s %s %s %s',
+                 account, category, jid, setting)
+
+        if value is None:
+            self._con.execute(
+                'DELETE FROM account_setting_values '
+                'WHERE account = ? AND category = ? AND jid = ? '
+                'AND setting = ?',
+                (account, category, str(jid), setting))
+        else:
+            self._con.execute(
+                'INSERT OR REPLACE INTO account_setting_values'
+                '(account, category, jid, setting, value) '
+                'VALUES(?, ?, ?, ?, ?)',
+                (account, category, str(jid), setting,
+                 json.dumps(value, cls=Encoder)))
+
+        self._commit(schedule=True)
+
     def _commit_settings(self, name: str, schedule: bool = True) -> None:
         log.info('Set settings: %s', name)
         self._con.execute(
@@ -776,8 +879,7 @@ def add_account(self, account: str) -> None:
                                            'contact': {},
                                            'group_chat': {}}
         self._con.execute(
-            'INSERT INTO account_settings(account, settings) VALUES(?, ?)',
-            (account, json.dumps(self._account_settings[account])))
+            'INSERT INTO accounts(account) VALUES(?)', (account,))
         self._commit()
 
     def remove_account(self, account: str) -> None:
@@ -786,7 +888,10 @@ def remove_account(self, account: str) -> None:
 
         del self._account_settings[account]
         self._con.execute(
-            'DELETE FROM account_settings WHERE account = ?',
+            'DELETE FROM accounts WHERE account = ?',
+            (account,))
+        self._con.execute(
+            'DELETE FROM account_setting_values WHERE account = ?',
             (account,))
         self._commit()
 
@@ -891,13 +996,13 @@ def set_account_setting(self,
             except KeyError:
                 pass
 
-            self._commit_account_settings(account)
+            self._commit_account_setting(account, 'account', '', setting, None)
             self._notify(default, setting, account)
             return
 
         self._account_settings[account]['account'][setting] = value
 
-        self._commit_account_settings(account)
+        self._commit_account_setting(account, 'account', '', setting, value)
         self._notify(value, setting, account)
 
     @overload
@@ -1050,7 +1155,8 @@ def set_group_chat_setting(self,
             except KeyError:
                 pass
 
-            self._commit_account_settings(account)
+            self._commit_account_setting(
+                account, 'group_chat', jid, setting, None)
             self._notify(default, setting, account, jid)
             return
 
@@ -1060,7 +1166,8 @@ def set_group_chat_setting(self,
         else:
             group_chat_settings[jid][setting] = value
 
-        self._commit_account_settings(account)
+        self._commit_account_setting(
+            account, 'group_chat', jid, setting, value)
         self._notify(value, setting, account, jid)
 
     def set_group_chat_settings(self,
@@ -1165,7 +1272,8 @@ def set_contact_setting(self,
             except KeyError:
                 pass
 
-            self._commit_account_settings(account)
+            self._commit_account_setting(
+                account, 'contact', jid, setting, None)
             self._notify(default, setting, account, jid)
             return
 
@@ -1175,7 +1283,8 @@ def set_contact_setting(self,
         else:
             contact_settings[jid][setting] = value
 
-        self._commit_account_settings(account)
+        self._commit_account_setting(
+            account, 'contact', jid, setting, value)
         self._notify(value, setting, account, jid)
 
     def set_contact_settings(self,
@@ -28,7 +28,16 @@
 from gajim.common.file_props import FilesProp
 
 log = logging.getLogger('gajim.c.socks5')
-MAX_BUFF_LEN = 65536
+# Chunk sizes adapt to what the socket accepts, they start at the size
+# of the socket send buffer
+MIN_BUFF_LEN = 16384
+MAX_BUFF_LEN = 1048576
+# Chunks which are sent or received per idlequeue event, as long as the
+# socket accepts or has more data
+MAX_CHUNKS_PER_EVENT = 16
+# Send unencrypted files with sendfile(), so the data is not copied
+# through Python
+SENDFILE_SUPPORTED = hasattr(os, 'sendfile') and sys.platform != 'win32'
 # after foo seconds without activity label transfer as 'stalled'
 STALLED_TIMEOUT = 10
 # after foo seconds of waiting to connect, disconnect from
@@ -460,6 +469,9 @@ def __init__(self, idlequeue, host, port, initiator, target, sid):
         self.file = None
         self.connected = False
         self.mode = ''
+        self._send_buff_len = None
+        self._recv_buff_len = MIN_BUFF_LEN
+        self._sendfile_failed = False
 
     def _is_connected(self):
         if self.state < 5:
@@ -548,6 +560,11 @@ def open_file_for_reading(self):
                     self.size = self.file_props.offset
                     self.file.seek(self.size)
                     self.file_props.received_len = self.size
+                if self.file_props.hash_cb is not None:
+                    # Only hash if someone waits for the hash, otherwise
+                    # the file can be sent with sendfile()
+                    self.file_props.start_hashing(
+                        self.file_props.offset or 0)
             except IOError as e:
                 self.close_file()
                 raise IOError(str(e))
@@ -583,6 +600,7 @@ def get_fd(self):
                 opt = 'ab'
             fd = open(self.file_props.file_name, opt)
             self.file_props.fd = fd
+            self.file_props.start_hashing(offset)
             self.file_props.elapsed_time = 0
             self.file_props.last_time = time.time()
             self.file_props.received_len = offset
@@ -622,52 +640,178 @@ def send_raw(self, raw_data):
         return len(raw_data)
 
     def write_next(self):
-        if self.remaining_buff != b'':
-            buff = self.remaining_buff
-        else:
-            try:
-                self.open_file_for_reading()
-            except IOError:
-                self.state = 8 # end connection
-                self.disconnect()
-                self.file_props.error = -7 # unable to read from file
-                return -1
-            buff = self.file.read(MAX_BUFF_LEN)
-        if buff:
-            lenn = 0
+        """
+        Send chunks of the file until the socket does not accept more data
+        or MAX_CHUNKS_PER_EVENT chunks were sent
+        """
+        try:
+            self.open_file_for_reading()
+        except IOError:
+            self.state = 8 # end connection
+            self.disconnect()
+            self.file_props.error = -7 # unable to read from file
+            return -1
+
+        if self._send_buff_len is None:
+            self._send_buff_len = self._get_send_buffer_size()
+
+        sent = 0
+        completed = False
+        end_of_file = False
+        for _num in range(MAX_CHUNKS_PER_EVENT):
             try:
-                lenn = self._send(buff)
-            except socket.error as err:
-                if err.errno not in (EINTR, ENOBUFS, EWOULDBLOCK):
-                    return self._on_send_exception()
+                if self._use_sendfile():
+                    lenn, chunk_len = self._sendfile_chunk()
+                else:
+                    lenn, chunk_len = self._send_chunk()
             except Exception as err:
                 log.error(err)
                 return self._on_send_exception()
 
+            if chunk_len == 0:
+                end_of_file = True
+                break
+
             self.size += lenn
-            current_time = time.time()
-            self.file_props.elapsed_time += current_time - \
-                self.file_props.last_time
-            self.file_props.last_time = current_time
-            self.file_props.received_len = self.size
+            sent += lenn
             if self.size >= self.file_props.size:
-                self.state = 8 # end connection
-                self.file_props.error = 0
-                self.disconnect()
-                return -1
-            if lenn != len(buff):
-                self.remaining_buff = buff[lenn:]
-            else:
-                self.remaining_buff = b''
-            self.state = 7 # continue to write in the socket
-            if lenn == 0:
-                return None
-            self.file_props.stalled = False
-            return lenn
+                completed = True
+                break
 
-        self.state = 8 # end connection
-        self.disconnect()
-        return -1
+            self._adapt_send_buff_len(lenn, chunk_len)
+            if lenn < chunk_len:
+                # The socket send buffer is full
+                break
+
+        current_time = time.time()
+        self.file_props.elapsed_time += current_time - \
+            self.file_props.last_time
+        self.file_props.last_time = current_time
+        self.file_props.received_len = self.size
+        if completed:
+            self.state = 8 # end connection
+            self.file_props.error = 0
+            self.disconnect()
+            return -1
+
+        if end_of_file:
+            self.state = 8 # end connection
+            self.disconnect()
+            return -1
+
+        self.state = 7 # continue to write in the socket
+        if sent == 0:
+            return None
+        self.file_props.stalled = False
+        return sent
+
+    def _use_sendfile(self):
+        # Data which is hashed while sending has to pass through Python
+        return (SENDFILE_SUPPORTED and
+                not self._sendfile_failed and
+                not self.remaining_buff and
+                self.file_props.hash_obj is None)
+
+    def _sendfile_chunk(self):
+        """
+        Send the next chunk of the file without copying it to user space.
+        Return the number of bytes sent and the size of the chunk, which
+        is 0 at the end of the file
+        """
+        try:
+            lenn = os.sendfile(self.fd,
+                               self.file.fileno(),
+                               self.size,
+                               self._send_buff_len)
+        except OSError as err:
+            if err.errno in (EINTR, ENOBUFS, EWOULDBLOCK):
+                return 0, self._send_buff_len
+            if isinstance(err, (ConnectionError, TimeoutError)):
+                raise
+            # e.g. not supported by the file system
+            log.info('sendfile() failed, falling back to send(): %s', err)
+            self._sendfile_failed = True
+            self.file.seek(self.size)
+            return self._send_chunk()
+
+        if lenn == 0:
+            return 0, 0
+        return lenn, self._send_buff_len
+
+    def _send_chunk(self):
+        """
+        Read the next chunk of the file and send it. Return the number of
+        bytes sent and the size of the chunk, which is 0 at the end of the
+        file
+        """
+        if self.remaining_buff != b'':
+            buff = self.remaining_buff
+        else:
+            buff = self.file.read(self._send_buff_len)
+            self.file_props.update_hash(buff)
+        if not buff:
+            return 0, 0
+
+        lenn = 0
+        try:
+            lenn = self._send(buff)
+        except socket.error as err:
+            if err.errno not in (EINTR, ENOBUFS, EWOULDBLOCK):
+                raise
+        self.remaining_buff = buff[lenn:]
+        return lenn, len(buff)
+
+    def _get_send_buffer_size(self):
+        try:
+            size = self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        except (AttributeError, OSError):
+            size = MIN_BUFF_LEN
+        return min(max(size, MIN_BUFF_LEN), MAX_BUFF_LEN)
+
+    def _adapt_send_buff_len(self, lenn, chunk_len):
+        if lenn == 0:
+            # EWOULDBLOCK or similar, nothing was learned about the
+            # free space in the send buffer
+            return
+        if lenn == chunk_len:
+            # The socket accepted everything, try bigger chunks
+            self._send_buff_len = min(self._send_buff_len * 2, MAX_BUFF_LEN)
+        else:
+            # The socket accepted as much as there was free space in its
+            # send buffer, which is the best guess for the next chunk
+            self._send_buff_len = min(max(lenn, MIN_BUFF_LEN), MAX_BUFF_LEN)
+
+    def _recv_available(self):
+        """
+        Receive up to MAX_CHUNKS_PER_EVENT chunks which are available on
+        the socket. Return b'' if the connection was closed
+        """
+        chunks = []
+        for _num in range(MAX_CHUNKS_PER_EVENT):
+            try:
+                chunk = self._recv(self._recv_buff_len)
+            except socket.error as err:
+                if chunks and err.errno in (EINTR, EWOULDBLOCK):
+                    break
+                return b''
+            except Exception:
+                return b''
+
+            if not chunk:
+                # Return the data received so far, the closed connection
+                # is noticed with the next event
+                break
+
+            chunks.append(chunk)
+            if len(chunk) < self._recv_buff_len:
+                # No more data available right now
+                if len(chunk) < self._recv_buff_len // 2:
+                    self._recv_buff_len = max(self._recv_buff_len // 2,
+                                              MIN_BUFF_LEN)
+                break
+            self._recv_buff_len = min(self._recv_buff_len * 2, MAX_BUFF_LEN)
+
+        return b''.join(chunks)
 
     def _on_send_exception(self):
         # peer stopped reading
@@ -692,6 +836,7 @@ def get_file_contents(self, timeout):
                 self.file_props.error = -6 # file system error
                 return 0
             fd.write(self.remaining_buff)
+            self.file_props.update_hash(self.remaining_buff)
             lenn = len(self.remaining_buff)
             current_time = time.time()
             self.file_props.elapsed_time += current_time - \
@@ -712,10 +857,7 @@ def get_file_contents(self, timeout):
                 self.disconnect()
                 self.file_props.error = -6 # file system error
                 return 0
-            try:
-                buff = self._recv(MAX_BUFF_LEN)
-            except Exception:
-                buff = b''
+            buff = self._recv_available()
             current_time = time.time()
             self.file_props.elapsed_time += current_time - \
                 self.file_props.last_time
@@ -735,6 +877,7 @@ def get_file_contents(self, timeout):
                 self.disconnect()
                 self.file_props.error = -6 # file system error
                 return 0
+            self.file_props.update_hash(buff)
             if self.file_props.received_len >= self.file_props.size:
                 # transfer completed
                 self.rem_fd(fd)
@@ -22,6 +22,7 @@
 from sqlalchemy.orm import mapped_column
 from sqlalchemy.orm import MappedAsDataclass
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session
 
 from gajim.common import app
 from gajim.common.const import Trust
@@ -36,6 +37,10 @@
 
 log = logging.getLogger('gajim.c.storage.archive.migration')
 
+# Legacy rows migrated per transaction, progress is checkpointed after
+# every chunk so an interrupted migration can resume
+MIGRATION_CHUNK_SIZE = 5000
+
 
 class MigrationBase(DeclarativeBase):
     pass
@@ -118,6 +123,10 @@ def __init__(self, archive: AlchemyStorage, user_version: int) -> None:
             self._v10()
         if user_version < 11:
             self._v11()
+        if user_version < 12:
+            self._v12()
+        if user_version < 13:
+            self._v13()
 
         app.ged.raise_event(DBMigrationFinished())
 
@@ -192,20 +201,60 @@ def _v8(self) -> None:
         stmt = (
             sa.select(Logs)
             .where(Logs.kind.in_([2, 4, 6]))
-            .execution_options(yield_per=1000)
+            .order_by(Logs.log_line_id)
+            .limit(MIGRATION_CHUNK_SIZE)
         )
 
         with self._engine.begin() as conn:
+            conn.execute(sa.text(
+                'CREATE TABLE IF NOT EXISTS migration_checkpoint('
+                'version INTEGER PRIMARY KEY, last_pk INTEGER NOT NULL)'
+            ))
+            last_pk = conn.scalar(sa.text(
+                'SELECT last_pk FROM migration_checkpoint WHERE version = 8'
+            ))
+
             count = conn.execute(count_stmt).scalar()
             assert count is not None
-            for i, log_row in enumerate(self._archive.get_session().scalars(stmt)):
-                self._process_message_row(conn, log_row)
 
-                if i % 1000 == 0:
-                    app.ged.raise_event(DBMigrationProgress(count=count, progress=i))
+            progress = 0
+            if last_pk is not None:
+                log.info('Resume migration after log line %s', last_pk)
+                self._load_pks(conn)
+                progress = conn.execute(
+                    count_stmt.where(Logs.log_line_id <= last_pk)
+                ).scalar()
+                assert progress is not None
+
+        while True:
+            app.ged.raise_event(
+                DBMigrationProgress(count=count, progress=progress))
+
+            with self._engine.begin() as conn, Session(bind=conn) as session:
+                chunk_stmt = stmt
+                if last_pk is not None:
+                    chunk_stmt = stmt.where(Logs.log_line_id > last_pk)
+
+                log_rows = session.scalars(chunk_stmt).all()
+                if not log_rows:
+                    break
+
+                for log_row in log_rows:
+                    self._process_message_row(conn, log_row)
+
+                # Committed together with the migrated rows
+                last_pk = log_rows[-1].log_line_id
+                conn.execute(
+                    sa.text(
+                        'INSERT OR REPLACE INTO migration_checkpoint'
+                        '(version, last_pk) VALUES (8, :last_pk)'
+                    ),
+                    {'last_pk': last_pk},
+                )
 
-            app.ged.raise_event(DBMigrationProgress(count=count, progress=count))
+            progress += len(log_rows)
 
+        with self._engine.begin() as conn:
             stmt = sa.select(LastArchiveMessage)
 
             account_pks = self._get_account_pks(conn)
@@ -217,6 +266,7 @@ def _v8(self) -> None:
             conn.execute(sa.text('DROP TABLE logs'))
             conn.execute(sa.text('DROP TABLE jids'))
             conn.execute(sa.text('DROP TABLE IF EXISTS unread_messages'))
+            conn.execute(sa.text('DROP TABLE migration_checkpoint'))
             conn.execute(sa.text('PRAGMA user_version=8'))
 
     def _v9(self) -> None:
@@ -269,6 +319,45 @@ def _v11(self) -> None:
         mod.Base.metadata.create_all(self._engine)
         self._execute_multiple(['PRAGMA user_version=11'])
 
+    def _v12(self) -> None:
+        # The rebuild command reads all rows from the content table
+        # to backfill the full text index
+        self._execute_multiple([
+            *mod.MESSAGE_FTS_STATEMENTS,
+            "INSERT INTO message_fts(message_fts) VALUES ('rebuild')",
+            'PRAGMA user_version=12',
+        ])
+
+    def _v13(self) -> None:
+        mod.Base.metadata.create_all(self._engine)
+
+        # One last full VACUUM to switch to auto_vacuum=INCREMENTAL, from
+        # now on free pages are returned in small steps in the background
+        with self._engine.connect() as conn:
+            auto_vacuum = conn.scalar(sa.text('PRAGMA auto_vacuum'))
+
+        if auto_vacuum != 2:
+            self._archive.vacuum()
+
+        self._execute_multiple(['PRAGMA user_version=13'])
+
+    def _load_pks(self, conn: sa.Connection) -> None:
+        # Rows inserted by an interrupted migration
+        for jid, pk in conn.execute(sa.select(mod.Account.jid, mod.Account.pk)):
+            self._account_pks[jid] = pk
+
+        for jid, pk in conn.execute(sa.select(mod.Remote.jid, mod.Remote.pk)):
+            self._remote_pks[jid] = pk
+
+        stmt = sa.select(
+            mod.Encryption.protocol,
+            mod.Encryption.key,
+            mod.Encryption.trust,
+            mod.Encryption.pk,
+        )
+        for protocol, key, trust, pk in conn.execute(stmt):
+            self._encryption_pks[(protocol, key, Trust(trust))] = pk
+
     def _get_account_pks(self, conn: sa.Connection) -> list[int]:
         account_pks: list[int] = []
         for account in app.settings.get_accounts():
@@ -588,5 +677,12 @@ def _insert_encryption_data(
         return pk
 
 
+def has_checkpoint(engine: sa.Engine) -> bool:
+    '''
+    Returns True if a migration was interrupted and will be resumed
+    '''
+    return sa.inspect(engine).has_table('migration_checkpoint')
+
+
 def run(archive: Any, user_version: int) -> None:
     Migration(archive, user_version)
@@ -390,6 +390,22 @@ class Receipt(MappedAsDataclass, Base, UtilMixin, kw_only=True):
     timestamp: Mapped[datetime.datetime] = mapped_column(EpochTimestampType)
 
 
+class Maintenance(MappedAsDataclass, Base, UtilMixin, kw_only=True):
+    __tablename__ = 'maintenance'
+    __upsert_cols__ = ['timestamp']
+    __no_table_cols__ = []
+
+    pk: Mapped[int] = mapped_column(primary_key=True, init=False)
+    name: Mapped[str] = mapped_column(unique=True)
+    timestamp: Mapped[datetime.datetime] = mapped_column(EpochTimestampType)
+
+    def get_select_stmt(self) -> Select[Any]:
+        return select(Maintenance).where(Maintenance.name == self.name)
+
+    def needs_update(self, _existing: Maintenance) -> bool:
+        return True
+
+
 class MAMArchiveState(MappedAsDataclass, Base, UtilMixin, kw_only=True):
     __tablename__ = 'mam_archive_state'
     __index_cols__ = ['fk_remote_pk', 'fk_account_pk']
@@ -799,3 +815,40 @@ def get_referenced_message(self) -> Message | None:
             self.type,
             self.reply.id
         )
+
+
+# Full text index over Message.text, it is an external content table so
+# the text is not stored twice. Corrections are indexed like any other
+# message row.
+message_fts = sa.table(
+    'message_fts',
+    sa.column('rowid', sa.INTEGER),
+    sa.column('text', sa.TEXT),
+)
+
+MESSAGE_FTS_STATEMENTS = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+        text,
+        content='message',
+        content_rowid='pk',
+        tokenize='unicode61 remove_diacritics 2'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS message_fts_insert
+        AFTER INSERT ON message BEGIN
+            INSERT INTO message_fts(rowid, text) VALUES (new.pk, new.text);
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS message_fts_delete
+        AFTER DELETE ON message BEGIN
+            INSERT INTO message_fts(message_fts, rowid, text)
+            VALUES ('delete', old.pk, old.text);
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS message_fts_update
+        AFTER UPDATE OF text ON message BEGIN
+            INSERT INTO message_fts(message_fts, rowid, text)
+            VALUES ('delete', old.pk, old.text);
+            INSERT INTO message_fts(rowid, text) VALUES (new.pk, new.text);
+        END''',
+]
+
+for _statement in MESSAGE_FTS_STATEMENTS:
+    sa.event.listen(Message.__table__, 'after_create', sa.DDL(_statement))
@@ -11,23 +11,30 @@
 import datetime as dt
 import logging
 import pprint
-import shutil
+import re
+import sqlite3
+from collections.abc import Callable
 from collections.abc import Iterator
 from collections.abc import Sequence
+from concurrent.futures import Future
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 from pathlib import Path
 
 import sqlalchemy as sa
+from gi.repository import GLib
 from nbxmpp import JID
 from sqlalchemy import delete
+from sqlalchemy import Select
 from sqlalchemy import select
 from sqlalchemy import update
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import expression as expr
 
 from gajim.common import app
 from gajim.common import configpaths
@@ -40,21 +47,39 @@
 from gajim.common.storage.archive.const import MessageType
 from gajim.common.storage.archive.models import Account
 from gajim.common.storage.archive.models import Base
+from gajim.common.storage.archive.models import DisplayedMarker
+from gajim.common.storage.archive.models import Maintenance
 from gajim.common.storage.archive.models import MAMArchiveState
 from gajim.common.storage.archive.models import Message
+from gajim.common.storage.archive.models import message_fts
 from gajim.common.storage.archive.models import MessageError
 from gajim.common.storage.archive.models import Moderation
 from gajim.common.storage.archive.models import Occupant
 from gajim.common.storage.archive.models import Reaction
+from gajim.common.storage.archive.models import Receipt
 from gajim.common.storage.archive.models import Remote
 from gajim.common.storage.archive.models import Thread
 from gajim.common.storage.base import AlchemyStorage
 from gajim.common.storage.base import timeit
 from gajim.common.storage.base import VALUE_MISSING
+from gajim.common.storage.base import with_read_session
 from gajim.common.storage.base import with_session
+from gajim.common.util.classes import LRUCache
 from gajim.common.util.datetime import FIRST_UTC_DATETIME
 
-CURRENT_USER_VERSION = 11
+CURRENT_USER_VERSION = 13
+
+# Number of remote JIDs for which the pk is kept in memory
+JID_PK_CACHE_SIZE = 5000
+
+# Chat history cleanup and incremental vacuum, in seconds
+MAINTENANCE_DELAY = 60
+MAINTENANCE_INTERVAL = 6 * 60 * 60
+
+# Messages removed per account and chunk, and the pause between
+# chunks or vacuum steps in ms
+CLEANUP_CHUNK_SIZE = 500
+MAINTENANCE_STEP_INTERVAL = 100
 
 
 log = logging.getLogger('gajim.c.storage.archive')
@@ -70,18 +95,25 @@ def __init__(self, in_memory: bool = False, path: Path | None = None) -> None:
             log,
             None if in_memory else path,
             pragma={
+                # Must come before journal_mode, otherwise it has
+                # no effect on newly created databases
+                'auto_vacuum': 'incremental',
                 'journal_mode': 'wal',
                 'secure_delete': 'on',
             },
         )
 
         self._account_pks: dict[str, int] = {}
-        self._jid_pks: dict[JID, int] = {}
+        self._jid_pks: LRUCache[JID, int] = LRUCache(JID_PK_CACHE_SIZE)
 
-    def init(self) -> None:
-        super().init()
-        with self._session as s:
-            self._load_jids(s)
+        self._maintenance_source_id: int | None = None
+
+    def shutdown(self) -> None:
+        if self._maintenance_source_id is not None:
+            GLib.source_remove(self._maintenance_source_id)
+            self._maintenance_source_id = None
+
+        super().shutdown()
 
     def _log_row(self, row: Any) -> None:
         if self._log.getEffectiveLevel() != logging.DEBUG:
@@ -93,47 +125,84 @@ def _create_table(self, session: Session, engine: Engine) -> None:
         session.execute(sa.text(f'PRAGMA user_version={CURRENT_USER_VERSION}'))
 
     def _make_backup(self) -> None:
-        db_path = configpaths.get('LOG_DB')
+        assert self._path is not None
         random_string = get_random_string(10)
-        db_backup_path = db_path.parent / f'{db_path.name}.{random_string}.bak'
-        shutil.copy(db_path, db_backup_path)
+        db_backup_path = (
+            self._path.parent / f'{self._path.name}.{random_string}.bak'
+        )
+        self._log.info('Backup database to %s', db_backup_path)
+
+        # The online backup API copies a consistent snapshot page by page,
+        # including changes which are so far only in the WAL file
+        raw_con = self._engine.raw_connection()
+        backup_con = sqlite3.connect(db_backup_path)
+        try:
+            raw_con.driver_connection.backup(backup_con)
+        finally:
+            backup_con.close()
+            raw_con.close()
 
     def _migrate(self) -> None:
         user_version = self._get_user_version()
         if user_version < CURRENT_USER_VERSION:
             app.ged.raise_event(DBMigration())
-            self._make_backup()
+            if migration.has_checkpoint(self._engine):
+                # The backup made before the interrupted migration holds
+                # the unmigrated data, a new one would be partly migrated
+                self._log.info('Resume migration, skip backup')
+            else:
+                self._make_backup()
             migration.run(self, user_version)
 
-    @timeit
-    def _load_jids(self, session: Session) -> None:
-        jids = session.scalars(select(Remote))
-        self._jid_pks = {j.jid: j.pk for j in jids}
-
-    def _get_active_account_pks(self, session: Session) -> list[int]:
-        accounts = app.settings.get_active_accounts()
-        return [self._get_account_pk(session, account) for account in accounts]
+    def _on_batch_rollback(self) -> None:
+        # Rows created during the batch are gone, drop the cached pks
+        self._account_pks.clear()
+        self._jid_pks.clear()
 
     def _get_account_pk(self, session: Session, account: str) -> int:
-        pk = self._account_pks.get(account)
+        pk = self._find_account_pk(session, account)
         if pk is not None:
             return pk
 
-        jid_str = app.get_jid_from_account(account)
-        jid = JID.from_string(jid_str)
+        jid = JID.from_string(app.get_jid_from_account(account))
+        acc = Account(jid=jid)
+        session.add(acc)
+        session.flush()
+
+        self._account_pks[account] = acc.pk
+        return acc.pk
+
+    def _find_account_pk(self, session: Session, account: str) -> int | None:
+        '''
+        Like _get_account_pk(), but returns None instead of inserting
+        a missing account. Used by all methods which only read.
+        '''
+        pk = self._account_pks.get(account)
+        if pk is not None:
+            return pk
 
+        jid = JID.from_string(app.get_jid_from_account(account))
         pk = session.scalar(select(Account.pk).where(Account.jid == jid))
-        if pk is None:
-            acc = Account(jid=jid)
-            session.add(acc)
-            session.flush()
-            pk = acc.pk
+        if pk is not None:
+            self._account_pks[account] = pk
+        return pk
 
-        self._account_pks[account] = pk
+    def _find_jid_pk(self, session: Session, jid: JID) -> int | None:
+        '''
+        Like _get_jid_pk(), but returns None instead of inserting
+        a missing jid. Used by all methods which only read.
+        '''
+        pk = self._jid_pks.get(jid)
+        if pk is not None:
+            return pk
+
+        pk = session.scalar(select(Remote.pk).where(Remote.jid == jid))
+        if pk is not None:
+            self._jid_pks.set(jid, pk)
         return pk
 
     def _get_jid_pk(self, session: Session, jid: JID) -> int:
-        pk = self._jid_pks.get(jid)
+        pk = self._find_jid_pk(session, jid)
         if pk is not None:
             return pk
 
@@ -141,9 +210,8 @@ def _get_jid_pk(self, session: Session, jid: JID) -> int:
         session.add(jid_row)
         session.flush()
 
-        pk = jid_row.pk
-        self._jid_pks[jid] = pk
-        return pk
+        self._jid_pks.set(jid, jid_row.pk)
+        return jid_row.pk
 
     def _set_foreign_keys(self, session: Session, row: Any) -> None:
         fk_account_pk = None
@@ -207,10 +275,12 @@ def insert_object(
     ) -> int:
         self._set_foreign_keys(session, obj)
         self._log_row(obj)
-        session.add(obj)
 
+        # Use a savepoint so a conflict does not roll back
+        # other rows of a running batch
         try:
-            session.commit()
+            with session.begin_nested():
+                session.add(obj)
         except Exception:
             if not ignore_on_conflict:
                 raise
@@ -218,7 +288,6 @@ def insert_object(
 
         return obj.pk
 
-
     @with_session
     @timeit
     def insert_row(
@@ -346,8 +415,10 @@ def get_message_with_id(
         message_id: str
     ) -> Message | None:
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         stmt = select(Message).where(
             Message.id == message_id,
@@ -373,8 +444,10 @@ def get_message_with_stanza_id(
         stanza_id: str
     ) -> Message | None:
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         stmt = select(Message).where(
             Message.stanza_id == stanza_id,
@@ -424,8 +497,10 @@ def delete_reaction(
         reaction_id: str,
         direction: ChatDirection,
     ) -> None:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return
 
         fk_occupant_pk = None
         if occupant_id is not None:
@@ -463,8 +538,10 @@ def delete_reaction(
     def check_if_message_id_exists(
         self, session: Session, account: str, jid: JID, message_id: str
     ) -> bool:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return False
 
         exists_criteria = select(Message.id).where(
             Message.id == message_id,
@@ -480,8 +557,10 @@ def check_if_message_id_exists(
     def check_if_stanza_id_exists(
         self, session: Session, account: str, jid: JID, stanza_id: str
     ) -> bool:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return False
 
         exists_criteria = select(Message.id).where(
             Message.stanza_id == stanza_id,
@@ -492,10 +571,12 @@ def check_if_stanza_id_exists(
         res = session.scalar(select(1).where(exists_criteria))
         return bool(res)
 
-    @with_session
+    @with_read_session
     @timeit
     def get_conversation_jids(self, session: Session, account: str) -> Sequence[JID]:
-        fk_account_pk = self._get_account_pk(session, account)
+        fk_account_pk = self._find_account_pk(session, account)
+        if fk_account_pk is None:
+            return []
 
         subq = (
             select(Message.fk_remote_pk)
@@ -507,7 +588,7 @@ def get_conversation_jids(self, session: Session, account: str) -> Sequence[JID]
         self._explain(session, stmt)
         return session.scalars(stmt).all()
 
-    @with_session
+    @with_read_session
     @timeit
     def get_conversation_before_after(
         self,
@@ -533,8 +614,65 @@ def get_conversation_before_after(
             The maximal count of Message returned
         '''
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+
+        return self._load_conversation(
+            session, fk_account_pk, fk_remote_pk, before, timestamp, n_lines
+        )
+
+    def get_conversation_before_after_async(
+        self,
+        account: str,
+        jid: JID,
+        before: bool,
+        timestamp: datetime,
+        n_lines: int,
+        callback: Callable[[Sequence[Message] | None], Any],
+    ) -> Future[Sequence[Message]]:
+        '''
+        Same as get_conversation_before_after(), but the messages are loaded
+        in a worker thread and passed to callback in the main loop
+        '''
+
+        fk_account_pk, fk_remote_pk = self._get_conversation_pks(account, jid)
+
+        # The worker uses its own connection, make sure it sees all
+        # messages which are already shown
+        self.commit_batch()
+
+        return self.read_async(
+            callback,
+            self._load_conversation,
+            fk_account_pk,
+            fk_remote_pk,
+            before,
+            timestamp,
+            n_lines,
+        )
+
+    @with_session
+    def _get_conversation_pks(
+        self, session: Session, account: str, jid: JID
+    ) -> tuple[int | None, int | None]:
+        return (
+            self._find_account_pk(session, account),
+            self._find_jid_pk(session, jid),
+        )
+
+    @timeit
+    def _load_conversation(
+        self,
+        session: Session,
+        fk_account_pk: int | None,
+        fk_remote_pk: int | None,
+        before: bool,
+        timestamp: datetime,
+        n_lines: int,
+    ) -> Sequence[Message]:
+
+        if fk_account_pk is None or fk_remote_pk is None:
+            return []
 
         stmt = select(Message).where(
             Message.fk_remote_pk == fk_remote_pk,
@@ -571,8 +709,10 @@ def get_last_conversation_row(
         returns a namedtuple or None
         '''
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         stmt = (
             select(Message)
@@ -597,8 +737,10 @@ def get_last_correctable_message(
         Load the last correctable message of a conversation by message_id.
         '''
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         min_time = datetime.now(timezone.utc) - timedelta(
             seconds=MAX_MESSAGE_CORRECTION_DELAY
@@ -657,7 +799,7 @@ def get_referenced_message(
         return app.storage.archive.get_message_with_id(
             account, jid, reply_id)
 
-    @with_session
+    @with_read_session
     @timeit
     def search_archive(
         self,
@@ -691,8 +833,6 @@ def search_archive(
         returns a list of namedtuples
         '''
 
-        # TODO: Does not search in corrections
-
         if before is None:
             before = datetime.now(timezone.utc)
 
@@ -700,13 +840,21 @@ def search_archive(
             after = FIRST_UTC_DATETIME
 
         if account is None:
-            fk_account_pks = self._get_active_account_pks(session)
+            accounts = app.settings.get_active_accounts()
         else:
-            fk_account_pks = [self._get_account_pk(session, account)]
+            accounts = [account]
+
+        fk_account_pks = [
+            pk for pk in (self._find_account_pk(session, account_)
+                          for account_ in accounts)
+            if pk is not None
+        ]
 
         fk_remote_pk = None
         if jid is not None:
-            fk_remote_pk = self._get_jid_pk(session, jid)
+            fk_remote_pk = self._find_jid_pk(session, jid)
+            if fk_remote_pk is None:
+                return
 
         stmt = select(Message).where(Message.fk_account_pk.in_(fk_account_pks))
 
@@ -717,19 +865,74 @@ def search_archive(
             lowercase_users = list(map(str.lower, from_users))
             stmt = stmt.where(sa.func.lower(Message.resource).in_(lowercase_users))
 
-        stmt = (
-            stmt.where(
-                Message.text.ilike(f'%{query}%'),
-                Message.timestamp.between(after, before),
-            )
-            .order_by(sa.desc(Message.timestamp), sa.desc(Message.pk))
-            .execution_options(yield_per=25)
-        )
+        stmt = stmt.where(Message.timestamp.between(after, before))
+
+        match = self._get_fts_match(query)
+        if match is None:
+            # Nothing the tokenizer would index, e.g. only punctuation
+            stmt = stmt.where(Message.text.ilike(f'%{query}%'))
+        else:
+            stmt = stmt.where(Message.pk.in_(self._get_fts_hits(match)))
+
+        # Results are grouped by day, newest first
+        stmt = stmt.order_by(sa.desc(Message.timestamp), sa.desc(Message.pk))
+
+        stmt = stmt.execution_options(yield_per=25)
 
         self._explain(session, stmt)
         yield from session.scalars(stmt)
 
-    @with_session
+    @staticmethod
+    def _get_fts_match(query: str) -> str | None:
+        '''
+        Convert the user query into a FTS5 query which matches
+        all words of the query, the last word also as prefix.
+        '''
+
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    @staticmethod
+    def _get_fts_hits(match: str) -> sa.Select[tuple[int]]:
+        '''
+        Returns the pks of messages matching the FTS5 query.
+        A matching correction counts as hit for the corrected message.
+        '''
+
+        matches = (
+            select(message_fts.c.rowid)
+            .where(sa.text('message_fts MATCH :match').bindparams(match=match))
+            .subquery()
+        )
+
+        original = aliased(Message)
+        original_pk = (
+            select(original.pk)
+            .where(
+                original.id == Message.correction_id,
+                original.fk_remote_pk == Message.fk_remote_pk,
+                original.fk_account_pk == Message.fk_account_pk,
+                original.correction_id.is_(None),
+            )
+            .order_by(sa.desc(original.timestamp))
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        target_pk = sa.func.coalesce(original_pk, Message.pk).label('pk')
+
+        return (
+            select(target_pk)
+            .select_from(matches)
+            .join(Message, Message.pk == matches.c.rowid)
+        )
+
+    @with_read_session
     @timeit
     def get_days_containing_messages(
         self, session: Session, account: str, jid: JID, year: int, month: int
@@ -738,8 +941,10 @@ def get_days_containing_messages(
         Get days in month of year where messages for account/jid exist
         '''
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return []
 
         # The user wants all days which have messages within a month.
         # A message in the database with a timestamp 2024-01-01 00:00:01 UTC
@@ -791,8 +996,10 @@ def _get_message_ts(
         jid: JID,
         direction: Literal['first', 'last'],
     ) -> datetime | None:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         stmt = select(Message.timestamp).where(
             Message.fk_remote_pk == fk_remote_pk,
@@ -842,8 +1049,10 @@ def get_first_message_meta_for_date(
         get_days_containing_messages()
         '''
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         start = datetime.combine(date, dt.time.min).astimezone(timezone.utc)
         end = datetime.combine(date, dt.time.max).astimezone(timezone.utc)
@@ -871,8 +1080,42 @@ def get_first_message_meta_for_date(
     def get_recent_muc_nicks(
         self, session: Session, account: str, jid: JID
     ) -> set[str]:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        return self._load_recent_muc_nicks(
+            session, fk_account_pk, fk_remote_pk)
+
+    def get_recent_muc_nicks_async(
+        self,
+        account: str,
+        jid: JID,
+        callback: Callable[[set[str] | None], Any],
+    ) -> Future[set[str]]:
+        '''
+        Same as get_recent_muc_nicks(), but the nicknames are loaded
+        in a worker thread and passed to callback in the main loop
+        '''
+
+        fk_account_pk, fk_remote_pk = self._get_conversation_pks(account, jid)
+        self.commit_batch()
+
+        return self.read_async(
+            callback,
+            self._load_recent_muc_nicks,
+            fk_account_pk,
+            fk_remote_pk,
+        )
+
+    @timeit
+    def _load_recent_muc_nicks(
+        self,
+        session: Session,
+        fk_account_pk: int | None,
+        fk_remote_pk: int | None,
+    ) -> set[str]:
+
+        if fk_account_pk is None or fk_remote_pk is None:
+            return set()
 
         recent = datetime.now(timezone.utc) - timedelta(days=90)
 
@@ -896,8 +1139,10 @@ def get_recent_muc_nicks(
     def get_mam_archive_state(
         self, session: Session, account: str, jid: JID
     ) -> MAMArchiveState | None:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         stmt = select(MAMArchiveState).where(
             MAMArchiveState.fk_account_pk == fk_account_pk,
@@ -910,8 +1155,10 @@ def get_mam_archive_state(
     @with_session
     @timeit
     def reset_mam_archive_state(self, session: Session, account: str, jid: JID) -> None:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return
 
         stmt = delete(MAMArchiveState).where(
             MAMArchiveState.fk_account_pk == fk_account_pk,
@@ -930,8 +1177,10 @@ def update_pending_message(
         message_id: str,
         stanza_id: str | None,
     ) -> int | None:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return None
 
         stmt = (
             update(Message)
@@ -955,8 +1204,10 @@ def remove_history_for_jid(self, session: Session, account: str, jid: JID) -> No
         Remove messages and metadata for a specific jid.
         '''
 
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return
 
         stmt = delete(MessageError).where(
             MessageError.fk_account_pk == fk_account_pk,
@@ -996,44 +1247,192 @@ def remove_all_history(self, session: Session) -> None:
     @with_session
     @timeit
     def remove_account(self, session: Session, account: str) -> None:
-        fk_account_pk = self._get_account_pk(session, account)
+        fk_account_pk = self._find_account_pk(session, account)
+        if fk_account_pk is None:
+            return
 
         session.execute(delete(Account).where(Account.pk == fk_account_pk))
 
         self._account_pks.pop(account)
 
+    def schedule_maintenance(self, delay: int = MAINTENANCE_DELAY) -> None:
+        '''
+        Remove expired messages and return free pages to the file system
+        after `delay` seconds in the background. Both run in small steps,
+        so the main loop is never blocked for long. The maintenance
+        repeats every MAINTENANCE_INTERVAL seconds.
+        '''
+
+        if self._maintenance_source_id is not None:
+            return
+
+        self._maintenance_source_id = GLib.timeout_add_seconds(
+            delay, self._on_maintenance_start
+        )
+
+    def _on_maintenance_start(self) -> bool:
+        self._maintenance_source_id = GLib.timeout_add(
+            MAINTENANCE_STEP_INTERVAL, self._on_cleanup_step
+        )
+        return False
+
+    def _on_cleanup_step(self) -> bool:
+        if self.cleanup_chat_history():
+            return True
+
+        self._maintenance_source_id = GLib.timeout_add(
+            MAINTENANCE_STEP_INTERVAL, self._on_vacuum_step
+        )
+        return False
+
+    def _on_vacuum_step(self) -> bool:
+        if self._batch_holders > 0:
+            # Vacuum would wait for the write lock of the batch
+            return True
+
+        if self.run_incremental_vacuum():
+            return True
+
+        self._maintenance_source_id = None
+        self.schedule_maintenance(MAINTENANCE_INTERVAL)
+        return False
+
+    def vacuum(self) -> None:
+        super().vacuum()
+        self.upsert_row(
+            Maintenance(name='vacuum', timestamp=datetime.now(timezone.utc))
+        )
+
+    @with_session
+    @timeit
+    def get_last_vacuum(self, session: Session) -> datetime | None:
+        stmt = select(Maintenance.timestamp).where(Maintenance.name == 'vacuum')
+        return session.scalar(stmt)
+
     @with_session
     @timeit
-    def cleanup_chat_history(self, session: Session) -> None:
+    def cleanup_chat_history(
+        self, session: Session, limit: int = CLEANUP_CHUNK_SIZE
+    ) -> bool:
         '''
-        Remove messages from account where messages are older than max_age
+        Remove up to `limit` messages per account which are older than
+        the accounts max_age
+
+        returns True if there are more messages to remove
         '''
+
+        more = False
+        now = datetime.now(timezone.utc)
+
         for account in app.settings.get_accounts():
             max_age = app.settings.get_account_setting(account, 'chat_history_max_age')
             if max_age == -1:
                 continue
 
-            fk_account_pk = self._get_account_pk(session, account)
+            fk_account_pk = self._find_account_pk(session, account)
+            if fk_account_pk is None:
+                continue
 
-            now = datetime.now(timezone.utc)
             threshold = now - timedelta(seconds=max_age)
 
-            stmt = select(Message).where(
-                Message.fk_account_pk == fk_account_pk, Message.timestamp < threshold
+            # No ordering, expired messages are usually the oldest rows,
+            # so the scan stops early without a sort over the whole table
+            stmt = (
+                select(Message.pk)
+                .where(
+                    Message.fk_account_pk == fk_account_pk,
+                    Message.timestamp < threshold,
+                )
+                .limit(limit)
             )
 
-            for message in session.scalars(stmt).unique().all():
-                self._delete_message(session, message)
+            pks = session.scalars(stmt).all()
+            if not pks:
+                continue
+
+            self._delete_messages(session, pks)
+            more = more or len(pks) == limit
 
-            log.info('Removed messages older then %s', threshold.isoformat())
+            log.info(
+                'Removed %s messages older then %s', len(pks), threshold.isoformat()
+            )
 
-    @with_session
+        return more
+
+    def _delete_messages(self, session: Session, pks: Sequence[int]) -> None:
+        '''
+        Remove messages with set based deletes, together with their
+        corrections, errors, moderations, receipts, markers and reactions.
+        Other related rows are removed by foreign key cascades.
+        '''
+
+        message = aliased(Message)
+        is_groupchat = message.type == MessageType.GROUPCHAT
+
+        def _select(id_column: Any) -> Select[Any]:
+            return select(
+                id_column, message.fk_remote_pk, message.fk_account_pk
+            ).where(message.pk.in_(pks))
+
+        ids = _select(message.id)
+        stanza_ids = _select(message.stanza_id)
+        reference_ids = _select(
+            expr.case((is_groupchat, message.stanza_id), else_=message.id)
+        )
+
+        # Same conditions as the Message.corrections relationship
+        corrected = aliased(Message)
+        correction_pks = (
+            select(Message.pk)
+            .join(
+                corrected,
+                sa.and_(
+                    corrected.id == Message.correction_id,
+                    corrected.fk_remote_pk == Message.fk_remote_pk,
+                    corrected.fk_account_pk == Message.fk_account_pk,
+                    corrected.fk_occupant_pk.is_(Message.fk_occupant_pk),
+                    corrected.direction == Message.direction,
+                    expr.case(
+                        (
+                            sa.and_(
+                                corrected.type == MessageType.GROUPCHAT,
+                                corrected.fk_occupant_pk.is_(None),
+                            ),
+                            corrected.resource == Message.resource,
+                        ),
+                        else_=1,
+                    ),
+                ),
+            )
+            .where(corrected.pk.in_(pks))
+        )
+        session.execute(delete(Message).where(Message.pk.in_(correction_pks)))
+
+        for table, id_column, select_stmt in (
+            (MessageError, MessageError.message_id, ids),
+            (Receipt, Receipt.id, ids),
+            (Moderation, Moderation.stanza_id, stanza_ids),
+            (DisplayedMarker, DisplayedMarker.id, reference_ids),
+            (Reaction, Reaction.id, reference_ids),
+        ):
+            stmt = delete(table).where(
+                sa.tuple_(id_column, table.fk_remote_pk, table.fk_account_pk).in_(
+                    select_stmt
+                )
+            )
+            session.execute(stmt)
+
+        session.execute(delete(Message).where(Message.pk.in_(pks)))
+
+    @with_read_session
     @timeit
     def get_messages_for_export(
         self, session: Session, account: str, jid: JID
     ) -> Iterator[Message]:
-        fk_account_pk = self._get_account_pk(session, account)
-        fk_remote_pk = self._get_jid_pk(session, jid)
+        fk_account_pk = self._find_account_pk(session, account)
+        fk_remote_pk = self._find_jid_pk(session, jid)
+        if fk_account_pk is None or fk_remote_pk is None:
+            return
 
         stmt = (
             select(Message)
@@ -19,6 +19,8 @@
 import sys
 import time
 from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timezone
 from pathlib import Path
@@ -49,6 +51,11 @@
 P = ParamSpec('P')
 R = TypeVar('R')
 
+# Incremental vacuum only runs if at least this fraction of pages is free
+VACUUM_FREE_RATIO = 0.1
+# Maximum pages returned to the file system per incremental vacuum step
+VACUUM_STEP_PAGES = 1024
+
 
 class ValueMissingT:
     pass
@@ -315,14 +322,22 @@ def __init__(
         log: logging.Logger,
         path: Path | None,
         pragma: dict[str, str] | None = None,
+        commit_delay: int = 500,
     ) -> None:
         self._log = log
         self._path = path
         self._engine = self._create_engine()
         self._session = self._create_session()
+        self._commit_delay = commit_delay
         self._commit_source_id = None
         self._pragma = pragma or {}
 
+        self._batch_session: Session | None = None
+        self._batch_holders = 0
+
+        self._read_engine: Engine | None = None
+        self._read_executor: ThreadPoolExecutor | None = None
+
     def init(self) -> None:
         if self._path is None or not self._path.exists():
             self._create_storage()
@@ -338,6 +353,182 @@ def get_session(self) -> Session:
     def get_engine(self) -> Engine:
         return self._engine
 
+    def begin_batch(self) -> None:
+        '''
+        Route all queries into one shared transaction until end_batch()
+        is called. Rows are flushed immediately so pks are available, but
+        they are only committed by commit_batch() or after commit_delay.
+        Calls can be nested, the batch ends with the last end_batch().
+        '''
+        self._batch_holders += 1
+        if self._commit_source_id is None:
+            self._commit_source_id = GLib.timeout_add(
+                self._commit_delay, self._on_batch_timeout
+            )
+
+    def end_batch(self) -> None:
+        if self._batch_holders == 0:
+            return
+
+        self._batch_holders -= 1
+        if self._batch_holders > 0:
+            return
+
+        if self._commit_source_id is not None:
+            GLib.source_remove(self._commit_source_id)
+            self._commit_source_id = None
+
+        self.commit_batch()
+
+    @timeit
+    def commit_batch(self) -> None:
+        session = self._batch_session
+        if session is None:
+            return
+
+        self._batch_session = None
+        try:
+            session.commit()
+        except Exception:
+            self._log.exception('Failed to commit batch')
+            session.rollback()
+            self._on_batch_rollback()
+        finally:
+            session.close()
+
+    def _on_batch_timeout(self) -> bool:
+        self.commit_batch()
+        return True
+
+    def _on_batch_rollback(self) -> None:
+        pass
+
+    def _get_batch_session(self) -> Session | None:
+        if self._batch_holders == 0:
+            return None
+
+        if self._batch_session is None:
+            session = self._create_session()
+            session.begin()
+            # pysqlite defers BEGIN until the first DML statement, a SAVEPOINT
+            # issued before that would open and commit its own transaction
+            session.connection().exec_driver_sql('BEGIN')
+            self._batch_session = session
+
+        return self._batch_session
+
+    def read_async(
+        self,
+        callback: Callable[[R | None], Any],
+        func: Callable[Concatenate[Session, P], R],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> Future[R]:
+        '''
+        Run func in a worker thread with its own connection to the database.
+        The result is passed to callback in the main loop, or None if the
+        query failed. Cancelling the returned future before it finished
+        means callback is never called.
+
+        func must only read, it sees the last committed state of the database.
+        '''
+
+        if self._path is None:
+            # In memory databases only exist on the connection which
+            # created them, so there is nothing a worker could connect to
+            future: Future[R] = Future()
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(
+                    self._run_read(self._engine, func, *args, **kwargs))
+            except Exception as error:
+                future.set_exception(error)
+
+        else:
+            if self._read_executor is None:
+                self._read_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='gajim-storage-read')
+
+            future = self._read_executor.submit(
+                self._run_read, self._get_read_engine(), func, *args, **kwargs)
+
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self._on_read_finished, f, callback))
+        return future
+
+    @staticmethod
+    def _run_read(
+        engine: Engine,
+        func: Callable[Concatenate[Session, P], R],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> R:
+
+        with Session(
+            engine, expire_on_commit=False, autoflush=False
+        ) as session, session.begin():
+            return func(session, *args, **kwargs)
+
+    def _on_read_finished(
+        self, future: Future[R], callback: Callable[[R | None], Any]
+    ) -> None:
+
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        if error is not None:
+            self._log.error('Read query failed', exc_info=error)
+            callback(None)
+            return
+
+        callback(future.result())
+
+    def _shutdown_read_executor(self) -> None:
+        if self._read_executor is not None:
+            self._read_executor.shutdown(cancel_futures=True)
+            self._read_executor = None
+
+        if self._read_engine is not None:
+            self._read_engine.dispose()
+            self._read_engine = None
+
+    def _get_read_engine(self) -> Engine:
+        '''
+        Returns the engine for read-only connections. With WAL, readers on
+        these connections neither block writers nor wait for them.
+        '''
+
+        if self._path is None:
+            return self._engine
+
+        if self._read_engine is None:
+            self._read_engine = self._create_read_engine()
+        return self._read_engine
+
+    def _create_read_engine(self) -> Engine:
+        assert self._path is not None
+        self._log.info('Create read-only engine')
+
+        uri = f'{self._path.absolute().as_uri()}?mode=ro'
+        engine = sa.create_engine(
+            'sqlite://',
+            creator=lambda: sqlite3.connect(
+                uri, uri=True, check_same_thread=False),
+            poolclass=sa.pool.QueuePool,
+            echo=False,
+        )
+        event.listen(engine, 'connect', self._set_read_only_pragma)
+        return engine
+
+    @staticmethod
+    def _set_read_only_pragma(
+        dbapi_connection: DBAPIConnection, _connection_record: Any
+    ) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+
     def _set_sqlite_pragma(
         self, dbapi_connection: DBAPIConnection, _connection_record: Any
     ) -> None:
@@ -355,6 +546,52 @@ def _run_analyze(self) -> None:
             cursor = connection.cursor()
             cursor.execute('PRAGMA analysis_limit=400')
             cursor.execute('PRAGMA optimize')
+
+        self.run_incremental_vacuum()
+
+    def run_incremental_vacuum(self, max_pages: int = VACUUM_STEP_PAGES) -> bool:
+        '''
+        Return up to max_pages free pages to the file system, if the
+        database uses auto_vacuum=INCREMENTAL and enough pages are free.
+
+        returns True if there are more pages which should be freed
+        '''
+
+        with self._session as s:
+            connection = s.connection().connection.dbapi_connection
+            assert connection is not None
+            cursor = connection.cursor()
+
+            auto_vacuum = cursor.execute('PRAGMA auto_vacuum').fetchone()[0]
+            if auto_vacuum != 2:  # INCREMENTAL
+                return False
+
+            free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+            pages = cursor.execute('PRAGMA page_count').fetchone()[0]
+            if free_pages == 0 or free_pages < pages * VACUUM_FREE_RATIO:
+                return False
+
+            self._log.info('Incremental vacuum, %s of %s pages free',
+                           free_pages, pages)
+
+            # execute() steps the pragma only once which frees a single
+            # page, executescript() runs it to completion
+            cursor.executescript(f'PRAGMA incremental_vacuum({max_pages})')
+            return free_pages > max_pages
+
+    @timeit
+    def vacuum(self) -> None:
+        '''
+        Rebuild the whole database file. This also switches the database
+        to auto_vacuum=INCREMENTAL, so later only run_incremental_vacuum()
+        is needed. Depending on the database size this takes a long time.
+        '''
+
+        with self._session as s:
+            connection = s.connection().connection.dbapi_connection
+            assert connection is not None
+            cursor = connection.cursor()
+            cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
             cursor.execute('VACUUM')
 
     def _get_user_version(self) -> int:
@@ -398,6 +635,7 @@ def _create_table(self, session: Session, engine: Engine) -> None:
         raise NotImplementedError
 
     def _reinit_storage(self) -> None:
+        self._shutdown_read_executor()
         self._engine.dispose()
         if self._path is not None:
             self._path.unlink()
@@ -428,6 +666,14 @@ def _explain(self, session: Session, stmt: Any) -> None:
         log.debug('\n%s\n%s', stmt, explanation)
 
     def shutdown(self) -> None:
+        if self._commit_source_id is not None:
+            GLib.source_remove(self._commit_source_id)
+            self._commit_source_id = None
+
+        self._batch_holders = 0
+        self.commit_batch()
+
+        self._shutdown_read_executor()
         self._run_analyze()
         self._engine.dispose()
         del self._session
@@ -438,12 +684,45 @@ def with_session(
     func: Callable[Concatenate[Any, Session, P], R]
 ) -> Callable[Concatenate[Any, P], R]:
     def wrapper(self: Any, *args: P.args, **kwargs: P.kwargs) -> R:
+        session = self._get_batch_session()
+        if session is not None:
+            try:
+                return func(self, session, *args, **kwargs)
+            finally:
+                # Do not hand out stale objects from the identity map
+                # on the next call, like a fresh session would not
+                session.expunge_all()
+
         with self._create_session() as session, session.begin():
             return func(self, session, *args, **kwargs)
 
     return wrapper
 
 
+def with_read_session(
+    func: Callable[Concatenate[Any, Session, P], R]
+) -> Callable[Concatenate[Any, P], R]:
+    '''
+    Like with_session, but func runs on a read-only connection. Rows of
+    a pending batch are committed first, so func sees them.
+    '''
+
+    func_with_session = with_session(func)
+
+    def wrapper(self: Any, *args: P.args, **kwargs: P.kwargs) -> R:
+        if self._path is None:
+            # In memory databases only exist on their one connection
+            return func_with_session(self, *args, **kwargs)
+
+        self.commit_batch()
+        with Session(
+            self._get_read_engine(), expire_on_commit=False, autoflush=False
+        ) as session, session.begin():
+            return func(self, session, *args, **kwargs)
+
+    return wrapper
+
+
 class JIDType(sa.types.TypeDecorator[JID]):
     impl = sa.types.TEXT
     cache_ok = True
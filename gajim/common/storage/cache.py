@@ -26,7 +26,7 @@
 
 ContactCacheDictT = dict[tuple[str, JID], dict[str, Any]]
 
-CURRENT_USER_VERSION = 10
+CURRENT_USER_VERSION = 11
 
 CACHE_SQL_STATEMENT = '''
     CREATE TABLE caps_cache (
@@ -68,9 +68,18 @@
             PRIMARY KEY (account, jid)
     );
 
+    CREATE TABLE disk_cache(
+            kind TEXT,
+            name TEXT,
+            size INTEGER,
+            last_access INTEGER,
+            PRIMARY KEY (kind, name)
+    );
+
     CREATE INDEX idx_unread ON unread(account, jid);
     CREATE INDEX idx_contact ON contact(jid);
     CREATE INDEX idx_muc ON muc(jid);
+    CREATE INDEX idx_disk_cache_last_access ON disk_cache(last_access);
 
     PRAGMA user_version=%s;
     ''' % CURRENT_USER_VERSION
@@ -78,10 +87,23 @@
 log = logging.getLogger('gajim.c.storage.cache')
 
 
+class DiskCacheRow(NamedTuple):
+    kind: str
+    name: str
+    size: int | None
+    last_access: int
+
+
+class DiskCacheUsage(NamedTuple):
+    kind: str
+    files: int
+    size: int
+
+
 class UnreadTableRow(NamedTuple):
     account: str
     jid: JID
-    count: int  # pyright: ignore
+    files: int
     message_id: str
     timestamp: float
 
@@ -135,6 +157,20 @@ def _migrate(self) -> None:
             self._reinit_storage()
             return
 
+        if user_version < 11:
+            statements = [
+                '''CREATE TABLE disk_cache(
+                    kind TEXT,
+                    name TEXT,
+                    size INTEGER,
+                    last_access INTEGER,
+                    PRIMARY KEY (kind, name))''',
+                '''CREATE INDEX idx_disk_cache_last_access
+                   ON disk_cache(last_access)''',
+                'PRAGMA user_version=11',
+            ]
+            self._execute_multiple(statements)
+
     @timeit
     def _load_caps_data(self) -> None:
         rows = self._con.execute(
@@ -394,3 +430,75 @@ def reset_unread_count(self, account: str, jid: JID) -> None:
         sql = 'DELETE FROM unread WHERE account = ? AND jid = ?'
         self._con.execute(sql, (account, jid))
         self._delayed_commit()
+
+    @timeit
+    def touch_disk_cache_file(self,
+                              kind: str,
+                              name: str,
+                              size: int | None = None,
+                              last_access: int | None = None) -> None:
+        '''
+        Record an access to a file of the disk cache
+
+        :param size:  The file size, None keeps the known size
+        '''
+
+        if last_access is None:
+            last_access = int(time.time())
+
+        sql = '''INSERT INTO disk_cache (kind, name, size, last_access)
+                 VALUES (?, ?, ?, ?)
+                 ON CONFLICT (kind, name) DO UPDATE SET
+                 size = COALESCE(excluded.size, size),
+                 last_access = excluded.last_access'''
+        self._con.execute(sql, (kind, name, size, last_access))
+        self._delayed_commit()
+
+    @timeit
+    def sync_disk_cache_files(self,
+                              files: list[DiskCacheRow],
+                              scan_started: int) -> None:
+        '''
+        Add files which are not yet tracked, update file sizes and remove
+        rows of files which do not exist anymore.
+
+        Rows touched after scan_started are kept, because the files
+        may have been created after the scan.
+        '''
+
+        sql = '''INSERT INTO disk_cache (kind, name, size, last_access)
+                 VALUES (?, ?, ?, ?)
+                 ON CONFLICT (kind, name) DO UPDATE SET
+                 size = excluded.size'''
+        self._con.executemany(sql, files)
+
+        existing = {(row.kind, row.name) for row in files}
+        rows = self._con.execute(
+            'SELECT kind, name FROM disk_cache WHERE last_access < ?',
+            (scan_started,)).fetchall()
+        removed = [(row.kind, row.name) for row in rows
+                   if (row.kind, row.name) not in existing]
+        self.remove_disk_cache_files(removed)
+
+    @timeit
+    def get_disk_cache_lru(self) -> list[DiskCacheRow]:
+        '''
+        Get all tracked files, least recently used first
+        '''
+
+        sql = '''SELECT kind, name, size, last_access FROM disk_cache
+                 ORDER BY last_access ASC'''
+        return self._con.execute(sql).fetchall()
+
+    @timeit
+    def get_disk_cache_usage(self) -> list[DiskCacheUsage]:
+        sql = '''SELECT kind, count(*) as files,
+                 COALESCE(SUM(size), 0) as size
+                 FROM disk_cache GROUP BY kind'''
+        return self._con.execute(sql).fetchall()
+
+    @timeit
+    def remove_disk_cache_files(self, files: list[tuple[str, str]]) -> None:
+        sql = 'DELETE FROM disk_cache WHERE kind = ? AND name = ?'
+        self._con.executemany(sql, files)
+        self._delayed_commit()
@@ -14,10 +14,12 @@
 
 from gi.repository import GLib
 
+from gajim.common import app
 from gajim.common import regex
 from gajim.common.const import URIType
 from gajim.common.helpers import parse_uri as analyze_uri
 from gajim.common.helpers import validate_jid
+from gajim.common.util.classes import LRUCache
 from gajim.common.util.text import escape_iri_query
 
 PRE = '`'
@@ -39,11 +41,31 @@
 
 URI_OR_JID_RX = re.compile(
     fr'(?P<uri>(?<![\w+.-]){regex.IRI})|(?P<jid>{regex.XMPP.jid})')
+# A match of URI_OR_JID_RX starts with the scheme of an IRI followed by
+# ':', or with the localpart of a JID followed by '@'. Searching for them
+# backwards from ':' or '@' in the reversed text finds where a match can
+# start, the scheme is preceded by neither a word character nor '+.-'.
+REVERSED_URI_OR_JID_START_RX = re.compile(
+    r':[a-zA-Z0-9+.-]*[a-zA-Z](?![\w+.-])'
+    fr'|@(?:{regex.XMPP.localpart_char})+')
+# parse_uri() returns URIType.WEB for http(s) URIs with a host which
+# urlparse() accepts, this is known without parsing for ASCII hosts
+WEB_URI_RX = re.compile(r'(?i:https?)://(?P<host>[^/?#]+)')
+SCHEME_ONLY_RX = re.compile('[^:]+:')
+SPAN_DIRS_RX = re.compile(f'[{re.escape(PRE + STRONG + STRIKE + EMPH)}]')
+# Spans are only opened by a valid span start (see _parse_line), lines
+# without a match can not contain a span. Also matches after characters
+# which str.splitlines() treats as line boundaries.
+SPAN_START_CANDIDATE_RX = re.compile(
+    r'[`*~_]'
+    r'(?<![^\s\x1c-\x1e\x85\u2028\u2029`*~_][`*~_])'
+    r'(?![ \t\n\r\x0b\x0c])')
 
-SD = 0
-SD_POS = 1
 MAX_QUOTE_LEVEL = 20
 
+# Maximum number of characters of text held by the parsing cache
+PARSING_CACHE_SIZE = 2_000_000
+
 
 @dataclass
 class StyleObject:
@@ -168,52 +190,80 @@ class ParsingResult:
     blocks: list[Block]
 
 
-def find_byte_index(text: str, index: int):
-    byte_index = -1
-    for index_, c in enumerate(text):
-        byte_index += len(c.encode())
-        if index == index_:
-            return byte_index
+_parsing_cache: LRUCache[tuple[str, str], ParsingResult] = LRUCache(
+    PARSING_CACHE_SIZE, size_func=lambda result: len(result.text))
+
+
+def find_byte_index(text: str, index: int) -> int:
+    '''
+    Returns the index of the last UTF-8 byte of the character at `index`
+    '''
+    if not 0 <= index < len(text):
+        raise ValueError(f'index not in string: {text}, {index}')
+
+    if text.isascii():
+        return index
 
-    raise ValueError(f'index not in string: {text}, {index}')
+    return len(text[:index + 1].encode()) - 1
 
 
-def process(text: str | bytes, level: int = 0) -> ParsingResult:
+def process(text: str | bytes,
+            level: int = 0,
+            cache: bool = True) -> ParsingResult:
+    '''
+    Results are cached and shared between callers, they must not be
+    modified. Pass cache=False for texts which are unlikely to be
+    processed again, e.g. the message input while typing.
+    '''
     if isinstance(text, bytes):
         text = text.decode()
 
+    if level > 0 or not cache:
+        return _process(text, level)
+
+    # Detection of hyperlinks depends on this setting
+    key = (text, app.settings.get('additional_uri_schemes'))
+    result = _parsing_cache.get(key)
+    if result is None:
+        result = _process(text, level)
+        _parsing_cache.set(key, result)
+    return result
+
+
+def _process(text: str, level: int) -> ParsingResult:
     blocks = _parse_blocks(text, level)
     for block in blocks:
         if isinstance(block, PlainBlock):
-            offset = 0
-            offset_bytes = 0
-            for line in block.text.splitlines(keepends=True):
-                block.spans += _parse_line(line, offset, offset_bytes)
-                block.uris += _parse_uris(line, offset, offset_bytes)
-
-                offset += len(line)
-                offset_bytes += len(line.encode())
+            _parse_plain_block(block)
 
         if isinstance(block, QuoteBlock):
-            result = process(block.unquote(), level=level + 1)
+            result = _process(block.unquote(), level + 1)
             block.blocks = result.blocks
 
     return ParsingResult(text, blocks)
 
 
-def process_uris(text: str | bytes) -> list[BaseHyperlink]:
-    if isinstance(text, bytes):
-        text = text.decode()
+def _parse_plain_block(block: PlainBlock) -> None:
+    # Scan the whole block once, most blocks contain no spans and need
+    # no parsing line by line
+    block.uris = _parse_uris(block.text)
+    if SPAN_START_CANDIDATE_RX.search(block.text) is None:
+        return
 
-    uris: list[BaseHyperlink] = []
+    is_ascii = block.text.isascii()
     offset = 0
     offset_bytes = 0
-    for line in text.splitlines(keepends=True):
-        uris += _parse_uris(line, offset, offset_bytes)
+    for line in block.text.splitlines(keepends=True):
+        block.spans += _parse_line(line, offset, offset_bytes)
         offset += len(line)
-        offset_bytes += len(line.encode())
+        offset_bytes += len(line) if is_ascii else len(line.encode())
 
-    return uris
+
+def process_uris(text: str | bytes) -> list[BaseHyperlink]:
+    if isinstance(text, bytes):
+        text = text.decode()
+
+    return _parse_uris(text)
 
 
 def _parse_blocks(text: str, level: int) -> list[Block]:
@@ -223,6 +273,13 @@ def _parse_blocks(text: str, level: int) -> list[Block]:
 
     rx = BLOCK_NESTED_RX if level > 0 else BLOCK_RX
 
+    # Blocks start at the beginning of a line with ``` or >
+    if (not text.startswith((PRE * 3, '>')) and
+            f'\n{PRE * 3}' not in text and '\n>' not in text):
+        if text:
+            blocks.append(PlainBlock(start=0, end=text_len, text=text))
+        return blocks
+
     for match in rx.finditer(text):
         if match.start() != last_end_pos:
             blocks.append(PlainBlock(
@@ -252,110 +309,170 @@ def _parse_blocks(text: str, level: int) -> list[Block]:
 
 
 def _parse_line(line: str, offset: int, offset_bytes: int) -> list[Span]:
-    index: int = 0
-    length = len(line)
-    stack: list[tuple[str, int]] = []
+    '''
+    https://xmpp.org/extensions/xep-0393.html#span
+
+    ... The opening styling directive MUST be located at the beginning
+    of the line, after a whitespace character, or after a different opening
+    styling directive. The opening styling directive MUST NOT be followed
+    by a whitespace character and the closing styling directive MUST NOT
+    be preceded by a whitespace character ...
+    '''
     spans: list[Span] = []
+    if SPAN_START_CANDIDATE_RX.search(line) is None:
+        return spans
 
-    while index < length:
-        sd = line[index]
-        if sd not in SPAN_DIRS:
-            index += 1
+    length = len(line)
+    # Opened styling directives and their positions
+    open_sds: list[str] = []
+    open_positions: list[int] = []
+    # Directives before this index are part of a preformatted span
+    skip_to = 0
+
+    for match in SPAN_DIRS_RX.finditer(line):
+        index = match.start()
+        if index < skip_to:
             continue
 
-        is_valid_start = _is_valid_span_start(line, index)
-        is_valid_end = _is_valid_span_end(line, index)
+        sd = match.group()
+        prev_char = line[index - 1] if index > 0 else None
+
+        is_valid_start = (index + 1 < length and
+                          line[index + 1] not in WHITESPACE and
+                          (prev_char is None or
+                           prev_char in VALID_SPAN_START))
+        is_valid_end = prev_char is not None and prev_char not in WHITESPACE
 
         if is_valid_start and is_valid_end:
             # Favor end over new start, this means parsing is done non-greedy
-            if sd in [open_sd for open_sd, _ in stack]:
+            if sd in open_sds:
                 is_valid_start = False
 
         if is_valid_start:
             if sd == PRE:
-                index = _handle_pre_span(line,
-                                         index,
-                                         offset,
-                                         offset_bytes,
-                                         spans)
+                # Scan ahead for the end, empty spans are ignored
+                end = line.find(PRE, index + 1)
+                if end - index > 1:
+                    spans.append(_make_span(line,
+                                            sd,
+                                            index,
+                                            end,
+                                            offset,
+                                            offset_bytes))
+                    skip_to = end + 1
                 continue
 
-            stack.append((sd, index))
-            index += 1
+            open_sds.append(sd)
+            open_positions.append(index)
             continue
 
-        if is_valid_end:
-            if sd not in [open_sd for open_sd, _ in stack]:
-                index += 1
-                continue
+        if not is_valid_end or sd not in open_sds:
+            continue
 
-            if _is_span_empty(sd, index, stack):
-                stack.pop()
-                index += 1
-                continue
+        if open_sds[-1] == sd and open_positions[-1] == index - 1:
+            # Empty span
+            open_sds.pop()
+            open_positions.pop()
+            continue
 
-            start_pos = _find_span_start_position(sd, stack)
-            spans.append(_make_span(line,
-                                    sd,
-                                    start_pos,
-                                    index,
-                                    offset,
-                                    offset_bytes))
+        # Close the span, and all spans opened after it
+        while open_sds.pop() != sd:
+            open_positions.pop()
+        start_pos = open_positions.pop()
 
-        index += 1
+        spans.append(_make_span(line,
+                                sd,
+                                start_pos,
+                                index,
+                                offset,
+                                offset_bytes))
 
     return spans
 
 
-def _parse_uris(line: str,
-                offset: int,
-                offset_bytes: int) -> list[BaseHyperlink]:
+def _parse_uris(text: str) -> list[BaseHyperlink]:
     uris: list[BaseHyperlink] = []
+    lines: list[str] = []
+    line_index = -1
+    line_start = 0
+    line_end = 0
+    line_start_bytes = 0
+    # End of the last match, like URI_OR_JID_RX.finditer() matching
+    # continues there
+    last_end = 0
+
+    # Instead of trying URI_OR_JID_RX at every position, only try it at
+    # the start of a scheme or localpart, no other match is possible
+    length = len(text)
+    candidates = list(REVERSED_URI_OR_JID_START_RX.finditer(text[::-1]))
+    for candidate in reversed(candidates):
+        # Position of ':' or '@' in text
+        if length - candidate.start() <= last_end:
+            continue
 
-    def make(start: int, end: int, is_jid: bool) -> BaseHyperlink | None:
-        if line[end - 1] == ',':
-            # Trim one trailing comma
-            end -= 1
-        if '(' in line[:start] and line[end - 1] == ')':
-            # Trim one trailing closing parenthesis if the match is preceded
-            # by an opening one somewhere on the line
-            end -= 1
-        if re.fullmatch('[^:]+:', line[start:end]):
-            # URIs that consist only of a scheme are thusly excluded
-            return None
-        return _make_hyperlink(line,
-                               start,
-                               end - 1,
-                               offset,
-                               offset_bytes,
-                               is_jid)
-
-    for match in URI_OR_JID_RX.finditer(line):
-        start, end = match.span()
-        hyperlink = make(start, end, bool(match.group('jid')))
-        if hyperlink:
+        start = max(length - candidate.end(), last_end)
+        if start >= line_end:
+            # Advance to the line containing the candidate, matches are
+            # done line by line
+            if not lines:
+                lines = text.splitlines(keepends=True)
+            while start >= line_end:
+                if line_index >= 0:
+                    line_start_bytes += len(lines[line_index].encode())
+                line_index += 1
+                line_start = line_end
+                line_end += len(lines[line_index])
+
+        match = URI_OR_JID_RX.match(text, start, line_end)
+        if match is None:
+            continue
+
+        last_end = match.end()
+        hyperlink = _make_hyperlink_from_match(lines[line_index],
+                                               match.start() - line_start,
+                                               last_end - line_start,
+                                               line_start,
+                                               line_start_bytes,
+                                               match.group('jid') is not None)
+        if hyperlink is not None:
             uris.append(hyperlink)
 
     return uris
 
 
-def _handle_pre_span(line: str,
-                     index: int,
-                     offset: int,
-                     offset_bytes: int,
-                     spans: list[Span]) -> int:
-
-    # Scan ahead for the end
-    end = line.find(PRE, index + 1)
-    if end == -1:
-        return index + 1
-
-    if end - index == 1:
-        # empty span
-        return index + 1
-
-    spans.append(_make_span(line, PRE, index, end, offset, offset_bytes))
-    return end + 1
+def _make_hyperlink_from_match(line: str,
+                               start: int,
+                               end: int,
+                               offset: int,
+                               offset_bytes: int,
+                               is_jid: bool) -> BaseHyperlink | None:
+
+    if line[end - 1] == ',':
+        # Trim one trailing comma
+        end -= 1
+    if line[end - 1] == ')' and '(' in line[:start]:
+        # Trim one trailing closing parenthesis if the match is preceded
+        # by an opening one somewhere on the line
+        end -= 1
+    if SCHEME_ONLY_RX.fullmatch(line, start, end):
+        # URIs that consist only of a scheme are thusly excluded
+        return None
+    return _make_hyperlink(line,
+                           start,
+                           end - 1,
+                           offset,
+                           offset_bytes,
+                           is_jid)
+
+
+def _get_uri_type(uri: str) -> URIType:
+    match = WEB_URI_RX.match(uri)
+    if match is not None:
+        host = match.group('host')
+        if host.isascii() and '[' not in host and ']' not in host:
+            return URIType.WEB
+
+    return analyze_uri(uri).type
 
 
 def _make_span(line: str,
@@ -367,8 +484,12 @@ def _make_span(line: str,
 
     text = line[start:end + 1]
 
-    start_byte = find_byte_index(line, start) + offset_bytes
-    end_byte = find_byte_index(line, end) + offset_bytes + 1
+    if line.isascii():
+        start_byte = start + offset_bytes
+        end_byte = end + offset_bytes + 1
+    else:
+        start_byte = find_byte_index(line, start) + offset_bytes
+        end_byte = find_byte_index(line, end) + offset_bytes + 1
 
     start += offset
     end += offset + 1
@@ -391,8 +512,12 @@ def _make_hyperlink(line: str,
 
     text = line[start:end + 1]
 
-    start_byte = find_byte_index(line, start) + offset_bytes
-    end_byte = find_byte_index(line, end) + offset_bytes + 1
+    if line.isascii():
+        start_byte = start + offset_bytes
+        end_byte = end + offset_bytes + 1
+    else:
+        start_byte = find_byte_index(line, start) + offset_bytes
+        end_byte = find_byte_index(line, end) + offset_bytes + 1
 
     start += offset
     end += offset + 1
@@ -408,12 +533,12 @@ def _make_hyperlink(line: str,
 
     else:
         uri = text
-        auri = analyze_uri(uri)
-        if auri.type == URIType.XMPP:
+        uri_type = _get_uri_type(uri)
+        if uri_type == URIType.XMPP:
             cls_ = XMPPAddress
-        elif auri.type == URIType.MAIL:
+        elif uri_type == URIType.MAIL:
             cls_ = MailAddress
-        elif auri.type == URIType.INVALID:
+        elif uri_type == URIType.INVALID:
             return None
         else:
             cls_ = Hyperlink
@@ -424,61 +549,3 @@ def _make_hyperlink(line: str,
                 end_byte=end_byte,
                 uri=uri,
                 text=text)
-
-
-def _is_span_empty(sd: str, index: int, stack: list[tuple[str, int]]) -> bool:
-    start_sd = stack[-1][SD]
-    if start_sd != sd:
-        return False
-
-    pos = stack[-1][SD_POS]
-    return pos == index - 1
-
-
-def _find_span_start_position(sd: str, stack: list[tuple[str, int]]) -> int:
-    while stack:
-        start_sd, pos = stack.pop()
-        if start_sd == sd:
-            return pos
-
-    raise ValueError('Unable to find opening span')
-
-
-def _is_valid_span_start(line: str, index: int) -> bool:
-    '''
-    https://xmpp.org/extensions/xep-0393.html#span
-
-    ... The opening styling directive MUST be located at the beginning
-    of the line, after a whitespace character, or after a different opening
-    styling directive. The opening styling directive MUST NOT be followed
-    by a whitespace character ...
-    '''
-
-    try:
-        char = line[index + 1]
-    except IndexError:
-        return False
-
-    if char in WHITESPACE:
-        return False
-
-    if index == 0:
-        return True
-
-    char = line[index - 1]
-    return char in VALID_SPAN_START
-
-
-def _is_valid_span_end(line: str, index: int) -> bool:
-    '''
-    https://xmpp.org/extensions/xep-0393.html#span
-
-    ... and the closing styling directive MUST NOT be preceded
-    by a whitespace character ...
-    '''
-
-    if index == 0:
-        return False
-
-    char = line[index - 1]
-    return char not in WHITESPACE
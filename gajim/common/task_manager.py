@@ -4,82 +4,500 @@
 
 from __future__ import annotations
 
+from typing import Any
+from typing import NamedTuple
+
 import functools
+import heapq
+import itertools
 import logging
-import queue
+import time
+from collections.abc import Callable
+from collections.abc import Hashable
 
 from gi.repository import GLib
+from nbxmpp.protocol import JID
 
 log = logging.getLogger('gajim.c.m.task_manager')
 
+MAX_RUNNING_TASKS = 12
+MAX_RUNNING_TASKS_PER_ACCOUNT = 6
+MAX_RUNNING_TASKS_PER_SERVER = 3
+
+# Rates in tasks per second, a budget allows bursts of up to
+# RATE_BURST tasks after being idle
+ACCOUNT_RATE = 10.0
+SERVER_RATE = 3.0
+RATE_BURST = 10
+
+# Seconds until tasks whose preconditions are not met are checked again
+RETRY_INTERVAL = 2
+
+# Seconds after which a running task which never reported to be finished
+# does not count against the limits anymore
+TASK_TIMEOUT = 60
+
+
+QueueEntryT = tuple[int, int, 'Task']
+
+
+class TaskManagerStats(NamedTuple):
+    queued: int
+    running: int
+    max_queued: int
+    executed: int
+    finished: int
+    obsolete: int
+    deduplicated: int
+    timed_out: int
+    # Seconds between adding and executing a task
+    avg_wait_time: float
+    max_wait_time: float
+    # Seconds between executing a task and it being finished
+    avg_run_time: float
+
+
+class Budget:
+    '''
+    Limits the number of running tasks and the rate at which tasks are
+    started (token bucket)
+    '''
+
+    def __init__(self, max_running: int, rate: float, burst: int) -> None:
+        self.running = 0
+        self._max_running = max_running
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+        self._last_refill = now
+
+    def get_delay(self, now: float) -> float | None:
+        '''
+        Return seconds until a task may be started, or None if the budget
+        has to wait for a running task to finish
+        '''
+
+        if self.running >= self._max_running:
+            return None
+
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self._rate
+
+    def get_free_slots(self, now: float) -> int:
+        '''
+        Return how many tasks may be started now
+        '''
+
+        if self.running >= self._max_running:
+            return 0
+
+        self._refill(now)
+        return min(self._max_running - self.running, int(self._tokens))
+
+    def consume(self) -> None:
+        self._tokens -= 1
+        self.running += 1
+
+    def release(self) -> None:
+        self.running -= 1
+
 
 class TaskManager:
+    '''
+    Executes queued tasks by priority, several at once but limited per
+    account and per server.
+
+    Tasks report via Task.set_finished() when the request they started
+    has finished. Tasks for the same entity are deduplicated, tasks with
+    the same coalesce key are never executed at the same time, so that
+    the result of the first can make the others obsolete.
+    '''
+
     def __init__(self) -> None:
-        self._timeout: int | None = None
-        self._queue: queue.PriorityQueue[Task] = queue.PriorityQueue()
+        self._source_id: int | None = None
+        self._source_time: float | None = None
 
-    def _start_worker(self) -> None:
-        self._timeout = GLib.timeout_add_seconds(2, self._process_queue)
+        self._queue: list[QueueEntryT] = []
+        self._counter = itertools.count()
+        self._queued_entities: dict[Hashable, Task] = {}
+
+        # Tasks which can not run until a budget has room again or a
+        # coalesce key is released, they are not in the queue meanwhile
+        self._parked_by_budget: dict[Budget, list[QueueEntryT]] = {}
+        self._parked_by_key: dict[Hashable, list[QueueEntryT]] = {}
+        self._parked_count = 0
+
+        # Tasks define __eq__ by priority, so they are stored by id
+        self._running: dict[int, tuple[Task, list[Budget]]] = {}
+        self._running_keys: set[Hashable] = set()
+
+        self._account_budgets: dict[str, Budget] = {}
+        self._server_budgets: dict[str, Budget] = {}
+
+        self._max_queued = 0
+        self._executed = 0
+        self._finished = 0
+        self._obsolete = 0
+        self._deduplicated = 0
+        self._timed_out = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._run_time = 0.0
+
+    def add_task(self, task: Task) -> None:
+        log.info('Adding task: %r', task)
+
+        entity_key = task.get_entity_key()
+        if entity_key is not None:
+            queued_task = self._queued_entities.get(entity_key)
+            if queued_task is not None and not queued_task.is_obsolete():
+                log.info('Replace queued task: %r', queued_task)
+                queued_task.set_obsolete()
+                self._deduplicated += 1
+            self._queued_entities[entity_key] = task
+
+        task.added = time.monotonic()
+        heapq.heappush(self._queue,
+                       (task.priority, next(self._counter), task))
+        self._max_queued = max(self._max_queued, self._get_queued_count())
+        self._schedule(0)
+
+    def _get_queued_count(self) -> int:
+        return len(self._queue) + self._parked_count
+
+    def get_stats(self) -> TaskManagerStats:
+        executed = max(self._executed, 1)
+        finished = max(self._finished, 1)
+        return TaskManagerStats(
+            queued=self._get_queued_count(),
+            running=len(self._running),
+            max_queued=self._max_queued,
+            executed=self._executed,
+            finished=self._finished,
+            obsolete=self._obsolete,
+            deduplicated=self._deduplicated,
+            timed_out=self._timed_out,
+            avg_wait_time=self._wait_time / executed,
+            max_wait_time=self._max_wait_time,
+            avg_run_time=self._run_time / finished)
+
+    def _schedule(self, delay: float) -> None:
+        due = time.monotonic() + delay
+        if self._source_id is not None:
+            assert self._source_time is not None
+            if self._source_time <= due:
+                return
+            GLib.source_remove(self._source_id)
+
+        self._source_time = due
+        self._source_id = GLib.timeout_add(int(delay * 1000),
+                                           self._process_queue)
 
     def _process_queue(self) -> bool:
-        log.info('%s tasks queued', self._queue.qsize())
-        requeue: list[Task] = []
-        while not self._queue.empty():
-            task = self._queue.get_nowait()
+        self._source_id = None
+        self._source_time = None
+
+        now = time.monotonic()
+        self._expire_running_tasks(now)
+
+        deferred: list[QueueEntryT] = []
+        next_delay: float | None = None
+
+        while True:
+            unparked, delay = self._unpark_tasks(now)
+            if delay is not None:
+                next_delay = min(next_delay or delay, delay)
+
+            delay = self._start_tasks(now, deferred)
+            if delay is not None:
+                next_delay = min(next_delay or delay, delay)
+
+            # Unparked tasks may have been parked again by another
+            # budget, so their budget can still start more tasks
+            if not unparked or len(self._running) >= MAX_RUNNING_TASKS:
+                break
+
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+
+        if self._running:
+            next_delay = min(next_delay or TASK_TIMEOUT, TASK_TIMEOUT)
+
+        if next_delay is not None:
+            self._schedule(next_delay)
+
+        elif not self._get_queued_count():
+            self._log_stats()
+
+        return False
+
+    def _start_tasks(self,
+                     now: float,
+                     deferred: list[QueueEntryT]) -> float | None:
+        '''
+        Execute queued tasks until the queue is empty or the limit of
+        running tasks is reached, returns seconds until a blocked task
+        may be started
+        '''
+
+        next_delay: float | None = None
+
+        while self._queue and len(self._running) < MAX_RUNNING_TASKS:
+            entry = heapq.heappop(self._queue)
+            task = entry[2]
+
             if task.is_obsolete():
-                log.info('Task obsolete: %r', task)
+                self._remove_queued_task(task)
+                continue
+
+            coalesce_key = task.get_coalesce_key()
+            if coalesce_key is not None and coalesce_key in self._running_keys:
+                # Requeued when the running task is finished
+                self._parked_by_key.setdefault(coalesce_key, []).append(entry)
+                self._parked_count += 1
+                continue
+
+            budgets = self._get_budgets(task)
+            blocked_budget: Budget | None = None
+            blocked_delay: float | None = None
+            for budget in budgets:
+                blocked_delay = budget.get_delay(now)
+                if blocked_delay != 0:
+                    blocked_budget = budget
+                    break
+
+            if blocked_budget is not None:
+                # Requeued when a running task is finished or the rate
+                # allows to start another task
+                heapq.heappush(
+                    self._parked_by_budget.setdefault(blocked_budget, []),
+                    entry)
+                self._parked_count += 1
+                if blocked_delay is not None:
+                    next_delay = min(next_delay or blocked_delay, blocked_delay)
                 continue
 
             if not task.preconditions_met():
-                # precondition_met() can change the obsolete flag, so we need
-                # to check again here
+                # preconditions_met() can change the obsolete flag, so we
+                # need to check again here
                 if task.is_obsolete():
-                    log.info('Task obsolete: %r', task)
+                    self._remove_queued_task(task)
                 else:
-                    requeue.append(task)
+                    log.debug('Requeue task (preconditions not met): %r',
+                              task)
+                    deferred.append(entry)
+                    next_delay = min(next_delay or RETRY_INTERVAL,
+                                     RETRY_INTERVAL)
                 continue
 
-            log.info('Execute task %r', task)
+            self._execute_task(task, budgets, now)
+
+        return next_delay
+
+    def _unpark_tasks(self, now: float) -> tuple[bool, float | None]:
+        '''
+        Move as many parked tasks back into the queue as each budget can
+        start now. Returns whether tasks were moved, and seconds until a
+        rate limited budget can start a task.
+        '''
+
+        unparked = False
+        next_delay: float | None = None
+
+        for budget in list(self._parked_by_budget):
+            free_slots = budget.get_free_slots(now)
+            if free_slots == 0:
+                delay = budget.get_delay(now)
+                if delay is not None:
+                    next_delay = min(next_delay or delay, delay)
+                continue
+
+            parked = self._parked_by_budget[budget]
+            for _num in range(min(free_slots, len(parked))):
+                heapq.heappush(self._queue, heapq.heappop(parked))
+                self._parked_count -= 1
+            if not parked:
+                del self._parked_by_budget[budget]
+            unparked = True
+
+        return unparked, next_delay
+
+    def _get_budgets(self, task: Task) -> list[Budget]:
+        budgets: list[Budget] = []
+
+        account = task.get_account()
+        if account is not None:
+            budget = self._account_budgets.get(account)
+            if budget is None:
+                budget = Budget(MAX_RUNNING_TASKS_PER_ACCOUNT,
+                                ACCOUNT_RATE,
+                                RATE_BURST)
+                self._account_budgets[account] = budget
+            budgets.append(budget)
+
+        server = task.get_server()
+        if server is not None:
+            budget = self._server_budgets.get(server)
+            if budget is None:
+                budget = Budget(MAX_RUNNING_TASKS_PER_SERVER,
+                                SERVER_RATE,
+                                RATE_BURST)
+                self._server_budgets[server] = budget
+            budgets.append(budget)
+
+        return budgets
+
+    def _remove_queued_task(self, task: Task) -> None:
+        log.info('Task obsolete: %r', task)
+        self._obsolete += 1
+        self._remove_queued_entity(task)
+
+    def _remove_queued_entity(self, task: Task) -> None:
+        entity_key = task.get_entity_key()
+        if self._queued_entities.get(entity_key) is task:
+            del self._queued_entities[entity_key]
+
+    def _execute_task(self,
+                      task: Task,
+                      budgets: list[Budget],
+                      now: float) -> None:
+
+        self._remove_queued_entity(task)
+
+        for budget in budgets:
+            budget.consume()
+
+        self._running[id(task)] = (task, budgets)
+        coalesce_key = task.get_coalesce_key()
+        if coalesce_key is not None:
+            self._running_keys.add(coalesce_key)
+
+        wait_time = now - task.added
+        self._wait_time += wait_time
+        self._max_wait_time = max(self._max_wait_time, wait_time)
+        self._executed += 1
+
+        log.info('Execute task %r', task)
+        task.started = now
+        task.set_finished_func(self._on_task_finished)
+        try:
             task.execute()
-            self._requeue_tasks(requeue)
-            return True
+        except Exception:
+            log.exception('Error while executing task %r', task)
+            task.set_finished()
 
-        if self._requeue_tasks(requeue):
-            # Queue is empty, but there are tasks to requeue
-            # don't stop worker
-            return True
+    def _on_task_finished(self, task: Task) -> None:
+        running = self._running.pop(id(task), None)
+        if running is None:
+            return
 
-        # Queue is empty, stop worker
-        self._timeout = None
-        return False
+        _task, budgets = running
+        for budget in budgets:
+            budget.release()
 
-    def _requeue_tasks(self, tasks: list[Task]) -> bool:
-        if not tasks:
-            return False
+        coalesce_key = task.get_coalesce_key()
+        if coalesce_key is not None:
+            self._running_keys.discard(coalesce_key)
+            parked = self._parked_by_key.pop(coalesce_key, [])
+            self._parked_count -= len(parked)
+            for entry in parked:
+                heapq.heappush(self._queue, entry)
 
-        for task in tasks:
-            log.info('Requeue task (preconditions not met): %r', task)
-            self._queue.put_nowait(task)
-        return True
+        task.set_finished_func(None)
 
-    def add_task(self, task: Task) -> None:
-        log.info('Adding task: %r', task)
-        self._queue.put_nowait(task)
-        if self._timeout is None:
-            self._start_worker()
+        self._finished += 1
+        self._run_time += time.monotonic() - task.started
+        self._schedule(0)
+
+    def _expire_running_tasks(self, now: float) -> None:
+        for task, _budgets in list(self._running.values()):
+            if now - task.started < TASK_TIMEOUT:
+                continue
+
+            log.warning('Task did not finish in time: %r', task)
+            self._timed_out += 1
+            self._on_task_finished(task)
+
+    def _log_stats(self) -> None:
+        stats = self.get_stats()
+        log.info('All tasks done, executed: %s, obsolete: %s, '
+                 'deduplicated: %s, timed out: %s, max queued: %s, '
+                 'wait time avg/max: %.1fs/%.1fs, run time avg: %.1fs',
+                 stats.executed,
+                 stats.obsolete,
+                 stats.deduplicated,
+                 stats.timed_out,
+                 stats.max_queued,
+                 stats.avg_wait_time,
+                 stats.max_wait_time,
+                 stats.avg_run_time)
 
 
 @functools.total_ordering
 class Task:
-    def __init__(self, priority: int = 0) -> None:
+    def __init__(self,
+                 priority: int = 0,
+                 account: str | None = None,
+                 jid: JID | None = None
+                 ) -> None:
+
         self.priority = priority
+        self.account = account
+        self.jid = jid
+        self.added = 0.0
+        self.started = 0.0
         self._obsolete = False
+        self._finished_func: Callable[[Task], Any] | None = None
 
     def is_obsolete(self) -> bool:
         return self._obsolete
 
     def set_obsolete(self) -> None:
         self._obsolete = True
+        # An obsolete task does not need to block others anymore
+        self.set_finished()
+
+    def set_finished_func(self, func: Callable[[Task], Any] | None) -> None:
+        self._finished_func = func
+
+    def set_finished(self) -> None:
+        '''
+        Must be called when the request started by execute() is finished
+        '''
+
+        if self._finished_func is not None:
+            self._finished_func(self)
+
+    def get_account(self) -> str | None:
+        return self.account
+
+    def get_server(self) -> str | None:
+        if self.jid is None:
+            return None
+        return self.jid.domain
+
+    def get_entity_key(self) -> Hashable | None:
+        '''
+        Queued tasks with the same entity key are replaced by the newest
+        '''
+
+        if self.jid is None:
+            return None
+        return (type(self), self.account, self.jid)
+
+    def get_coalesce_key(self) -> Hashable | None:
+        '''
+        Tasks with the same coalesce key are not executed at the same time
+        '''
+
+        return None
 
     def __lt__(self, other: object) -> bool:
         if not isinstance(other, Task):
@@ -6,6 +6,16 @@
 from __future__ import annotations
 
 from typing import Any
+from typing import Generic
+from typing import NamedTuple
+from typing import TypeVar
+
+from collections import OrderedDict
+from collections.abc import Callable
+from collections.abc import Hashable
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
 
 
 class Singleton(type):
@@ -17,3 +27,84 @@ def __call__(cls, *args: Any, **kwargs: Any):
             cls._instances[cls] = super().__call__(
                 *args, **kwargs)
         return cls._instances[cls]
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    length: int
+    size: int
+    max_size: int
+
+
+class LRUCache(Generic[K, V]):
+    '''
+    Cache which drops the least recently used values once the summed size
+    of all values exceeds max_size. Without size_func every value has the
+    size 1, so max_size is the number of values.
+    '''
+
+    def __init__(self,
+                 max_size: int,
+                 size_func: Callable[[V], int] | None = None,
+                 on_evict: Callable[[K, V], Any] | None = None
+                 ) -> None:
+
+        self._max_size = max_size
+        self._size_func = size_func
+        self._on_evict = on_evict
+
+        self._data: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def get(self, key: K) -> V | None:
+        item = self._data.get(key)
+        if item is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._data.move_to_end(key)
+        return item[0]
+
+    def set(self, key: K, value: V) -> None:
+        self.pop(key)
+
+        size = 1 if self._size_func is None else self._size_func(value)
+        self._data[key] = (value, size)
+        self._size += size
+
+        while self._size > self._max_size and len(self._data) > 1:
+            evicted_key, (evicted_value, evicted_size) = self._data.popitem(
+                last=False)
+            self._size -= evicted_size
+            if self._on_evict is not None:
+                self._on_evict(evicted_key, evicted_value)
+
+    def pop(self, key: K) -> V | None:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+
+        value, size = item
+        self._size -= size
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._size = 0
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(hits=self._hits,
+                         misses=self._misses,
+                         length=len(self._data),
+                         size=self._size,
+                         max_size=self._max_size)
@@ -0,0 +1,125 @@
+# This file is part of Gajim.
+#
+# SPDX-License-Identifier: GPL-3.0-only
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import algorithms
+from cryptography.hazmat.primitives.ciphers import Cipher
+from cryptography.hazmat.primitives.ciphers.modes import GCM
+
+# Files are read and encrypted in chunks of this size, so memory usage
+# does not depend on the file size
+AES_CHUNK_SIZE = 256 * 1024
+
+AES_KEY_SIZE = 32
+AES_IV_SIZE = 12
+GCM_TAG_SIZE = 16
+
+
+class EncryptionCancelled(Exception):
+    pass
+
+
+class DecryptionFailed(Exception):
+    pass
+
+
+class FileEncryptionResult(NamedTuple):
+    key: bytes
+    iv: bytes
+    size: int
+
+
+def aes_encrypt_file(source: Path,
+                     target: Path,
+                     is_cancelled: Callable[[], bool] | None = None,
+                     chunk_size: int = AES_CHUNK_SIZE
+                     ) -> FileEncryptionResult:
+    '''
+    Encrypt source with AES-256-GCM and a random key and IV into target.
+    The authentication tag is appended to the ciphertext, like it is
+    expected for aesgcm:// URIs (XEP-0454).
+
+    Raises EncryptionCancelled if is_cancelled() returns True while
+    encrypting, the incomplete target is removed in this case.
+    '''
+
+    key = os.urandom(AES_KEY_SIZE)
+    iv = os.urandom(AES_IV_SIZE)
+    encryptor = Cipher(algorithms.AES(key),
+                       GCM(iv),
+                       backend=default_backend()).encryptor()
+
+    size = 0
+    try:
+        with source.open('rb') as source_file, \
+                target.open('wb') as target_file:
+            while chunk := source_file.read(chunk_size):
+                if is_cancelled is not None and is_cancelled():
+                    raise EncryptionCancelled
+
+                size += target_file.write(encryptor.update(chunk))
+
+            size += target_file.write(encryptor.finalize())
+            size += target_file.write(encryptor.tag)
+
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+
+    return FileEncryptionResult(key=key, iv=iv, size=size)
+
+
+def aes_decrypt_file(source: Path,
+                     target: Path,
+                     key: bytes,
+                     iv: bytes,
+                     chunk_size: int = AES_CHUNK_SIZE
+                     ) -> None:
+    '''
+    Decrypt source, which is AES-GCM ciphertext followed by the
+    authentication tag, into target.
+
+    Raises DecryptionFailed if the tag does not match, target is
+    removed in this case.
+    '''
+
+    size = source.stat().st_size - GCM_TAG_SIZE
+    if size < 0:
+        raise DecryptionFailed('File is too small')
+
+    try:
+        with source.open('rb') as source_file, \
+                target.open('wb') as target_file:
+            source_file.seek(size)
+            tag = source_file.read(GCM_TAG_SIZE)
+            source_file.seek(0)
+
+            decryptor = Cipher(algorithms.AES(key),
+                               GCM(iv, tag=tag),
+                               backend=default_backend()).decryptor()
+
+            while size > 0:
+                chunk = source_file.read(min(chunk_size, size))
+                if not chunk:
+                    raise DecryptionFailed('File is truncated')
+                size -= len(chunk)
+                target_file.write(decryptor.update(chunk))
+
+            try:
+                target_file.write(decryptor.finalize())
+            except InvalidTag:
+                raise DecryptionFailed('Authentication tag does not match')
+
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
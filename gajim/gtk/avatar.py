@@ -4,6 +4,8 @@
 
 from __future__ import annotations
 
+from typing import Any
+
 import functools
 import hashlib
 import logging
@@ -27,6 +29,8 @@
 from gajim.common.helpers import get_groupchat_name
 from gajim.common.image_helpers import get_pixbuf_from_file
 from gajim.common.image_helpers import scale_with_ratio
+from gajim.common.util.classes import CacheInfo
+from gajim.common.util.classes import LRUCache
 from gajim.common.util.classes import Singleton
 
 from gajim.gtk.const import DEFAULT_WORKSPACE_COLOR
@@ -41,8 +45,13 @@
 log = logging.getLogger('gajim.gtk.avatar')
 
 
-AvatarCacheT = dict[JID | str, dict[tuple[int, int, str | None, str | None],
-                                          cairo.ImageSurface]]
+# (jid, size, scale, show, transport_icon) for avatars of a contact,
+# (letter, color, size, scale, style, show, transport_icon) for
+# default avatars which are shared by all contacts
+AvatarCacheKeyT = tuple[Any, ...]
+
+# Maximum bytes of image data held by the avatar cache
+AVATAR_CACHE_SIZE = 32 * 1024 * 1024
 
 CIRCLE_RATIO = 0.18
 CIRCLE_FILL_RATIO = 0.80
@@ -99,7 +108,6 @@ def generate_avatar(letters: str,
     return context.get_target()
 
 
-@functools.cache
 def generate_default_avatar(letter: str,
                             color: tuple[float, float, float],
                             size: int,
@@ -424,12 +432,76 @@ def convert_to_greyscale(surface: cairo.ImageSurface) -> cairo.ImageSurface:
     return context.get_target()
 
 
+def _get_surface_size(surface: cairo.ImageSurface) -> int:
+    return surface.get_stride() * surface.get_height()
+
+
 class AvatarStorage(metaclass=Singleton):
     def __init__(self):
-        self._cache: AvatarCacheT = defaultdict(dict)
+        self._cache: LRUCache[AvatarCacheKeyT, cairo.ImageSurface] = LRUCache(
+            AVATAR_CACHE_SIZE,
+            size_func=_get_surface_size,
+            on_evict=self._on_evict)
+
+        # Cache keys by jid, to invalidate all avatars of a contact
+        self._keys: defaultdict[JID | str, set[AvatarCacheKeyT]] = (
+            defaultdict(set))
 
     def invalidate_cache(self, jid: JID | str) -> None:
-        self._cache.pop(jid, None)
+        for key in self._keys.pop(jid, set()):
+            self._cache.pop(key)
+
+    def cache_info(self) -> CacheInfo:
+        return self._cache.cache_info()
+
+    def _get_cached(self, key: AvatarCacheKeyT) -> cairo.ImageSurface | None:
+        return self._cache.get(key)
+
+    def _set_cached(self,
+                    key: AvatarCacheKeyT,
+                    surface: cairo.ImageSurface) -> None:
+
+        self._cache.set(key, surface)
+        self._keys[key[0]].add(key)
+
+    def _on_evict(self,
+                  key: AvatarCacheKeyT,
+                  _surface: cairo.ImageSurface) -> None:
+
+        keys = self._keys.get(key[0])
+        if keys is None:
+            return
+
+        keys.discard(key)
+        if not keys:
+            del self._keys[key[0]]
+
+    def _get_default_surface(self,
+                             name: str,
+                             color: tuple[float, float, float],
+                             size: int,
+                             scale: int,
+                             show: str | None,
+                             transport_icon: str | None,
+                             style: str) -> cairo.ImageSurface:
+
+        letter = generate_avatar_letter(name)
+        key = (letter, color, size, scale, style, show, transport_icon)
+        surface = self._cache.get(key)
+        if surface is not None:
+            return surface
+
+        surface = generate_default_avatar(
+            letter, color, size, scale, style=style)
+        if show is not None:
+            surface = add_status_to_avatar(surface, show)
+
+        if transport_icon is not None:
+            surface = add_transport_to_avatar(surface, transport_icon)
+
+        # Not indexed by jid, invalidating a contact must not drop it
+        self._cache.set(key, surface)
+        return surface
 
     def get_pixbuf(self,
                    contact: (types.BareContact |
@@ -461,14 +533,14 @@ def get_surface(self,
                     transport_icon: str | None = None,
                     style: str = 'circle') -> cairo.ImageSurface:
 
-        jid = contact.jid
-
         if not default:
-            surface = self._cache[jid].get((size, scale, show, transport_icon))
+            key = (contact.jid, size, scale, show, transport_icon)
+            surface = self._get_cached(key)
             if surface is not None:
                 return surface
 
-            surface = self._get_avatar_from_storage(contact, size, scale, style)
+            surface = self._get_avatar_from_storage(
+                contact, size, scale, style)
             if surface is not None:
                 if show is not None:
                     surface = add_status_to_avatar(surface, show)
@@ -476,22 +548,16 @@ def get_surface(self,
                 if transport_icon is not None:
                     surface = add_transport_to_avatar(surface, transport_icon)
 
-                self._cache[jid][(size, scale, show, transport_icon)] = surface
+                self._set_cached(key, surface)
                 return surface
 
-        name = contact.name
-        color = get_contact_color(contact)
-        letter = generate_avatar_letter(name)
-        surface = generate_default_avatar(
-            letter, color, size, scale, style=style)
-        if show is not None:
-            surface = add_status_to_avatar(surface, show)
-
-        if transport_icon is not None:
-            surface = add_transport_to_avatar(surface, transport_icon)
-
-        self._cache[jid][(size, scale, show, transport_icon)] = surface
-        return surface
+        return self._get_default_surface(contact.name,
+                                         get_contact_color(contact),
+                                         size,
+                                         scale,
+                                         show,
+                                         transport_icon,
+                                         style)
 
     def get_muc_surface(self,
                         account: str,
@@ -503,7 +569,8 @@ def get_muc_surface(self,
                         style: str = 'circle') -> cairo.ImageSurface:
 
         if not default:
-            surface = self._cache[jid].get((size, scale, None, transport_icon))
+            key = (jid, size, scale, None, transport_icon)
+            surface = self._get_cached(key)
             if surface is not None:
                 return surface
 
@@ -518,8 +585,7 @@ def get_muc_surface(self,
                         surface = add_transport_to_avatar(
                             surface, transport_icon)
 
-                    self._cache[jid][
-                        (size, scale, None, transport_icon)] = surface
+                    self._set_cached(key, surface)
                     return surface
 
                 # avatar_sha set, but image is missing
@@ -531,20 +597,16 @@ def get_muc_surface(self,
 
         name = get_groupchat_name(client, jid)
         color = get_contact_color(contact)
-        letter = generate_avatar_letter(name)
-        surface = generate_default_avatar(letter, color, size, scale, style)
-        if transport_icon is not None:
-            surface = add_transport_to_avatar(surface, transport_icon)
-
-        self._cache[jid][(size, scale, None, transport_icon)] = surface
-        return surface
+        return self._get_default_surface(
+            name, color, size, scale, None, transport_icon, style)
 
     def get_workspace_surface(self,
                               workspace_id: str,
                               size: int,
                               scale: int) -> cairo.ImageSurface | None:
 
-        surface = self._cache[workspace_id].get((size, scale, None, None))
+        key = (workspace_id, size, scale, None, None)
+        surface = self._get_cached(key)
         if surface is not None:
             return surface
 
@@ -564,7 +626,7 @@ def get_workspace_surface(self,
         rgba = make_rgba(color or DEFAULT_WORKSPACE_COLOR)
         surface = make_workspace_avatar(
             name, rgba_to_float(rgba), size, scale)
-        self._cache[workspace_id][(size, scale, None, None)] = surface
+        self._set_cached(key, surface)
         return surface
 
     @staticmethod
@@ -603,6 +665,8 @@ def save_avatar(data: bytes) -> str | None:
         except Exception:
             log.exception('Storing avatar failed')
             return None
+
+        app.disk_cache.record_access(path, len(data))
         return sha
 
     @staticmethod
@@ -629,6 +693,7 @@ def surface_from_filename(self,
         if pixbuf is None:
             return None
 
+        app.disk_cache.record_access(path)
         surface = Gdk.cairo_surface_create_from_pixbuf(pixbuf, scale)
         return fit(surface, size)
 
@@ -20,7 +20,7 @@
 from gajim.common.const import Direction
 from gajim.common.modules.contacts import GroupchatContact
 
-from gajim.gtk.emoji_data_gtk import get_emoji_data
+from gajim.gtk.emoji_data_gtk import get_emoji_index
 from gajim.gtk.groupchat_nick_completion import GroupChatNickCompletion
 from gajim.gtk.menus import escape_mnemonic
 
@@ -190,9 +190,9 @@ def _update_commands_menu(self,
         command_list = self._get_commands()
         num_entries = 0
         for command, usage in command_list:
-            if not command.startswith(action_text[1:]):
-                continue
             if num_entries >= MENUS_MAX_ENTRIES:
+                break
+            if not command.startswith(action_text[1:]):
                 continue
 
             action_data = GLib.Variant('s', f'/{command}')
@@ -251,38 +251,21 @@ def _update_emoji_menu(self,
                            start: Gtk.TextIter
                            ) -> None:
         self._menu.remove_all()
-        emoji_data = get_emoji_data()
+        matches = get_emoji_index().find(action_text, MENUS_MAX_ENTRIES)
 
-        sn_matches: dict[str, str] = {}
-        kw_matches: dict[str, str] = {}
+        log.debug('Found %d "%s…" emoji', len(matches), action_text)
+
+        # Short name matches come before keyword matches
+        for keyword, short_name, emoji in matches:
+            label = f'{emoji} {short_name}'
+            if keyword != short_name:
+                label = f'{label}  [{keyword}]'
 
-        for keyword, entries in emoji_data.items():
-            if not keyword.startswith(action_text):
-                continue
-            for short_name, emoji in entries.items():
-                label = f'{emoji} {short_name}'
-                if keyword == short_name:
-                    # Replace a possible keyword match with the shortname match:
-                    sn_matches[emoji] = label
-                    if kw_matches.get(emoji) is not None:
-                        del kw_matches[emoji]
-                else:
-                    # Only add a keyword match if no shortname match:
-                    if sn_matches.get(emoji) is None:
-                        kw_matches[emoji] = f'{label}  [{keyword}]'
-
-        log.debug('Found %d "%s…" emoji by short name, %d more by keyword',
-                  len(sn_matches), action_text, len(kw_matches))
-
-        # Put all shortname matches before keyword matches:
-        for emoji, label in list(sn_matches.items()) + list(kw_matches.items()):
             action_data = GLib.Variant('s', emoji)
             menu_item = Gio.MenuItem()
             menu_item.set_label(escape_mnemonic(label))
             menu_item.set_attribute_value('action-data', action_data)
             self._menu.append_item(menu_item)
-            if self._menu.get_n_items() >= MENUS_MAX_ENTRIES:
-                break
 
         if self._menu.get_n_items() > 0:
             self._show_menu(start)
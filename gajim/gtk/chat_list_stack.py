@@ -18,6 +18,7 @@
 from gajim.common.ged import EventHelper
 from gajim.common.i18n import _
 from gajim.common.modules.contacts import GroupchatContact
+from gajim.common.setting_values import OpenChatsSettingT
 
 from gajim.gtk import structs
 from gajim.gtk.chat_filter import ChatFilter
@@ -307,6 +308,12 @@ def contains_chat(self, account: str, jid: JID,
         chat_list = self._chat_lists[workspace_id]
         return chat_list.contains_chat(account, jid)
 
+    def get_open_chats(self) -> OpenChatsSettingT:
+        open_chats: OpenChatsSettingT = []
+        for chat_list in self._chat_lists.values():
+            open_chats.extend(chat_list.get_open_chats())
+        return open_chats
+
     def get_total_unread_count(self) -> int:
         count = 0
         for chat_list in self._chat_lists.values():
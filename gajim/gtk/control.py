@@ -11,6 +11,9 @@
 import logging
 import time
 from collections.abc import Sequence
+from concurrent.futures import Future
+from dataclasses import dataclass
+from dataclasses import field
 
 from gi.repository import Gio
 from gi.repository import GLib
@@ -47,9 +50,21 @@
 
 REQUEST_LINES_COUNT = 20
 
+# Rows added to the view per main loop iteration while loading history
+HISTORY_FRAME_SIZE = 5
+
 log = logging.getLogger('gajim.gtk.control')
 
 
+@dataclass
+class HistoryRequest:
+    before: bool
+    future: Future[Sequence[Message]] | None = None
+    rows: list[HistoryRowT] = field(default_factory=list)
+    complete: bool = False
+    source_id: int | None = None
+
+
 class ChatControl(EventHelper):
     def __init__(self) -> None:
         EventHelper.__init__(self)
@@ -58,6 +73,8 @@ def __init__(self) -> None:
         self._contact = None
         self._client = None
 
+        self._history_request: HistoryRequest | None = None
+
         self._ui = get_builder('chat_control.ui')
 
         self._message_row_actions = MessageRowActions()
@@ -163,6 +180,7 @@ def clear(self) -> None:
         if self._contact is not None:
             self._contact.disconnect_all_from_obj(self)
 
+        self._cancel_history_request()
         self._contact = None
         self._client = None
         self._scrolled_view.clear()
@@ -174,6 +192,7 @@ def remove_message(self, pk: int) -> None:
         self._scrolled_view.remove_message(pk)
 
     def reset_view(self) -> None:
+        self._cancel_history_request()
         self._scrolled_view.reset()
 
     def get_autoscroll(self) -> bool:
@@ -192,6 +211,7 @@ def scroll_to_message(
                 return
 
             # Clear view and reload conversation around timestamp
+            self._cancel_history_request()
             self._scrolled_view.reset()
             self._scrolled_view.block_signals(True)
             messages: list[Message] = []
@@ -226,8 +246,12 @@ def switch_contact(
 
         self._jump_to_end_button.switch_contact(contact)
         self._message_row_actions.switch_contact(contact)
-        self._scrolled_view.switch_contact(contact)
-        self._request_history(None, True)
+        # Cancel only afterwards, the view must not cache the previous
+        # conversation while its history is partially loaded
+        restored = self._scrolled_view.switch_contact(contact)
+        self._cancel_history_request()
+        if not restored:
+            self._request_history(None, True)
         self._groupchat_state.switch_contact(contact)
         self._roster.switch_contact(contact)
 
@@ -261,6 +285,9 @@ def switch_contact(
 
         self._client.get_module('Chatstate').set_active(contact)
 
+        if restored:
+            return
+
         transfers = self._client.get_module('HTTPUpload').get_running_transfers(
             contact)
         if transfers is not None:
@@ -301,24 +328,26 @@ def _register_events(self) -> None:
             ('http-upload-started', ged.GUI2, self._on_http_upload_started),
             ('http-upload-error', ged.GUI2, self._on_http_upload_error),
             ('encryption-check', ged.GUI2, self._on_encryption_info),
+            ('account-disabled', ged.GUI2, self._on_account_disabled),
         ])
 
     def _is_event_processable(self, event: Any) -> bool:
-        if self._contact is None:
-            return False
-
-        if event.account != self._contact.account:
-            return False
-
-        if event.jid != self._contact.jid:
+        if (self._contact is None or
+                event.account != self._contact.account or
+                event.jid != self._contact.jid):
+            # The conversation is not shown, a cached view of it is outdated
+            self._scrolled_view.invalidate_cache(event.account, event.jid)
             return False
         return True
 
+    def _on_account_disabled(self, event: events.AccountDisabled) -> None:
+        self._scrolled_view.invalidate_cache(event.account)
+
     def _on_presence_received(self, event: events.PresenceReceived) -> None:
-        if not self._is_event_processable(event):
+        if not app.settings.get('print_status_in_chats'):
             return
 
-        if not app.settings.get('print_status_in_chats'):
+        if not self._is_event_processable(event):
             return
 
         contact = self.client.get_module('Contacts').get_contact(event.fjid)
@@ -538,8 +567,8 @@ def _add_messages(self, messages: list[Message]):
         for msg in messages:
             self._add_db_row(msg)
 
-    def _request_messages(self, before: bool) -> Sequence[Message]:
-        if before:
+    def _request_messages(self, request: HistoryRequest) -> None:
+        if request.before:
             row = self._scrolled_view.get_first_row()
         else:
             row = self._scrolled_view.get_last_row()
@@ -550,12 +579,14 @@ def _request_messages(self, before: bool) -> Sequence[Message]:
             timestamp = dt.datetime.fromtimestamp(
                 row.db_timestamp, dt.timezone.utc)
 
-        return app.storage.archive.get_conversation_before_after(
+        archive = app.storage.archive
+        request.future = archive.get_conversation_before_after_async(
             self.contact.account,
             self.contact.jid,
-            before,
+            request.before,
             timestamp,
-            REQUEST_LINES_COUNT)
+            REQUEST_LINES_COUNT,
+            lambda messages: self._on_request_messages(request, messages))
 
     def _request_events(self, before: bool) -> list[events.ApplicationEvent]:
         if before:
@@ -579,60 +610,125 @@ def _request_history(self,
                          before: bool
                          ) -> None:
 
+        if self._history_request is not None:
+            # Rows of the previous request are still being added
+            return
+
         self._scrolled_view.block_signals(True)
+        self._scrolled_view.set_history_loading(True)
 
-        messages = self._request_messages(before)
-        event_rows = self._request_events(before)
-        rows = self._sort_request_rows(messages, event_rows, before)
+        self._history_request = HistoryRequest(before=before)
+        self._request_messages(self._history_request)
 
-        assert self._contact is not None
-        for row in rows:
-            if not isinstance(row, events.ApplicationEvent):
-                self._add_messages([row])
+    def _on_request_messages(self,
+                             request: HistoryRequest,
+                             messages: Sequence[Message] | None
+                             ) -> None:
 
-            elif isinstance(row, events.MUCUserJoined):
-                self._process_muc_user_joined(row)
+        if request is not self._history_request:
+            # The chat was switched in the meantime
+            return
+
+        request.future = None
+        if messages is None:
+            # Reading from the archive failed
+            self._scrolled_view.reset_history_request()
+            self._finish_history_request()
+            return
+
+        # The event storage is in memory and only reachable from the
+        # main thread, it is cheap enough to query here
+        event_rows = self._request_events(request.before)
+        request.rows = self._sort_request_rows(
+            messages, event_rows, request.before)
+        request.complete = len(request.rows) < REQUEST_LINES_COUNT
+        if not request.rows:
+            self._scrolled_view.set_history_complete(request.before, True)
+            self._scrolled_view.reset_history_request()
+            self._finish_history_request()
+            return
 
-            elif isinstance(row, events.MUCUserLeft):
-                self._process_muc_user_left(row)
+        request.rows.reverse()
 
-            elif isinstance(row, events.MUCNicknameChanged):
-                self._process_muc_nickname_changed(row)
+        request.source_id = GLib.idle_add(self._add_history_frame, request)
 
-            elif isinstance(row, events.MUCRoomKicked):
-                self._process_muc_room_kicked(row)
+    def _add_history_frame(self, request: HistoryRequest) -> bool:
+        for _index in range(HISTORY_FRAME_SIZE):
+            if not request.rows:
+                break
+            self._add_history_row(request.rows.pop())
 
-            elif isinstance(row, events.MUCUserAffiliationChanged):
-                self._process_muc_user_affiliation_changed(row)
+        if request.rows:
+            return GLib.SOURCE_CONTINUE
 
-            elif isinstance(row, events.MUCAffiliationChanged):
-                self._process_room_affiliation_changed(row)
+        request.source_id = None
+        if request.complete:
+            self._scrolled_view.set_history_complete(request.before, True)
 
-            elif isinstance(row, events.MUCUserRoleChanged):
-                self._process_muc_user_role_changed(row)
+        self._finish_history_request()
+        return GLib.SOURCE_REMOVE
 
-            elif isinstance(row, events.MUCUserStatusShowChanged):
-                self._process_muc_user_status_show_changed(row)
+    def _finish_history_request(self) -> None:
+        self._history_request = None
+        self._scrolled_view.set_history_loading(False)
+        self._scrolled_view.block_signals(False)
 
-            elif isinstance(row, events.MUCRoomConfigChanged):
-                self._process_muc_room_config_changed(row)
+    def _cancel_history_request(self) -> None:
+        request = self._history_request
+        if request is None:
+            return
 
-            elif isinstance(row, events.MUCRoomConfigFinished):
-                self._process_muc_room_config_finished(row)
+        log.debug('Cancel history request')
+        if request.future is not None:
+            request.future.cancel()
 
-            elif isinstance(row, events.MUCRoomPresenceError):
-                self._process_muc_room_presence_error(row)
+        if request.source_id is not None:
+            GLib.source_remove(request.source_id)
 
-            elif isinstance(row, events.MUCRoomDestroyed):
-                self._process_muc_room_destroyed(row)
+        self._finish_history_request()
 
-            else:
-                raise ValueError('Unknown event: %s' % type(row))
+    def _add_history_row(self, row: HistoryRowT) -> None:
+        if not isinstance(row, events.ApplicationEvent):
+            self._add_messages([row])
 
-        if len(rows) < REQUEST_LINES_COUNT:
-            self._scrolled_view.set_history_complete(before, True)
+        elif isinstance(row, events.MUCUserJoined):
+            self._process_muc_user_joined(row)
 
-        self._scrolled_view.block_signals(False)
+        elif isinstance(row, events.MUCUserLeft):
+            self._process_muc_user_left(row)
+
+        elif isinstance(row, events.MUCNicknameChanged):
+            self._process_muc_nickname_changed(row)
+
+        elif isinstance(row, events.MUCRoomKicked):
+            self._process_muc_room_kicked(row)
+
+        elif isinstance(row, events.MUCUserAffiliationChanged):
+            self._process_muc_user_affiliation_changed(row)
+
+        elif isinstance(row, events.MUCAffiliationChanged):
+            self._process_room_affiliation_changed(row)
+
+        elif isinstance(row, events.MUCUserRoleChanged):
+            self._process_muc_user_role_changed(row)
+
+        elif isinstance(row, events.MUCUserStatusShowChanged):
+            self._process_muc_user_status_show_changed(row)
+
+        elif isinstance(row, events.MUCRoomConfigChanged):
+            self._process_muc_room_config_changed(row)
+
+        elif isinstance(row, events.MUCRoomConfigFinished):
+            self._process_muc_room_config_finished(row)
+
+        elif isinstance(row, events.MUCRoomPresenceError):
+            self._process_muc_room_presence_error(row)
+
+        elif isinstance(row, events.MUCRoomDestroyed):
+            self._process_muc_room_destroyed(row)
+
+        else:
+            raise ValueError('Unknown event: %s' % type(row))
 
     @staticmethod
     def _sort_request_rows(messages: Sequence[Message],
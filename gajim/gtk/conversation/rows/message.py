@@ -113,6 +113,10 @@ def last_message_id(self) -> str | None:
     def message_id(self) -> str | None:
         return self._original_message.id
 
+    @property
+    def corrections(self) -> list[Message]:
+        return self._original_message.corrections
+
     @property
     def has_receipt(self) -> bool:
         return self._has_receipt
@@ -8,8 +8,11 @@
 from typing import cast
 from typing import Literal
 
+import bisect
 import logging
+from collections import OrderedDict
 from collections.abc import Generator
+from dataclasses import dataclass
 from datetime import datetime
 from datetime import timedelta
 
@@ -30,6 +33,7 @@
 from gajim.common.helpers import to_user_string
 from gajim.common.modules.contacts import BareContact
 from gajim.common.modules.contacts import GroupchatContact
+from gajim.common.modules.contacts import GroupchatParticipant
 from gajim.common.modules.httpupload import HTTPFileTransfer
 from gajim.common.storage.archive.const import ChatDirection
 from gajim.common.storage.archive.models import Message
@@ -54,6 +58,40 @@
 
 log = logging.getLogger('gajim.gtk.conversation_view')
 
+CACHE_INVALIDATING_SIGNALS = [
+    'user-joined',
+    'user-left',
+    'user-affiliation-changed',
+    'user-role-changed',
+    'user-status-show-changed',
+    'user-nickname-changed',
+    'room-kicked',
+    'room-destroyed',
+    'room-config-finished',
+    'room-config-changed',
+    'room-presence-error',
+    'room-subject',
+    'room-affiliation-changed',
+]
+
+
+@dataclass
+class CachedConversation:
+    contact: ChatContactT
+    list_box: Gtk.ListBox
+    active_date_rows: set[datetime]
+    message_id_row_map: dict[str, MessageRow]
+    stanza_id_row_map: dict[str, MessageRow]
+    pk_row_map: dict[int, MessageRow]
+    message_rows: list[MessageRow]
+    read_marker_row: ReadMarkerRow | None
+    scroll_hint_row: ScrollHintRow | None
+    upper_complete: bool
+    lower_complete: bool
+    autoscroll: bool
+    scroll_value: float
+    row_count: int
+
 
 class ConversationView(Gtk.ScrolledWindow):
 
@@ -107,6 +145,10 @@ def __init__(self, message_row_actions: MessageRowActions) -> None:
 
         self._message_id_row_map: dict[str, MessageRow] = {}
         self._stanza_id_row_map: dict[str, MessageRow] = {}
+        # Maps pk and orig_pk of all message rows
+        self._pk_row_map: dict[int, MessageRow] = {}
+        # Message rows in the order they are shown
+        self._message_rows: list[MessageRow] = []
 
         self._read_marker_row = None
         self._scroll_hint_row = None
@@ -117,11 +159,16 @@ def __init__(self, message_row_actions: MessageRowActions) -> None:
         self._upper_complete: bool = False
         self._lower_complete: bool = True
         self._requesting: str | None = None
+        self._history_loading: bool = False
         self._block_signals = False
 
         self._signal_handlers_enabled = False
         self._signal_handler_ids = (0, 0)
 
+        # Conversations recently switched away from, least recently used first
+        self._cache: OrderedDict[
+            tuple[str, JID], CachedConversation] = OrderedDict()
+
         self.add(self._list_box)
         self.set_focus_vadjustment(Gtk.Adjustment())
 
@@ -199,24 +246,52 @@ def clear(self) -> None:
         self._enable_signal_handlers(False)
         self._reset()
 
+        # Without a shown conversation no events are received which
+        # would keep the cache up to date
+        while self._cache:
+            _key, cached = self._cache.popitem()
+            self._destroy_cached(cached)
+
         self._contact = None
         self._client = None
 
-    def switch_contact(self, contact: ChatContactT) -> None:
+    def switch_contact(self, contact: ChatContactT) -> bool:
+        '''
+        Show the conversation with contact. The current conversation is kept
+        in the cache, so switching back to it does not need to load it again.
+
+        returns True if the conversation was restored from the cache
+        '''
+
+        self._store_in_cache()
+        cached = self._cache.pop((contact.account, contact.jid), None)
+        self._load_contact(contact, cached)
+        return cached is not None
+
+    def _load_contact(self,
+                      contact: ChatContactT,
+                      cached: CachedConversation | None
+                      ) -> None:
+
         self._contact = contact
         self._client = app.get_client(contact.account)
 
         self._enable_signal_handlers(False)
         self._block_signals = True
-        self._reset()
+
+        if cached is None:
+            self._reset()
+        else:
+            self._restore_from_cache(cached)
 
         self.disable_row_selection()
 
-        self._read_marker_row = ReadMarkerRow(self._contact)
-        self._list_box.add(self._read_marker_row)
+        if cached is None:
+            self._read_marker_row = ReadMarkerRow(self._contact)
+            self._list_box.add(self._read_marker_row)
 
-        self._scroll_hint_row = ScrollHintRow(self._contact.account)
-        self._list_box.add(self._scroll_hint_row)
+            self._scroll_hint_row = ScrollHintRow(self._contact.account)
+            self._list_box.add(self._scroll_hint_row)
 
         app.settings.disconnect_signals(self)
 
@@ -233,12 +308,173 @@ def switch_contact(self, contact: ChatContactT) -> None:
         self._block_signals = False
         self._enable_signal_handlers(True)
 
+        if cached is not None:
+            self._emit('autoscroll-changed', self._autoscroll)
+
+    def _store_in_cache(self) -> None:
+        if self._contact is None:
+            return
+
+        if self._history_loading:
+            # Only partially loaded, it would miss rows when restored
+            return
+
+        if app.settings.get('conversation_cache_size') == 0:
+            return
+
+        self.disable_row_selection()
+
+        list_box = self._list_box
+        viewport = cast(Gtk.Viewport, self.get_child())
+        viewport.remove(list_box)
+
+        cached = CachedConversation(
+            contact=self._contact,
+            list_box=list_box,
+            active_date_rows=self._active_date_rows,
+            message_id_row_map=self._message_id_row_map,
+            stanza_id_row_map=self._stanza_id_row_map,
+            pk_row_map=self._pk_row_map,
+            message_rows=self._message_rows,
+            read_marker_row=self._read_marker_row,
+            scroll_hint_row=self._scroll_hint_row,
+            upper_complete=self._upper_complete,
+            lower_complete=self._lower_complete,
+            autoscroll=self._autoscroll,
+            scroll_value=self.get_vadjustment().get_value(),
+            row_count=len(list_box.get_children()),
+        )
+
+        # Replaced list box, _reset() must not destroy the cached rows
+        self._list_box = Gtk.ListBox()
+        viewport.add(self._list_box)
+
+        key = (self._contact.account, self._contact.jid)
+        self._cache[key] = cached
+
+        if isinstance(self._contact, GroupchatContact | GroupchatParticipant):
+            # Group chat rows are added from contact signals, which are
+            # only handled for the shown conversation
+            self._contact.multi_connect({
+                signal_name: self._on_cached_contact_signal
+                for signal_name in CACHE_INVALIDATING_SIGNALS
+            })
+
+        self._trim_cache()
+
+    def _restore_from_cache(self, cached: CachedConversation) -> None:
+        cached.contact.disconnect_all_from_obj(self)
+
+        self._list_box.destroy()
+        current_child = self.get_child()
+        assert current_child is not None
+        current_child.destroy()
+
+        self._list_box = cached.list_box
+        self.add(self._list_box)
+
+        self._current_upper = 0
+        self._request_history_at_upper = None
+        self._requesting = None
+        self._history_loading = False
+        self._autoscroll = cached.autoscroll
+
+        self._active_date_rows = cached.active_date_rows
+        self._message_id_row_map = cached.message_id_row_map
+        self._stanza_id_row_map = cached.stanza_id_row_map
+        self._pk_row_map = cached.pk_row_map
+        self._message_rows = cached.message_rows
+        self._read_marker_row = cached.read_marker_row
+        self._scroll_hint_row = cached.scroll_hint_row
+        self.set_history_complete(True, cached.upper_complete)
+        self.set_history_complete(False, cached.lower_complete)
+
+        if not cached.autoscroll:
+            # The adjustment is only updated after the rows are allocated
+            GLib.idle_add(self._restore_scroll_value,
+                          cached.contact,
+                          cached.scroll_value)
+
+    def _restore_scroll_value(self,
+                              contact: ChatContactT,
+                              value: float
+                              ) -> None:
+
+        if contact is not self._contact:
+            return
+        self.get_vadjustment().set_value(value)
+
+    def _trim_cache(self) -> None:
+        max_size = app.settings.get('conversation_cache_size')
+        max_rows = app.settings.get('conversation_cache_max_rows')
+
+        row_count = sum(cached.row_count for cached in self._cache.values())
+        while self._cache and (len(self._cache) > max_size or
+                               row_count > max_rows):
+            _key, cached = self._cache.popitem(last=False)
+            row_count -= cached.row_count
+            self._destroy_cached(cached)
+
+    def _destroy_cached(self, cached: CachedConversation) -> None:
+        log.debug('Drop cached conversation %s', cached.contact.jid)
+        cached.contact.disconnect_all_from_obj(self)
+        cached.list_box.destroy()
+
+    def invalidate_cache(self, account: str, jid: JID | None = None) -> None:
+        '''
+        Drop the cached conversation with jid, or all cached conversations
+        of account if jid is None
+        '''
+
+        for key in list(self._cache):
+            if key[0] != account:
+                continue
+            if jid is not None and key[1] != jid:
+                continue
+            self._destroy_cached(self._cache.pop(key))
+
+    def _on_cached_contact_signal(
+        self,
+        contact: GroupchatContact | GroupchatParticipant,
+        signal_name: str,
+        *args: Any
+    ) -> None:
+
+        if isinstance(contact, GroupchatParticipant):
+            room = contact.room
+        else:
+            room = contact
+
+        if signal_name in ('user-joined', 'user-left'):
+            event = cast(events.MUCUserJoined | events.MUCUserLeft, args[1])
+            if (not event.is_self and not event.status_codes and
+                    not room.settings.get('print_join_left')):
+                return
+
+        elif signal_name == 'user-status-show-changed':
+            if not room.settings.get('print_status'):
+                return
+
+        self.invalidate_cache(contact.account, contact.jid)
+
     def get_autoscroll(self) -> bool:
         return self._autoscroll
 
     def block_signals(self, value: bool) -> None:
         self._block_signals = value
 
+    def set_history_loading(self, value: bool) -> None:
+        # History rows may be added over several main loop iterations,
+        # keep the scroll position anchored until the last row was added
+        self._history_loading = value
+
+    def reset_history_request(self) -> None:
+        # No rows were added, so there is no upper change which would end
+        # the request. Allow the next scroll to request history again.
+        self._requesting = None
+        self._request_history_at_upper = None
+        self.set_kinetic_scrolling(True)
+
     def _emit(self, signal_name: str, *args: Any) -> None:
         if not self._block_signals:
             log.debug('emit %s, %s', signal_name, args)
@@ -263,6 +499,7 @@ def _reset(self) -> None:
         self._upper_complete = False
         self._lower_complete = True
         self._requesting = None
+        self._history_loading = False
         self.set_history_complete(True, False)
 
         self._reset_list_box()
@@ -271,12 +508,14 @@ def _reset(self) -> None:
         self._active_date_rows = set()
         self._message_id_row_map = {}
         self._stanza_id_row_map = {}
+        self._pk_row_map = {}
+        self._message_rows = []
         self._read_marker_row = None
         self._scroll_hint_row = None
 
     def reset(self) -> None:
         assert self._contact is not None
-        self.switch_contact(self._contact)
+        self._load_contact(self._contact, None)
 
     def set_history_complete(self, before: bool, complete: bool) -> None:
         if before:
@@ -316,7 +555,8 @@ def _on_adj_upper_changed(self,
             self._autoscroll = True
             self._emit('autoscroll-changed', self._autoscroll)
 
-        self._requesting = None
+        if not self._history_loading:
+            self._requesting = None
 
     def _on_adj_value_changed(self,
                               adj: Gtk.Adjustment,
@@ -351,9 +591,10 @@ def _on_adj_value_changed(self,
             self._request_history_at_upper = adj.get_upper()
             # Workaround: https://gitlab.gnome.org/GNOME/gtk/merge_requests/395
             self.set_kinetic_scrolling(False)
+            # Set before emitting, the request may fail right away
+            self._requesting = 'before'
             if not self._block_signals:
                 self._emit('request-history', True)
-            self._requesting = 'before'
 
         elif (adj.get_upper() - (adj.get_value() + adj.get_page_size()) <
                 distance):
@@ -362,9 +603,9 @@ def _on_adj_value_changed(self,
                 return
             # Workaround: https://gitlab.gnome.org/GNOME/gtk/merge_requests/395
             self.set_kinetic_scrolling(False)
+            self._requesting = 'after'
             if not self._block_signals:
                 self._emit('request-history', False)
-            self._requesting = 'after'
 
     @property
     def contact(self) -> types.ChatContactT:
@@ -394,19 +635,16 @@ def get_last_row(
 
     def get_first_message_row(self
     ) -> MessageRow | None:
-        for row in self._list_box.get_children():
-            if isinstance(row, MessageRow):
-                return row
-        return None
+        if not self._message_rows:
+            return None
+        return self._message_rows[0]
 
     def get_last_message_row(
         self
     ) -> MessageRow | None:
-        children = reversed(self._list_box.get_children())
-        for row in children:
-            if isinstance(row, MessageRow):
-                return row
-        return None
+        if not self._message_rows:
+            return None
+        return self._message_rows[-1]
 
     def get_first_event_row(self) -> InfoMessage | MUCJoinLeft | None:
         for row in self._list_box.get_children():
@@ -536,6 +774,10 @@ def add_message_from_db(self, message: Message) -> None:
             if corr_message_id is not None:
                 self._message_id_row_map[corr_message_id] = message_row
 
+        self._add_to_pk_map(message_row)
+        bisect.insort(
+            self._message_rows, message_row, key=self._message_row_sort_key)
+
         if message.direction == ChatDirection.INCOMING:
             assert self._read_marker_row is not None
             self._read_marker_row.set_last_incoming_timestamp(
@@ -664,13 +906,57 @@ def remove_message(self, pk: int) -> None:
             decendant_row.set_merged(False)
 
     def _remove_from_maps(self, row: MessageRow) -> None:
-        for key, val in dict(self._message_id_row_map).items():
-            if val is row:
-                del self._message_id_row_map[key]
+        message_ids = [row.message_id]
+        pks = [row.orig_pk, row.pk]
+        for correction in row.corrections:
+            message_ids.append(correction.id)
+            pks.append(correction.pk)
+
+        for message_id in message_ids:
+            self._pop_row(self._message_id_row_map, message_id, row)
+
+        self._pop_row(self._stanza_id_row_map, row.stanza_id, row)
+
+        for pk in pks:
+            self._pop_row(self._pk_row_map, pk, row)
+
+        index = self._get_message_row_index(row)
+        if index is not None:
+            del self._message_rows[index]
+
+    @staticmethod
+    def _pop_row(row_map: dict[Any, MessageRow],
+                 key: Any,
+                 row: MessageRow
+                 ) -> None:
+
+        if key is None:
+            return
+        # The key may have been taken over by another row
+        if row_map.get(key) is row:
+            del row_map[key]
 
-        for key, val in dict(self._stanza_id_row_map).items():
-            if val is row:
-                del self._stanza_id_row_map[key]
+    def _add_to_pk_map(self, row: MessageRow) -> None:
+        self._pk_row_map[row.orig_pk] = row
+        if row.pk is not None:
+            # pk of the last correction
+            self._pk_row_map[row.pk] = row
+
+    @staticmethod
+    def _message_row_sort_key(row: MessageRow) -> tuple[datetime, int]:
+        return row.timestamp, row.orig_pk
+
+    def _get_message_row_index(self, row: MessageRow) -> int | None:
+        index = bisect.bisect_left(
+            self._message_rows,
+            self._message_row_sort_key(row),
+            key=self._message_row_sort_key)
+
+        if index == len(self._message_rows):
+            return None
+        if self._message_rows[index] is not row:
+            return None
+        return index
 
     def acknowledge_message(self, event: events.MessageAcknowledged) -> None:
         row = self.get_row_by_pk(event.pk)
@@ -683,11 +969,13 @@ def acknowledge_message(self, event: events.MessageAcknowledged) -> None:
         self._check_for_merge(row)
 
     def scroll_to_message_and_highlight(self, pk: int) -> None:
-        highlight_row = None
-        for row in cast(list[BaseRow], self._list_box.get_children()):
-            if row.pk == pk:
-                highlight_row = row
-                break
+        highlight_row = self.get_row_by_pk(pk)
+        if highlight_row is None:
+            # Call and file transfer rows are not indexed
+            for row in cast(list[BaseRow], self._list_box.get_children()):
+                if row.pk == pk:
+                    highlight_row = row
+                    break
 
         if highlight_row is None:
             return
@@ -737,19 +1025,16 @@ def _get_message_row_by_direction(
         if direction is None:
             return row
 
-        index = row.get_index()
-        while True:
-            if direction == Direction.PREV:
-                index -= 1
-            else:
-                index += 1
-
-            row = self._list_box.get_row_at_index(index)
-            if row is None:
-                return None
+        index = self._get_message_row_index(row)
+        assert index is not None
+        if direction == Direction.PREV:
+            index -= 1
+        else:
+            index += 1
 
-            if isinstance(row, MessageRow):
-                return row
+        if not 0 <= index < len(self._message_rows):
+            return None
+        return self._message_rows[index]
 
     def get_prev_message_row(
         self,
@@ -770,13 +1055,7 @@ def get_next_message_row(
             pk, direction=Direction.NEXT)
 
     def get_row_by_pk(self, pk: int) -> MessageRow | None:
-        for row in cast(list[BaseRow], self._list_box.get_children()):
-            if not isinstance(row, MessageRow):
-                continue
-            if pk in {row.pk, row.orig_pk}:
-                return row
-
-        return None
+        return self._pk_row_map.get(pk)
 
     def iter_rows(self) -> Generator[BaseRow, None, None]:
         yield from cast(list[BaseRow], self._list_box.get_children())
@@ -814,6 +1093,7 @@ def correct_message(self, event: events.MessageCorrected) -> None:
             self._message_id_row_map[event.message.id] = message_row
 
         message_row.refresh()
+        self._add_to_pk_map(message_row)
 
         assert self._read_marker_row is not None
         timestamp = message_row.timestamp + timedelta(microseconds=1)
@@ -2,9 +2,17 @@
 #
 # SPDX-License-Identifier: GPL-3.0-only
 
+from __future__ import annotations
+
 from typing import Any
 
+import itertools
+import logging
 import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
 
 import nbxmpp
 from gi.repository import Gdk
@@ -14,10 +22,9 @@
 from gi.repository import GtkSource
 
 from gajim.common import app
+from gajim.common import configpaths
 from gajim.common import ged
 from gajim.common.const import Direction
-from gajim.common.events import AccountDisabled
-from gajim.common.events import AccountEnabled
 from gajim.common.events import StanzaReceived
 from gajim.common.events import StanzaSent
 from gajim.common.i18n import _
@@ -34,6 +41,21 @@
 from gajim.gtk.util import MaxWidthComboBoxText
 from gajim.gtk.util import scroll_to_end
 
+# Stanzas kept in memory, older stanzas are dropped
+MAX_STANZAS = 10000
+MAX_STANZAS_SIZE = 20 * 1024 * 1024
+
+# Stanzas rendered at once, older stanzas are rendered page by page
+# when scrolling to the top
+PAGE_SIZE = 100
+MAX_RENDERED = 3 * PAGE_SIZE
+
+STANZA_FILE_NAME = 'stanzas.log'
+STANZA_FILE_MAX_SIZE = 10 * 1024 * 1024
+STANZA_FILE_BACKUP_COUNT = 3
+
+StanzaPosition = tuple[int, int]
+
 
 class DebugConsoleWindow(Gtk.ApplicationWindow, EventHelper):
     def __init__(self) -> None:
@@ -52,6 +74,13 @@ def __init__(self) -> None:
         self._sent_stanzas = SentSzanzas()
         self._last_selected_ts = 0
         self._last_search: str = ''
+        self._search_pos: StanzaPosition | None = None
+
+        self._stanzas = StanzaBuffer(MAX_STANZAS, MAX_STANZAS_SIZE)
+        # Sequence number and length of the rendered stanzas
+        self._rendered: deque[tuple[int, int]] = deque()
+        self._stanza_file: RotatingFileHandler | None = None
+        self._write_to_file = False
 
         self._presence = True
         self._message = True
@@ -83,8 +112,6 @@ def __init__(self) -> None:
         self._ui.actionbox.pack_end(self._combo, False, False, 0)
         self._ui.actionbox.reorder_child(self._combo, 1)
 
-        self._create_tags()
-
         source_manager = GtkSource.LanguageManager.get_default()
         lang = source_manager.get_language('xml')
         self._ui.protocol_view.get_buffer().set_language(lang)
@@ -121,12 +148,11 @@ def __init__(self) -> None:
         self.register_events([
             ('stanza-received', ged.GUI1, self._on_stanza_received),
             ('stanza-sent', ged.GUI1, self._on_stanza_sent),
-            ('account-enabled', ged.GUI1, self._on_account_changed),
-            ('account-disabled', ged.GUI1, self._on_account_changed)
         ])
 
     def _on_destroy(self, *args: Any) -> None:
         get_log_console_handler().set_callback(None)
+        self._close_stanza_file()
         self._ui.popover.destroy()
         app.check_finalize(self)
 
@@ -143,6 +169,9 @@ def _on_adj_value_changed(self,
         autoscroll = bottom - adj.get_value() < 1
         self._ui.jump_to_end_button.set_visible(not autoscroll)
 
+        if adj.get_value() == 0 and bottom > 0:
+            self._load_older()
+
     def _on_jump_to_end_clicked(self, _button: Gtk.Button) -> None:
         vadjustment = self._ui.scrolled.get_vadjustment()
         vadjustment.set_value(vadjustment.get_upper())
@@ -159,17 +188,6 @@ def _set_titlebar(self) -> None:
             title = app.get_jid_from_account(self._selected_account)
         self._ui.headerbar.set_subtitle(title)
 
-    def _on_account_changed(self,
-                            event: AccountEnabled | AccountDisabled
-                            ) -> None:
-        buf = self._ui.protocol_view.get_buffer()
-
-        if isinstance(event, AccountEnabled):
-            buf.create_tag(event.account)
-        else:
-            start, end = buf.get_bounds()
-            buf.remove_tag_by_name(event.account, start, end)
-
     def _on_stack_child_changed(self,
                                 _widget: Gtk.Stack,
                                 _pspec: GObject.ParamSpec
@@ -178,24 +196,6 @@ def _on_stack_child_changed(self,
         name = self._ui.stack.get_visible_child_name()
         self._ui.search_toggle.set_sensitive(name == 'protocol')
 
-    def _create_tags(self) -> None:
-        tags = [
-            'incoming',
-            'outgoing',
-            'presence',
-            'message',
-            'stream',
-            'iq'
-        ]
-
-        accounts = app.settings.get_active_accounts()
-        tags.extend(accounts)
-
-        tags.append('AccountWizard')
-
-        for tag_name in tags:
-            self._ui.protocol_view.get_buffer().create_tag(tag_name)
-
     def _add_log_record(self, message: str) -> None:
         buf = self._ui.log_view.get_buffer()
         end_iter = buf.get_end_iter()
@@ -339,40 +339,47 @@ def _on_search_clicked(self, button: Gtk.ToolButton) -> None:
 
     def _find(self, direction: Direction) -> None:
         search_str = self._ui.search_entry.get_text()
-        textbuffer = self._ui.protocol_view.get_buffer()
-        cursor_mark = textbuffer.get_insert()
-        current_pos = textbuffer.get_iter_at_mark(cursor_mark)
+        if not search_str:
+            return
 
-        if current_pos.get_offset() == textbuffer.get_char_count():
-            current_pos = textbuffer.get_start_iter()
+        if search_str != self._last_search:
+            self._search_pos = None
+        self._last_search = search_str
 
-        last_pos_mark = textbuffer.get_mark('last_pos')
-        if last_pos_mark is not None:
-            current_pos = textbuffer.get_iter_at_mark(last_pos_mark)
+        result = self._stanzas.find(
+            search_str, self._search_pos, direction, self._matches)
+        if result is None:
+            return
 
-        if search_str != self._last_search:
-            current_pos = textbuffer.get_start_iter()
-
-        if direction == Direction.NEXT:
-            match = current_pos.forward_search(
-                search_str,
-                Gtk.TextSearchFlags.VISIBLE_ONLY |
-                Gtk.TextSearchFlags.CASE_INSENSITIVE,
-                None)
+        entry, pos = result
+        self._search_pos = (entry.seq, pos)
+
+        # Render older pages until the match is part of the view
+        while self._rendered and entry.seq < self._rendered[0][0]:
+            if not self._load_older(keep_position=False):
+                return
+
+        offset = 0
+        for seq, length in self._rendered:
+            if seq == entry.seq:
+                break
+            offset += length
         else:
-            current_pos.backward_cursor_position()
-            match = current_pos.backward_search(
-                search_str,
-                Gtk.TextSearchFlags.VISIBLE_ONLY |
-                Gtk.TextSearchFlags.CASE_INSENSITIVE,
-                None)
-
-        if match is not None:
-            match_start, match_end = match
-            textbuffer.select_range(match_start, match_end)
+            return
+
+        offset += len(self._format_header(entry)) + pos
+
+        textbuffer = self._ui.protocol_view.get_buffer()
+        match_start = textbuffer.get_iter_at_offset(offset)
+        match_end = textbuffer.get_iter_at_offset(offset + len(search_str))
+        textbuffer.select_range(match_start, match_end)
+
+        mark = textbuffer.get_mark('last_pos')
+        if mark is None:
             mark = textbuffer.create_mark('last_pos', match_end, True)
-            self._ui.protocol_view.scroll_to_mark(mark, 0, True, 0.5, 0.5)
-        self._last_search = search_str
+        else:
+            textbuffer.move_mark(mark, match_end)
+        self._ui.protocol_view.scroll_to_mark(mark, 0, True, 0.5, 0.5)
 
     @staticmethod
     def _get_accounts() -> list[tuple[str | None, str]]:
@@ -440,6 +447,13 @@ def _on_filter_options(self, _button: Gtk.Button) -> None:
                     self._outgoing,
                     callback=self._on_setting,
                     data='outgoing'),
+
+            Setting(SettingKind.SWITCH,
+                    'Write to File',
+                    SettingType.VALUE,
+                    self._write_to_file,
+                    callback=self._on_write_to_file,
+                    desc=str(configpaths.get('DEBUG') / STANZA_FILE_NAME)),
         ]
 
         self._filter_dialog = SettingsDialog(
@@ -454,53 +468,47 @@ def _on_filter_destroyed(self, _widget: Gtk.Widget) -> None:
         self._filter_dialog = None
 
     def _on_clear(self, _button: Gtk.Button) -> None:
-        self._ui.protocol_view.get_buffer().set_text('')
-
-    def _apply_filters(self) -> None:
-        table = self._ui.protocol_view.get_buffer().get_tag_table()
-
-        active_accounts = app.settings.get_active_accounts()
-        active_accounts.append('AccountWizard')
-        for account in active_accounts:
-            tag = table.lookup(account)
-            if tag is None:
-                continue
-
-            if self._selected_account == 'AllAccounts':
-                visible = True
-            else:
-                visible = account == self._selected_account
-
-            if visible:
-                tag.set_priority(0)
-            else:
-                tag.set_priority(table.get_size() - 1)
-
-            tag.set_property('invisible', not visible)
+        self._stanzas.clear()
+        self._render()
 
-        for data in ['presence', 'message', 'iq', 'stream', 'incoming', 'outgoing']:
-            visible = getattr(self, f'_{data}')
+    def _matches(self, entry: StanzaEntry) -> bool:
+        if self._selected_account not in {'AllAccounts', entry.account}:
+            return False
 
-            tag = table.lookup(data)
-            if tag is None:
-                continue
-
-            if data in ('incoming', 'outgoing'):
-                if visible:
-                    tag.set_priority(0)
-                else:
-                    tag.set_priority(table.get_size() - 1)
+        if not getattr(self, f'_{entry.direction}'):
+            return False
 
-            tag.set_property('invisible', not visible)
+        if entry.type is not None:
+            return getattr(self, f'_{entry.type}')
+        return True
 
     def _set_account(self, value: str, _data: Any) -> None:
         self._selected_account = value
         self._set_titlebar()
-        self._apply_filters()
+        self._render()
 
     def _on_setting(self, value: bool, data: str) -> None:
         setattr(self, f'_{data}', value)
-        self._apply_filters()
+        self._render()
+
+    def _on_write_to_file(self, value: bool, _data: Any) -> None:
+        self._write_to_file = value
+        if not value:
+            self._close_stanza_file()
+            return
+
+        path = configpaths.get('DEBUG') / STANZA_FILE_NAME
+        self._stanza_file = RotatingFileHandler(
+            path,
+            maxBytes=STANZA_FILE_MAX_SIZE,
+            backupCount=STANZA_FILE_BACKUP_COUNT,
+            encoding='utf8')
+        self._stanza_file.terminator = ''
+
+    def _close_stanza_file(self) -> None:
+        if self._stanza_file is not None:
+            self._stanza_file.close()
+            self._stanza_file = None
 
     def _on_stanza_received(self, event: StanzaReceived):
         self._print_stanza(event, 'incoming')
@@ -525,12 +533,7 @@ def _print_stanza(self,
         if not stanza:
             return
 
-        is_at_the_end = at_the_end(self._ui.scrolled)
-
-        buffer_ = self._ui.protocol_view.get_buffer()
-        end_iter = buffer_.get_end_iter()
-
-        type_ = kind
+        type_ = None
         if stanza.startswith('<presence'):
             type_ = 'presence'
         elif stanza.startswith('<message'):
@@ -540,16 +543,258 @@ def _print_stanza(self,
         elif stanza.startswith(('<r', '<a')):
             type_ = 'stream'
 
-        text = '<!-- {kind} {time} ({account}) -->\n{stanza}\n\n'.format(
-            kind=kind.capitalize(),
-            time=time.strftime('%c'),
-            account=account_label,
-            stanza=stanza)
-        buffer_.insert_with_tags_by_name(
-            end_iter, text, type_, kind, event.account)
+        entry = self._stanzas.add(
+            event.account, account_label, kind, type_, stanza)
+
+        text = self._format_entry(entry)
+        if self._stanza_file is not None:
+            self._stanza_file.handle(logging.makeLogRecord({'msg': text}))
+
+        if not self._matches(entry):
+            return
+
+        is_at_the_end = at_the_end(self._ui.scrolled)
+
+        anchor = None
+        if not is_at_the_end and len(self._rendered) >= MAX_RENDERED:
+            # Removing the oldest stanzas would move the text in view
+            anchor = self._create_visible_start_mark()
+
+        buffer_ = self._ui.protocol_view.get_buffer()
+        buffer_.insert(buffer_.get_end_iter(), text)
+        self._rendered.append((entry.seq, len(text)))
+        self._remove_oldest_rendered()
 
         if is_at_the_end:
             GLib.idle_add(scroll_to_end, self._ui.scrolled)
+        elif anchor is not None:
+            GLib.idle_add(self._scroll_to_mark, anchor)
+
+    @staticmethod
+    def _format_header(entry: StanzaEntry) -> str:
+        return '<!-- {kind} {time} ({account}) -->\n'.format(
+            kind=entry.direction.capitalize(),
+            time=time.strftime('%c', time.localtime(entry.timestamp)),
+            account=entry.account_label)
+
+    def _format_entry(self, entry: StanzaEntry) -> str:
+        return f'{self._format_header(entry)}{entry.stanza}\n\n'
+
+    def _render(self) -> None:
+        '''
+        Render the last page of stanzas matching the filters
+        '''
+
+        buffer_ = self._ui.protocol_view.get_buffer()
+        buffer_.set_text('')
+        self._rendered.clear()
+        self._search_pos = None
+
+        end_iter = buffer_.get_end_iter()
+        for entry in self._stanzas.get_last(PAGE_SIZE, self._matches):
+            text = self._format_entry(entry)
+            buffer_.insert(end_iter, text)
+            self._rendered.append((entry.seq, len(text)))
+
+        GLib.idle_add(scroll_to_end, self._ui.scrolled)
+
+    def _load_older(self, keep_position: bool = True) -> bool:
+        '''
+        Render the page of stanzas before the first rendered stanza,
+        returns False if there are no older stanzas
+        '''
+
+        if not self._rendered:
+            return False
+
+        entries = self._stanzas.get_before(
+            self._rendered[0][0], PAGE_SIZE, self._matches)
+        if not entries:
+            return False
+
+        buffer_ = self._ui.protocol_view.get_buffer()
+        # The mark moves along with the previously first stanza
+        mark = buffer_.create_mark(None, buffer_.get_start_iter(), False)
+
+        iter_ = buffer_.get_start_iter()
+        rendered: list[tuple[int, int]] = []
+        for entry in entries:
+            text = self._format_entry(entry)
+            buffer_.insert(iter_, text)
+            rendered.append((entry.seq, len(text)))
+        self._rendered.extendleft(reversed(rendered))
+
+        if keep_position:
+            GLib.idle_add(self._scroll_to_mark, mark)
+        else:
+            buffer_.delete_mark(mark)
+        return True
+
+    def _create_visible_start_mark(self) -> Gtk.TextMark:
+        view = self._ui.protocol_view
+        rect = view.get_visible_rect()
+        _found, iter_ = view.get_iter_at_location(rect.x, rect.y)
+        return view.get_buffer().create_mark(None, iter_, True)
+
+    def _scroll_to_mark(self, mark: Gtk.TextMark) -> None:
+        self._ui.protocol_view.scroll_to_mark(mark, 0, True, 0, 0)
+        self._ui.protocol_view.get_buffer().delete_mark(mark)
+
+    def _remove_oldest_rendered(self) -> None:
+        count = len(self._rendered) - MAX_RENDERED
+        if count <= 0:
+            return
+
+        length = 0
+        for _num in range(count):
+            length += self._rendered.popleft()[1]
+
+        buffer_ = self._ui.protocol_view.get_buffer()
+        buffer_.delete(buffer_.get_start_iter(),
+                       buffer_.get_iter_at_offset(length))
+
+
+@dataclass(frozen=True)
+class StanzaEntry:
+    seq: int
+    account: str
+    account_label: str
+    direction: str
+    type: str | None
+    timestamp: float
+    size: int
+    stanza: str
+
+
+class StanzaBuffer:
+    '''
+    Ring buffer of the last stanzas, limited by the count of stanzas and
+    their total size in bytes. Each stanza gets an increasing sequence
+    number, which identifies it as long as it is part of the buffer.
+    '''
+
+    def __init__(self, max_count: int, max_size: int) -> None:
+        self._max_count = max_count
+        self._max_size = max_size
+        self._entries: deque[StanzaEntry] = deque()
+        self._size = 0
+        self._next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def add(self,
+            account: str,
+            account_label: str,
+            direction: str,
+            type_: str | None,
+            stanza: str
+            ) -> StanzaEntry:
+
+        entry = StanzaEntry(seq=self._next_seq,
+                            account=account,
+                            account_label=account_label,
+                            direction=direction,
+                            type=type_,
+                            timestamp=time.time(),
+                            size=len(stanza.encode()),
+                            stanza=stanza)
+        self._next_seq += 1
+
+        self._entries.append(entry)
+        self._size += entry.size
+
+        while (len(self._entries) > self._max_count or
+               self._size > self._max_size and len(self._entries) > 1):
+            self._size -= self._entries.popleft().size
+
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def get_last(self,
+                 count: int,
+                 predicate: Callable[[StanzaEntry], bool]
+                 ) -> list[StanzaEntry]:
+        return self.get_before(self._next_seq, count, predicate)
+
+    def get_before(self,
+                   seq: int,
+                   count: int,
+                   predicate: Callable[[StanzaEntry], bool]
+                   ) -> list[StanzaEntry]:
+        '''
+        Returns up to count stanzas matching predicate, which are older
+        than the stanza with seq, in chronological order
+        '''
+
+        entries: list[StanzaEntry] = []
+        if not self._entries or count <= 0:
+            return entries
+
+        # Number of entries which are not older than seq
+        skip = max(len(self._entries) - (seq - self._entries[0].seq), 0)
+        for entry in itertools.islice(reversed(self._entries), skip, None):
+            if predicate(entry):
+                entries.append(entry)
+                if len(entries) == count:
+                    break
+
+        entries.reverse()
+        return entries
+
+    def find(self,
+             text: str,
+             start: StanzaPosition | None,
+             direction: Direction,
+             predicate: Callable[[StanzaEntry], bool]
+             ) -> tuple[StanzaEntry, int] | None:
+        '''
+        Search case-insensitively for text in the stanzas matching predicate,
+        starting after the position start (sequence number, offset).
+        The search wraps around at the ends of the buffer.
+        '''
+
+        if not self._entries or not text:
+            return None
+
+        text = text.lower()
+        entries = list(self._entries)
+        step = 1 if direction == Direction.NEXT else -1
+
+        offset = None
+        index = 0 if step == 1 else len(entries) - 1
+        if start is not None:
+            seq, pos = start
+            if 0 <= seq - entries[0].seq < len(entries):
+                index = seq - entries[0].seq
+                offset = pos
+
+        for num in range(len(entries) + 1):
+            entry = entries[(index + num * step) % len(entries)]
+            if not predicate(entry):
+                offset = None
+                continue
+
+            stanza = entry.stanza.lower()
+            if step == 1:
+                pos = stanza.find(
+                    text, 0 if offset is None else offset + 1)
+            else:
+                end = len(stanza) if offset is None else offset + len(text) - 1
+                pos = stanza.rfind(text, 0, end)
+
+            if pos != -1:
+                return entry, pos
+            offset = None
+
+        return None
 
 
 class SentSzanzas:
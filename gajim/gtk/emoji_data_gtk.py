@@ -4,8 +4,13 @@
 
 from __future__ import annotations
 
+from typing import NamedTuple
+
+import bisect
+import functools
 import logging
 from collections import defaultdict
+from collections.abc import Iterator
 
 from gi.repository import Gio
 from gi.repository import GLib
@@ -67,6 +72,74 @@ def replace_skin_tone_placeholder(c_sequence: list[int],
     return c_mod_sequence
 
 
+class EmojiMatch(NamedTuple):
+    keyword: str
+    short_name: str
+    emoji: str
+
+
+class EmojiIndex:
+    '''
+    Prefix index over emoji data. Keywords are kept in sorted arrays, so
+    all keywords starting with a prefix form a contiguous range which is
+    found by bisection.
+    '''
+
+    def __init__(self, emoji_data: dict[str, dict[str, str]]) -> None:
+        self._short_names: list[EmojiMatch] = []
+        self._keywords: list[EmojiMatch] = []
+
+        for keyword, entries in emoji_data.items():
+            for short_name, emoji in entries.items():
+                match = EmojiMatch(keyword, short_name, emoji)
+                if keyword == short_name:
+                    self._short_names.append(match)
+                else:
+                    self._keywords.append(match)
+
+        self._short_names.sort()
+        self._keywords.sort()
+
+    @staticmethod
+    def _iter_prefix(matches: list[EmojiMatch],
+                     prefix: str
+                     ) -> Iterator[EmojiMatch]:
+
+        start = bisect.bisect_left(
+            matches, prefix, key=lambda match: match.keyword)
+        for index in range(start, len(matches)):
+            match = matches[index]
+            if not match.keyword.startswith(prefix):
+                break
+            yield match
+
+    def find(self, prefix: str, max_results: int) -> list[EmojiMatch]:
+        '''
+        Returns at most `max_results` matches for emoji with a keyword
+        starting with `prefix`, one per emoji. Short name matches are
+        returned before keyword matches.
+        '''
+        results: list[EmojiMatch] = []
+        seen: set[str] = set()
+
+        for match in self._iter_prefix(self._short_names, prefix):
+            if len(results) >= max_results:
+                return results
+            if match.emoji not in seen:
+                seen.add(match.emoji)
+                results.append(match)
+
+        for match in self._iter_prefix(self._keywords, prefix):
+            if len(results) >= max_results:
+                break
+            if match.emoji not in seen:
+                seen.add(match.emoji)
+                results.append(match)
+
+        return results
+
+
+@functools.cache
 def get_emoji_data() -> dict[str, dict[str, str]]:
     '''
     Returns dict of `keyword` -> dict of `short_name` -> `emoji`, where
@@ -74,9 +147,15 @@ def get_emoji_data() -> dict[str, dict[str, str]]:
     <https://unicode.org/reports/tr35/tr35-general.html#Annotations>, and
     `emoji` is an emoji grapheme cluster.
 
-    Short names are included among keywords.
+    Short names are included among keywords. The data is loaded on the
+    first call.
     '''
-    return emoji_data
+    return load_emoji_data()
+
+
+@functools.cache
+def get_emoji_index() -> EmojiIndex:
+    return EmojiIndex(get_emoji_data())
 
 
 def try_load_raw_emoji_data(locale: str) -> GLib.Bytes | None:
@@ -193,21 +272,23 @@ def get_locale_fallbacks(desired: str) -> list[str]:
     return result
 
 
-app_locale = get_default_lang()
-log.info('Loading emoji data; application locale is %s', app_locale)
-short_locale = get_short_lang_code(app_locale)
-locales = get_locale_fallbacks(short_locale)
-try:
-    log.debug('Trying locales %s', locales)
-    raw_emoji_data: GLib.Bytes | None = None
-    for loc in locales:
-        raw_emoji_data = try_load_raw_emoji_data(loc)
-        if raw_emoji_data:
-            break
-    else:
-        raise RuntimeError(f'No resource could be loaded; tried {locales}')
-
-    emoji_data = parse_emoji_data(raw_emoji_data, loc)
-except Exception as err:
-    log.warning('Unable to load emoji data: %s', err)
-    emoji_data = {}
+def load_emoji_data() -> dict[str, dict[str, str]]:
+    app_locale = get_default_lang()
+    log.info('Loading emoji data; application locale is %s', app_locale)
+    short_locale = get_short_lang_code(app_locale)
+    locales = get_locale_fallbacks(short_locale)
+    try:
+        log.debug('Trying locales %s', locales)
+        raw_emoji_data: GLib.Bytes | None = None
+        for loc in locales:
+            raw_emoji_data = try_load_raw_emoji_data(loc)
+            if raw_emoji_data:
+                break
+        else:
+            raise RuntimeError(
+                f'No resource could be loaded; tried {locales}')
+
+        return parse_emoji_data(raw_emoji_data, loc)
+    except Exception as err:
+        log.warning('Unable to load emoji data: %s', err)
+        return {}
@@ -4,27 +4,84 @@
 
 from __future__ import annotations
 
+from typing import Any
+
+import bisect
 import logging
+from collections.abc import Iterable
+from collections.abc import Iterator
 
 from gi.repository import Gdk
 from gi.repository import GtkSource
+from nbxmpp.protocol import JID
 
 from gajim.common import app
 from gajim.common import ged
+from gajim.common import types
 from gajim.common.events import MessageReceived
+from gajim.common.events import MUCNicknameChanged
 from gajim.common.ged import EventHelper
 from gajim.common.helpers import jid_is_blocked
 from gajim.common.modules.contacts import GroupchatContact
+from gajim.common.storage.archive.const import MessageType
 
 log = logging.getLogger('gajim.gtk.groupchat_nick_completion')
 
 
+class NickIndex:
+    '''
+    Nicknames sorted case-insensitively, prefix queries are answered
+    by bisecting the sorted list
+    '''
+
+    def __init__(self, nicks: Iterable[str] = ()) -> None:
+        self._entries = sorted({(nick.lower(), nick) for nick in nicks})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, nick: str) -> bool:
+        entry = (nick.lower(), nick)
+        index = bisect.bisect_left(self._entries, entry)
+        return index < len(self._entries) and self._entries[index] == entry
+
+    def add(self, nick: str) -> None:
+        entry = (nick.lower(), nick)
+        index = bisect.bisect_left(self._entries, entry)
+        if index < len(self._entries) and self._entries[index] == entry:
+            return
+        self._entries.insert(index, entry)
+
+    def remove(self, nick: str) -> None:
+        entry = (nick.lower(), nick)
+        index = bisect.bisect_left(self._entries, entry)
+        if index < len(self._entries) and self._entries[index] == entry:
+            del self._entries[index]
+
+    def iter_prefix(self, prefix: str) -> Iterator[str]:
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._entries, (prefix,))
+        for index in range(start, len(self._entries)):
+            key, nick = self._entries[index]
+            if not key.startswith(prefix):
+                return
+            yield nick
+
+
 class GroupChatNickCompletion(EventHelper):
     def __init__(self) -> None:
         EventHelper.__init__(self)
 
         self._contact: GroupchatContact | None = None
 
+        # Participants of the current group chat, kept up to date
+        # from the contact signals
+        self._participants = NickIndex()
+
+        # Nicknames of recent messages, per group chat. Seeded once
+        # from the archive and updated from received messages.
+        self._recent_nicks: dict[tuple[str, JID], NickIndex] = {}
+
         self._suggestions: list[str] = []
         self._last_key_tab = False
 
@@ -34,7 +91,73 @@ def __init__(self) -> None:
     def switch_contact(self, contact: GroupchatContact) -> None:
         self._suggestions.clear()
         self._last_key_tab = False
+
+        if self._contact is not None:
+            self._contact.disconnect_all_from_obj(self)
+
         self._contact = contact
+        self._contact.multi_connect({
+            'user-joined': self._on_user_joined,
+            'user-left': self._on_user_left,
+            'user-nickname-changed': self._on_user_nickname_changed,
+        })
+
+        self._participants = NickIndex(
+            participant.name for participant in contact.get_participants())
+
+        key = (contact.account, contact.jid)
+        if key not in self._recent_nicks:
+            # Get recent nicknames from DB. This enables us to suggest
+            # nicknames even if no message arrived since Gajim was started.
+            self._recent_nicks[key] = NickIndex()
+            app.storage.archive.get_recent_muc_nicks_async(
+                contact.account,
+                contact.jid,
+                lambda nicks: self._on_recent_nicks_loaded(key, nicks))
+
+    def _on_recent_nicks_loaded(self,
+                                key: tuple[str, JID],
+                                nicks: set[str] | None
+                                ) -> None:
+        if nicks is None:
+            # Loading failed, try again on the next switch
+            self._recent_nicks.pop(key, None)
+            return
+
+        recent_nicks = self._recent_nicks.get(key)
+        if recent_nicks is None:
+            return
+
+        for nick in nicks:
+            recent_nicks.add(nick)
+
+        self._suggestions.clear()
+
+    def _on_user_joined(self,
+                        _contact: types.GroupchatContact,
+                        _signal_name: str,
+                        user_contact: types.GroupchatParticipant,
+                        *args: Any
+                        ) -> None:
+        self._participants.add(user_contact.name)
+
+    def _on_user_left(self,
+                      _contact: types.GroupchatContact,
+                      _signal_name: str,
+                      user_contact: types.GroupchatParticipant,
+                      *args: Any
+                      ) -> None:
+        self._participants.remove(user_contact.name)
+
+    def _on_user_nickname_changed(self,
+                                  _contact: types.GroupchatContact,
+                                  _signal_name: str,
+                                  _event: MUCNicknameChanged,
+                                  old_contact: types.GroupchatParticipant,
+                                  new_contact: types.GroupchatParticipant
+                                  ) -> None:
+        self._participants.remove(old_contact.name)
+        self._participants.add(new_contact.name)
 
     def process_key_press(self,
                           source_view: GtkSource.View,
@@ -112,42 +235,41 @@ def process_key_press(self,
         return True
 
     def _generate_suggestions(self, prefix: str) -> list[str]:
-        def _nick_matching(nick: str) -> bool:
-            assert self._contact is not None
-            if nick == self._contact.nickname:
-                return False
+        assert self._contact is not None
+        own_nick = self._contact.nickname
+        account = self._contact.account
+        room_jid = self._contact.jid
 
-            participant = self._contact.get_resource(nick)
-            if jid_is_blocked(self._contact.account, str(participant.jid)):
+        def _nick_matching(nick: str) -> bool:
+            if nick == own_nick:
                 return False
-
-            if prefix == '':
-                return True
-
-            return nick.lower().startswith(prefix.lower())
-
-        assert self._contact is not None
-        # Get recent nicknames from DB. This enables us to suggest
-        # nicknames even if no message arrived since Gajim was started.
-        recent_nicknames = app.storage.archive.get_recent_muc_nicks(
-            self._contact.account, self._contact.jid)
+            return not jid_is_blocked(account, f'{room_jid}/{nick}')
 
         matches: list[str] = []
-        for nick in recent_nicknames:
-            if _nick_matching(nick):
-                matches.append(nick)
+        recent_nicks = self._recent_nicks.get((account, room_jid))
+        if recent_nicks is not None:
+            for nick in recent_nicks.iter_prefix(prefix):
+                if _nick_matching(nick):
+                    matches.append(nick)
 
         # Add all other MUC participants
-        other_nicks: list[str] = []
-        for contact in self._contact.get_participants():
-            if _nick_matching(contact.name):
-                if contact.name not in matches:
-                    other_nicks.append(contact.name)
-        other_nicks.sort(key=str.lower)
+        recent = set(matches)
+        for nick in self._participants.iter_prefix(prefix):
+            if nick not in recent and _nick_matching(nick):
+                matches.append(nick)
 
-        return matches + other_nicks
+        return matches
 
     def _on_message_received(self, event: MessageReceived) -> None:
+        if event.m_type != MessageType.GROUPCHAT:
+            return
+
+        recent_nicks = self._recent_nicks.get((event.account, event.jid))
+        if recent_nicks is not None:
+            resource = event.message.resource
+            if resource is not None:
+                recent_nicks.add(resource)
+
         if self._contact is None:
             return
 
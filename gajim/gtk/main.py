@@ -10,6 +10,7 @@
 import logging
 import os
 import shutil
+from collections.abc import Iterator
 from pathlib import Path
 
 from gi.repository import Gdk
@@ -26,6 +27,7 @@
 from gajim.common.const import Direction
 from gajim.common.const import Display
 from gajim.common.const import SimpleClientState
+from gajim.common.disk_cache import CacheFileT
 from gajim.common.ged import EventHelper
 from gajim.common.helpers import open_file
 from gajim.common.helpers import open_uri
@@ -164,6 +166,9 @@ def __init__(self) -> None:
             client.connect_signal('resume-successful',
                                   self._on_client_resume_successful)
 
+        app.disk_cache.register_protected_files_func(
+            self._get_protected_cache_files)
+
     def get_action(self, name: str) -> Gio.SimpleAction:
         action = self.lookup_action(name)
         assert isinstance(action, Gio.SimpleAction)
@@ -1157,6 +1162,32 @@ def get_control(self) -> ChatControl:
     def chat_exists(self, account: str, jid: JID) -> bool:
         return self._chat_page.chat_exists(account, jid)
 
+    def _get_protected_cache_files(self) -> Iterator[CacheFileT]:
+        # Avatars of open chats, own accounts and workspaces are
+        # never evicted from the disk cache
+        for workspace_id in app.settings.get_workspaces():
+            sha = app.settings.get_workspace_setting(
+                workspace_id, 'avatar_sha')
+            if sha:
+                yield 'avatars', sha
+
+        for account in app.settings.get_active_accounts():
+            jid = JID.from_string(app.get_jid_from_account(account))
+            sha = app.storage.cache.get_contact(account, jid, 'avatar')
+            if sha:
+                yield 'avatars', sha
+
+        chat_list_stack = self._chat_page.get_chat_list_stack()
+        for chat in chat_list_stack.get_open_chats():
+            if chat['type'] == 'groupchat':
+                sha = app.storage.cache.get_muc(
+                    chat['account'], chat['jid'], 'avatar')
+            else:
+                sha = app.storage.cache.get_contact(
+                    chat['account'], chat['jid'], 'avatar')
+            if sha:
+                yield 'avatars', sha
+
     def is_message_correctable(self,
                                contact: types.ChatContactT,
                                message_id: str
@@ -168,7 +168,9 @@ def _on_text_changed(self) -> None:
             return
 
         buf = self.get_buffer()
-        result = process(text)
+        # The text changes with every keystroke, caching it would only
+        # evict the results of messages in the conversation
+        result = process(text, cache=False)
         for block in result.blocks:
             if isinstance(block, PlainBlock):
                 for span in block.spans:
@@ -25,18 +25,18 @@
 
 from typing import Any
 
+import functools
 import logging
-import sys
 import time
 from threading import Thread
 
 from gi.repository import GLib
 from gi.repository import Gtk
 from nbxmpp import Hashes2
-from nbxmpp import idlequeue
 from nbxmpp import JID
 
 from gajim.common import app
+from gajim.common import idlequeue
 from gajim.common import proxy65_manager
 from gajim.common import socks5
 from gajim.common.events import FileCompleted
@@ -50,6 +50,10 @@
 
 log = logging.getLogger('gajim.interface')
 
+# Seconds to wait for the checksum of a received file, if the sender
+# announced to send it after the transfer
+CHECKSUM_TIMEOUT = 30
+
 
 class Interface:
     def __init__(self):
@@ -104,32 +108,19 @@ def handle_event_file_rcv_completed(self,
                 return
 
             if file_props.hash_ and file_props.error == 0:
-                # We compare hashes in a new thread
-                self.hashThread = Thread(
-                    target=self.__compare_hashes,
-                    args=(account, file_props))
-                self.hashThread.start()
+                self._check_file_hash(account, file_props)
+            elif file_props.algo is not None and file_props.error == 0:
+                # The sender announced the hash algorithm, the checksum
+                # is sent after the last byte and may still be on its way
+                file_props.checksum_cb = functools.partial(
+                    self._check_file_hash, account, file_props)
+                GLib.timeout_add_seconds(CHECKSUM_TIMEOUT,
+                                         self._on_checksum_timeout,
+                                         account,
+                                         file_props)
             else:
                 # We didn't get the hash, sender probably doesn't support that
-                if file_props.error == 0:
-                    app.ged.raise_event(
-                        FileCompleted(file_props=file_props,
-                                      account=account,
-                                      jid=jid.bare))
-                else:
-                    app.ged.raise_event(
-                        FileError(file_props=file_props,
-                                  account=account,
-                                  jid=jid.bare))
-
-                # End jingle session
-                # TODO: Only if there are no other parallel downloads in
-                # this session
-                client = app.get_client(account)
-                session = client.get_module('Jingle').get_jingle_session(
-                    jid=None, sid=file_props.sid)
-                if session:
-                    session.end_session()
+                self._finish_received_file(account, file_props)
         else:  # We send a file
             app.socks5queue.remove_sender(file_props.sid, True, True)
             if file_props.error == 0:
@@ -143,8 +134,56 @@ def handle_event_file_rcv_completed(self,
                               account=account,
                               jid=jid.bare))
 
+    def _on_checksum_timeout(self,
+                             account: str,
+                             file_props: FileProp
+                             ) -> bool:
+
+        if file_props.checksum_cb is not None:
+            log.warning('No checksum received for %s', file_props.name)
+            file_props.checksum_cb = None
+            self._finish_received_file(account, file_props)
+        return False
+
     @staticmethod
-    def __compare_hashes(account: str, file_props: FileProp) -> None:
+    def _finish_received_file(account: str, file_props: FileProp) -> None:
+        jid = JID.from_string(file_props.receiver)
+        if file_props.error == 0:
+            app.ged.raise_event(
+                FileCompleted(file_props=file_props,
+                              account=account,
+                              jid=jid.bare))
+        else:
+            app.ged.raise_event(
+                FileError(file_props=file_props,
+                          account=account,
+                          jid=jid.bare))
+
+        # End jingle session
+        # TODO: Only if there are no other parallel downloads in
+        # this session
+        client = app.get_client(account)
+        session = client.get_module('Jingle').get_jingle_session(
+            jid=None, sid=file_props.sid)
+        if session:
+            session.end_session()
+
+    def _check_file_hash(self, account: str, file_props: FileProp) -> None:
+        file_props.checksum_cb = None
+        if file_props.transferred_hash is not None:
+            # The data was hashed while receiving
+            self._compare_hashes(
+                account, file_props, file_props.transferred_hash)
+            return
+
+        # The file has to be read again (e.g. resumed transfer), this is
+        # done in a new thread
+        self.hashThread = Thread(
+            target=self.__compute_hash,
+            args=(account, file_props))
+        self.hashThread.start()
+
+    def __compute_hash(self, account: str, file_props: FileProp) -> None:
         hashes = Hashes2()
         try:
             file_ = open(file_props.file_name, 'rb')
@@ -153,6 +192,14 @@ def __compare_hashes(account: str, file_props: FileProp) -> None:
         log.debug('Computing file hash')
         hash_ = hashes.calculateHash(file_props.algo, file_)
         file_.close()
+        GLib.idle_add(self._compare_hashes, account, file_props, hash_)
+
+    @staticmethod
+    def _compare_hashes(account: str,
+                        file_props: FileProp,
+                        hash_: str | None
+                        ) -> None:
+
         # File is corrupt if the calculated hash differs from the received hash
         jid = JID.from_string(file_props.sender)
         if file_props.hash_ == hash_:
@@ -174,43 +221,6 @@ def __compare_hashes(account: str, file_props: FileProp) -> None:
         if session:
             session.end_session()
 
-    def process_connections(self) -> bool:
-        '''
-        Called each foo (200) milliseconds. Check for idlequeue timeouts
-        '''
-        try:
-            app.idlequeue.process()
-        except Exception:
-            # Otherwise, an exception will stop our loop
-
-            if sys.platform == 'win32':
-                # On Windows process() calls select.select(), so we need this
-                # executed as often as possible.
-                # Adding it directly with GLib.idle_add() causes Gajim to use
-                # too much CPU time. That's why its added with 1ms timeout.
-                # On Linux only alarms are checked in process(), so we use
-                # a bigger timeout
-                timeout, in_seconds = 1, None
-            else:
-                timeout, in_seconds = app.idlequeue.PROCESS_TIMEOUT
-
-            if in_seconds:
-                GLib.timeout_add_seconds(timeout, self.process_connections)
-            else:
-                GLib.timeout_add(timeout, self.process_connections)
-            raise
-        return True  # renew timeout (loop for ever)
-
     def run(self, _application: Gtk.Application) -> None:
         # get instances for windows/dialogs that will show_all()/hide()
         self.instances['file_transfers'] = FileTransfersWindow()
-
-        if sys.platform == 'win32':
-            timeout, in_seconds = 20, None
-        else:
-            timeout, in_seconds = app.idlequeue.PROCESS_TIMEOUT
-
-        if in_seconds:
-            GLib.timeout_add_seconds(timeout, self.process_connections)
-        else:
-            GLib.timeout_add(timeout, self.process_connections)
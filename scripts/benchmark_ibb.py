@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Measures the throughput of in-band bytestream (XEP-0047) file transfers
+# against a local stand-in for the peer, which decodes every data IQ and
+# answers it after a simulated round trip time. The previous behaviour
+# (4096 byte blocks, one outstanding data IQ) is compared with the
+# current one.
+
+import argparse
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gi.repository import GLib  # noqa: E402
+from nbxmpp.namespaces import Namespace  # noqa: E402
+
+from gajim.common import app  # noqa: E402
+from gajim.common.const import IBB_MAX_BLOCK_SIZE  # noqa: E402
+from gajim.common.file_props import FilesProp  # noqa: E402
+from gajim.common.modules import ibb  # noqa: E402
+
+ACCOUNT = 'benchmark'
+PEER = 'peer@localhost/benchmark'
+
+
+class FakeTask:
+    def __init__(self, user_data=None):
+        self._user_data = user_data
+
+    def finish(self):
+        return None
+
+    def get_user_data(self):
+        return self._user_data
+
+
+class EchoPeer:
+    '''
+    Stands in for the nbxmpp client and the receiving peer
+    '''
+
+    def __init__(self, round_trip_time):
+        self._round_trip_time = round_trip_time
+        self.hash_obj = hashlib.sha256()
+        self.received = 0
+
+    def get_module(self, _name):
+        return self
+
+    def send_open(self, _jid, _sid, _block_size, callback, user_data):
+        GLib.idle_add(callback, FakeTask(user_data))
+
+    def send_close(self, _jid, _sid, callback):
+        GLib.idle_add(callback, FakeTask())
+
+    def SendAndCallForResponse(self, stanza, callback, user_data):
+        # Serialize like it would be sent, and decode like the peer
+        str(stanza)
+        data = stanza.getTag('data', namespace=Namespace.IBB).getData()
+        chunk = base64.b64decode(data)
+        self.hash_obj.update(chunk)
+        self.received += len(chunk)
+
+        reply = stanza.buildReply('result')
+        GLib.timeout_add(int(self._round_trip_time * 1000),
+                         self._reply, callback, reply, user_data)
+
+    def _reply(self, callback, reply, user_data):
+        callback(self, reply, **user_data)
+        return False
+
+
+def run_transfer(source, block_size, round_trip_time):
+    size = source.stat().st_size
+    peer = EchoPeer(round_trip_time)
+    client = SimpleNamespace(account=ACCOUNT, connection=peer)
+    module = ibb.IBB(client)
+
+    sid = f'benchmark-{time.monotonic_ns()}'
+    file_props = FilesProp.getNewFileProp(ACCOUNT, sid)
+    file_props.transport_sid = sid
+    file_props.file_name = str(source)
+    file_props.size = size
+    file_props.type_ = 's'
+    file_props.receiver = PEER
+    file_props.elapsed_time = 0
+
+    main_loop = GLib.MainLoop()
+    socks5queue = SimpleNamespace(
+        progress_transfer_cb=lambda *args: None,
+        complete_transfer_cb=lambda *args: main_loop.quit(),
+        error_cb=lambda *args: main_loop.quit())
+
+    start = time.monotonic()
+    with patch.object(app, 'socks5queue', socks5queue, create=True), \
+            patch.object(app, 'account_is_connected', return_value=True), \
+            source.open('rb') as fp:
+        module.send_open(PEER, sid, fp, block_size)
+        main_loop.run()
+    duration = time.monotonic() - start
+
+    FilesProp.deleteFileProp(file_props)
+    if not file_props.completed or peer.received != size:
+        raise RuntimeError('Transfer did not complete')
+    return duration, peer.hash_obj.digest()
+
+
+def benchmark(source, legacy, round_trip_time):
+    window_size = 1 if legacy else ibb.IBB_WINDOW_SIZE
+    block_size = 4096 if legacy else IBB_MAX_BLOCK_SIZE
+    with patch.object(ibb, 'IBB_WINDOW_SIZE', window_size):
+        duration, digest = run_transfer(source, block_size, round_trip_time)
+
+    if digest != hashlib.sha256(source.read_bytes()).digest():
+        raise RuntimeError('Received data differs from the sent file')
+    return source.stat().st_size / duration / 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark in-band bytestream file transfers')
+    parser.add_argument('--size', type=int, default=1,
+                        help='File size in MiB (default: 1)')
+    parser.add_argument('--rtt', type=float, default=20,
+                        help='Simulated round trip time in milliseconds '
+                             '(default: 20)')
+    args = parser.parse_args()
+
+    round_trip_time = args.rtt / 1000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = Path(tmp_dir) / 'source'
+        source.write_bytes(os.urandom(args.size * 1024 * 1024))
+
+        before = benchmark(source, True, round_trip_time)
+        after = benchmark(source, False, round_trip_time)
+
+    app.shutdown_thread_pool()
+    print(f'Before: {before:8.2f} MB/s (4096 byte blocks, 1 outstanding IQ)')
+    print(f'After:  {after:8.2f} MB/s ({IBB_MAX_BLOCK_SIZE} byte blocks, '
+          f'{ibb.IBB_WINDOW_SIZE} outstanding IQs)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Measures the migration of a synthetic legacy message archive (user
+# version 7) to the current schema. The legacy rows are migrated once
+# in a single transaction, like before checkpointing was added, and once
+# in checkpointed chunks of MIGRATION_CHUNK_SIZE rows. The time of the
+# backup made before migrating is reported separately.
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sqlalchemy as sa  # noqa: E402
+
+from gajim.common import app  # noqa: E402
+from gajim.common import configpaths  # noqa: E402
+from gajim.common.settings import Settings  # noqa: E402
+from gajim.common.storage.archive import migration  # noqa: E402
+from gajim.common.storage.archive.storage import \
+    MessageArchiveStorage  # noqa: E402
+
+ACCOUNT = 'benchmark'
+ACCOUNT_JID = 'user@domain.org'
+REMOTE_COUNT = 200
+
+
+def create_legacy_db(path: Path, count: int) -> None:
+    rand = random.Random(0)
+    engine = sa.create_engine(f'sqlite:///{path}')
+    migration.MigrationBase.metadata.create_all(engine)
+
+    jids = [{'jid_id': 1, 'jid': ACCOUNT_JID, 'type': 0}]
+    jids += [
+        {'jid_id': num + 2, 'jid': f'contact{num}@domain.org', 'type': 0}
+        for num in range(REMOTE_COUNT)
+    ]
+
+    rows = [
+        {
+            'account_id': 1,
+            'jid_id': rand.randrange(REMOTE_COUNT) + 2,
+            'time': 1_600_000_000.0 + num,
+            'kind': rand.choice((4, 6)),
+            'message': f'message {num} ' * rand.randrange(1, 20),
+            'message_id': f'id{num}',
+            'stanza_id': f'stanza{num}',
+            'encryption': 'OMEMO' if num % 3 == 0 else None,
+            'additional_data': (
+                json.dumps({'encrypted': {'name': 'OMEMO'}})
+                if num % 3 == 0 else None
+            ),
+        }
+        for num in range(count)
+    ]
+
+    with engine.begin() as conn:
+        conn.execute(sa.insert(migration.Jids), jids)
+        conn.execute(sa.insert(migration.Logs), rows)
+        conn.execute(sa.text('PRAGMA user_version=7'))
+    engine.dispose()
+
+
+def run_migration(source: Path, target: Path,
+                  chunk_size: int) -> tuple[float, float]:
+    target.write_bytes(source.read_bytes())
+
+    backup_duration = 0.0
+    make_backup = MessageArchiveStorage._make_backup
+
+    def _timed_backup(archive: MessageArchiveStorage) -> None:
+        nonlocal backup_duration
+        start = time.monotonic()
+        make_backup(archive)
+        backup_duration = time.monotonic() - start
+
+    archive = MessageArchiveStorage(path=target)
+    with patch.object(migration, 'MIGRATION_CHUNK_SIZE', chunk_size), \
+            patch.object(MessageArchiveStorage, '_make_backup',
+                         _timed_backup):
+        start = time.monotonic()
+        archive.init()
+        duration = time.monotonic() - start
+    archive.shutdown()
+
+    for backup in target.parent.glob(f'{target.name}.*.bak'):
+        backup.unlink()
+    return duration - backup_duration, backup_duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark the migration of legacy message archives')
+    parser.add_argument('--rows', type=int, default=100_000,
+                        help='Legacy messages in the archive '
+                             '(default: 100000)')
+    args = parser.parse_args()
+
+    configpaths.init()
+    app.settings = Settings(in_memory=True)
+    app.settings.init()
+    app.settings.add_account(ACCOUNT)
+    app.settings.set_account_setting(ACCOUNT, 'address', ACCOUNT_JID)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = Path(tmp_dir) / 'legacy.db'
+        target = Path(tmp_dir) / 'logs.db'
+        create_legacy_db(source, args.rows)
+        size = source.stat().st_size / 1_000_000
+
+        before, _backup = run_migration(source, target, args.rows)
+        after, backup = run_migration(
+            source, target, migration.MIGRATION_CHUNK_SIZE)
+
+    print(f'Migrating {args.rows} messages ({size:.1f} MB):')
+    print(f'Before: {args.rows / before:9.0f} rows/s (one transaction)')
+    print(f'After:  {args.rows / after:9.0f} rows/s '
+          f'(chunks of {migration.MIGRATION_CHUNK_SIZE} rows)')
+    print(f'Backup: {backup * 1000:9.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
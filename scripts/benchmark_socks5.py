@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# Measures the throughput of SOCKS5 file transfers over a loopback
+# connection, with the current chunking/sendfile() implementation and
+# with the previous behaviour (one 64 KiB chunk per event, no sendfile).
+# With --algo the sender also computes the checksum of the sent data.
+
+import argparse
+import base64
+import filecmp
+import os
+import select
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gajim.common import socks5  # noqa: E402
+from gajim.common.file_props import FileProp  # noqa: E402
+from gajim.common.file_props import HASH_FUNCTIONS  # noqa: E402
+
+LEGACY_SETTINGS = {
+    'MIN_BUFF_LEN': 65536,
+    'MAX_BUFF_LEN': 65536,
+    'MAX_CHUNKS_PER_EVENT': 1,
+    'SENDFILE_SUPPORTED': False,
+}
+
+
+class BenchmarkSocks5(socks5.Socks5):
+    def __init__(self, sock: socket.socket, file_props: FileProp) -> None:
+        socks5.Socks5.__init__(self, None, None, None, None, None, None)
+        sock.setblocking(False)
+        self._sock = sock
+        self.fd = sock.fileno()
+        self._send = sock.send
+        self._recv = sock.recv
+        self.file_props = file_props
+        self.connected = True
+        self.state = 7
+
+    def disconnect(self, *args, **kwargs) -> None:
+        self.connected = False
+
+
+def create_file_props(file_name: Path, size: int, type_: str) -> FileProp:
+    file_props = FileProp('benchmark', type_)
+    file_props.file_name = str(file_name)
+    file_props.size = size
+    file_props.type_ = type_
+    file_props.elapsed_time = 0
+    file_props.last_time = time.time()
+    file_props.received_len = 0
+    return file_props
+
+
+def create_socket_pair() -> tuple[socket.socket, socket.socket]:
+    with socket.create_server(('127.0.0.1', 0)) as listener:
+        client = socket.create_connection(listener.getsockname())
+        server, _addr = listener.accept()
+    return client, server
+
+
+def run_transfer(source: Path,
+                 target: Path,
+                 interval: float,
+                 algo: str | None) -> float:
+
+    size = source.stat().st_size
+    send_sock, recv_sock = create_socket_pair()
+    sender = BenchmarkSocks5(send_sock,
+                             create_file_props(source, size, 's'))
+    if algo is not None:
+        sender.file_props.algo = algo
+        sender.file_props.hash_cb = lambda: None
+    receiver = BenchmarkSocks5(recv_sock,
+                               create_file_props(target, size, 'r'))
+
+    start = time.monotonic()
+    try:
+        while not receiver.file_props.completed:
+            writable = [send_sock] if sender.connected else []
+            readable, writable, _ = select.select(
+                [recv_sock], writable, [], 5)
+            if not readable and not writable:
+                raise RuntimeError('Transfer stalled')
+
+            if writable:
+                sender.write_next()
+            if readable:
+                receiver.get_file_contents(0)
+                if receiver.file_props.error not in (0, None):
+                    raise RuntimeError('Receiving failed')
+
+            if interval:
+                # Emulates an idlequeue which is polled periodically
+                time.sleep(interval)
+    finally:
+        sender.close_file()
+        send_sock.close()
+        recv_sock.close()
+
+    duration = time.monotonic() - start
+    if not filecmp.cmp(source, target, shallow=False):
+        raise RuntimeError('Received file differs from the sent file')
+    if algo is not None:
+        hash_obj = HASH_FUNCTIONS[algo]()
+        hash_obj.update(source.read_bytes())
+        expected = base64.b64encode(hash_obj.digest()).decode('ascii')
+        if sender.file_props.transferred_hash != expected:
+            raise RuntimeError('Wrong checksum')
+    return duration
+
+
+def benchmark(source: Path, target: Path, legacy: bool,
+              interval: float, runs: int, algo: str | None) -> float:
+    saved = {name: getattr(socks5, name) for name in LEGACY_SETTINGS}
+    if legacy:
+        for name, value in LEGACY_SETTINGS.items():
+            setattr(socks5, name, value)
+
+    try:
+        durations = []
+        for _num in range(runs):
+            target.unlink(missing_ok=True)
+            durations.append(run_transfer(source, target, interval, algo))
+    finally:
+        for name, value in saved.items():
+            setattr(socks5, name, value)
+
+    return source.stat().st_size / min(durations) / 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark SOCKS5 file transfers over loopback')
+    parser.add_argument('--size', type=int, default=256,
+                        help='File size in MiB (default: 256)')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='Transfers per mode, the fastest counts')
+    parser.add_argument('--interval', type=float, default=0,
+                        help='Seconds to sleep after each event, e.g. 0.2 '
+                             'to emulate a polled idlequeue')
+    parser.add_argument('--algo', choices=sorted(HASH_FUNCTIONS),
+                        help='Compute the checksum of the sent file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = Path(tmp_dir) / 'source'
+        target = Path(tmp_dir) / 'target'
+        block = os.urandom(1024 * 1024)
+        with source.open('wb') as file:
+            for _num in range(args.size):
+                file.write(block)
+
+        before = benchmark(source, target, True, args.interval, args.runs,
+                           args.algo)
+        after = benchmark(source, target, False, args.interval, args.runs,
+                          args.algo)
+
+    if args.algo is not None:
+        print(f'Checksum: {args.algo}')
+    print(f'Before: {before:8.1f} MB/s '
+          f'(one 64 KiB chunk per event, send())')
+    print(f'After:  {after:8.1f} MB/s '
+          f'(adaptive chunks, sendfile(): {socks5.SENDFILE_SUPPORTED})')
+
+
+if __name__ == '__main__':
+    main()
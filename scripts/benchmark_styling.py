@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Measures how long message styling takes to parse different kinds of
+# text, compared to the styling module of an older revision, e.g. one
+# before the tokenizer searched for candidate positions of spans and
+# hyperlinks instead of going through every line character by character.
+
+import argparse
+import importlib.util
+import random
+import string
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(REPO_DIR))
+
+from gajim.common import app  # noqa: E402
+from gajim.common import configpaths  # noqa: E402
+from gajim.common import styling  # noqa: E402
+from gajim.common.settings import Settings  # noqa: E402
+
+
+def make_log_output(size: int) -> str:
+    lines: list[str] = []
+    length = 0
+    num = 0
+    while length < size:
+        line = (f'2024-01-01 12:{num % 60:02d}:{num % 60:02d} INFO '
+                f'worker-{num % 8} processed batch {num} in {num % 97} ms')
+        lines.append(line)
+        length += len(line) + 1
+        num += 1
+    return '\n'.join(lines)[:size]
+
+
+def make_source_code(size: int) -> str:
+    snippet = (
+        'def _parse(self, value: int, *args, **kwargs) -> list[str]:\n'
+        '    result = [x * 2 for x in range(value) if x % 3 == 0]\n'
+        '    if not result and self._cache_size > 0:\n'
+        '        return self._fallback(value - 1, *args, **kwargs)\n'
+        '    return [str(item) for item in result]  # __repr__\n'
+    )
+    return (snippet * (size // len(snippet) + 1))[:size]
+
+
+def make_links_and_spans(size: int) -> str:
+    rand = random.Random(0)
+    words: list[str] = []
+    length = 0
+    while length < size:
+        choice = rand.randrange(6)
+        word = ''.join(rand.choices(string.ascii_lowercase, k=6))
+        if choice == 0:
+            word = f'https://example.org/{word}?q={rand.randrange(100)}'
+        elif choice == 1:
+            word = f'{word}@example.org'
+        elif choice == 2:
+            word = f'*{word}*'
+        elif choice == 3:
+            word = f'_{word}_'
+        words.append(word)
+        length += len(word) + 1
+        if rand.randrange(12) == 0:
+            words.append('\n')
+    return ' '.join(words)[:size]
+
+
+CORPORA = {
+    'log output (timestamps, no links)': make_log_output,
+    'source code (operators, identifiers)': make_source_code,
+    'synthetic text, half links and spans': make_links_and_spans,
+}
+
+
+def load_baseline(revision: str) -> ModuleType:
+    source = subprocess.run(
+        ['git', 'show', f'{revision}:gajim/common/styling.py'],
+        cwd=REPO_DIR, check=True, capture_output=True, text=True).stdout
+
+    name = 'gajim.common.styling_baseline'
+    spec = importlib.util.spec_from_loader(name, loader=None)
+    assert spec is not None
+    module = importlib.util.module_from_spec(spec)
+    # Dataclasses look up their module while being created
+    sys.modules[name] = module
+    exec(compile(source, f'{revision}:styling.py', 'exec'),  # noqa: S102
+         module.__dict__)
+    return module
+
+
+def measure(module: ModuleType, text: str, runs: int) -> float:
+    durations: list[float] = []
+    for _num in range(runs):
+        start = time.perf_counter()
+        # Bypasses the parsing cache
+        module._process(text, 0)
+        durations.append(time.perf_counter() - start)
+    return min(durations) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark message styling')
+    parser.add_argument('baseline',
+                        help='Git revision of the styling module to '
+                             'compare against')
+    parser.add_argument('--size', type=int, default=64,
+                        help='Text size in KB (default: 64)')
+    parser.add_argument('--runs', type=int, default=20,
+                        help='Runs per text, the fastest counts')
+    args = parser.parse_args()
+
+    configpaths.init()
+    app.settings = Settings(in_memory=True)
+    app.settings.init()
+
+    baseline = load_baseline(args.baseline)
+
+    print(f'Parsing {args.size} KB of text, {args.baseline} vs. current:')
+    for name, make_text in CORPORA.items():
+        text = make_text(args.size * 1000)
+        # Both must produce the same result
+        assert repr(baseline._process(text, 0)) == repr(
+            styling._process(text, 0))
+
+        before = measure(baseline, text, args.runs)
+        after = measure(styling, text, args.runs)
+        print(f'  {name:38} {before:7.1f} ms -> {after:6.1f} ms '
+              f'({before / after:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from gajim.common.util.crypto import aes_decrypt_file
+from gajim.common.util.crypto import aes_encrypt_file
+from gajim.common.util.crypto import DecryptionFailed
+from gajim.common.util.crypto import EncryptionCancelled
+from gajim.common.util.crypto import GCM_TAG_SIZE
+
+
+class CryptoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._source = Path(self._dir.name) / 'source'
+        self._target = Path(self._dir.name) / 'target'
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_encrypt_file(self) -> None:
+        data = bytes(range(256)) * 1000
+        self._source.write_bytes(data)
+
+        result = aes_encrypt_file(self._source, self._target, chunk_size=1000)
+
+        payload = self._target.read_bytes()
+        self.assertEqual(result.size, len(data) + GCM_TAG_SIZE)
+        self.assertEqual(len(payload), result.size)
+        self.assertEqual(
+            AESGCM(result.key).decrypt(result.iv, payload, None), data)
+
+    def test_encrypt_file_cancelled(self) -> None:
+        self._source.write_bytes(b'x' * 1000)
+
+        with self.assertRaises(EncryptionCancelled):
+            aes_encrypt_file(self._source,
+                             self._target,
+                             is_cancelled=lambda: True,
+                             chunk_size=100)
+
+        self.assertFalse(self._target.exists())
+
+    def test_decrypt_file(self) -> None:
+        data = bytes(range(256)) * 1000
+        key = bytes(32)
+        iv = bytes(12)
+        self._source.write_bytes(AESGCM(key).encrypt(iv, data, None))
+
+        aes_decrypt_file(self._source, self._target, key, iv, chunk_size=1000)
+        self.assertEqual(self._target.read_bytes(), data)
+
+        # Flip a bit in the ciphertext
+        payload = bytearray(self._source.read_bytes())
+        payload[10] ^= 1
+        self._source.write_bytes(payload)
+
+        with self.assertRaises(DecryptionFailed):
+            aes_decrypt_file(self._source, self._target, key, iv)
+        self.assertFalse(self._target.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from nbxmpp.protocol import Hashes2
+
+from gajim.common.file_props import FilesProp
+from gajim.common.file_props import HASH_FUNCTIONS
+
+
+class FilePropHashTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._data = bytes(range(256)) * 1000
+        self._file_props = FilesProp.getNewFileProp('testacc1', 'sid')
+        self._file_props.size = len(self._data)
+
+    def tearDown(self) -> None:
+        FilesProp.deleteFileProp(self._file_props)
+
+    def _transfer(self, chunk_size: int) -> None:
+        for pos in range(0, len(self._data), chunk_size):
+            self._file_props.update_hash(self._data[pos:pos + chunk_size])
+
+    def test_incremental_hash(self) -> None:
+        for algo in HASH_FUNCTIONS:
+            finished: list[str | None] = []
+            self._file_props.algo = algo
+            self._file_props.hash_cb = lambda finished=finished: (
+                finished.append(self._file_props.transferred_hash))
+            self._file_props.start_hashing()
+            self._transfer(4096)
+
+            expected = Hashes2().calculateHash(algo, self._data)
+            self.assertEqual(self._file_props.transferred_hash, expected)
+            self.assertEqual(finished, [expected])
+
+    def test_resumed_transfer_is_not_hashed(self) -> None:
+        self._file_props.algo = 'sha-256'
+        self._file_props.start_hashing(offset=4096)
+        self._transfer(4096)
+        self.assertIsNone(self._file_props.transferred_hash)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import socket
+import time
+import unittest
+
+from gi.repository import GLib
+from nbxmpp.idlequeue import IdleObject
+
+from gajim.common.idlequeue import GlibIdleQueue
+
+
+class DummyObject(IdleObject):
+    def __init__(self, fd: int) -> None:
+        IdleObject.__init__(self)
+        self.fd = fd
+        self.events: list[str] = []
+
+    def pollin(self) -> None:
+        self.events.append('in')
+
+    def pollout(self) -> None:
+        self.events.append('out')
+
+    def read_timeout(self) -> None:
+        self.events.append('timeout')
+
+
+class IdleQueueTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._idlequeue = GlibIdleQueue()
+        self._sock1, self._sock2 = socket.socketpair()
+        self._obj = DummyObject(self._sock1.fileno())
+
+    def tearDown(self) -> None:
+        self._idlequeue.unplug_idle(self._obj.fd)
+        self._sock1.close()
+        self._sock2.close()
+
+    def _iterate(self, seconds: float) -> None:
+        context = GLib.MainContext.default()
+        deadline = time.monotonic() + seconds
+        while not self._obj.events and time.monotonic() < deadline:
+            context.iteration(False)
+
+    def test_read_timeout(self) -> None:
+        self._idlequeue.plug_idle(self._obj, False, False)
+        self._idlequeue.set_read_timeout(self._obj.fd, 0.05)
+        self.assertIsNotNone(self._idlequeue._time_source_id)
+
+        self._iterate(2)
+        self.assertEqual(self._obj.events, ['timeout'])
+        # Nothing is scheduled while there are no timeouts
+        self.assertIsNone(self._idlequeue._time_source_id)
+
+    def test_remove_timeout(self) -> None:
+        self._idlequeue.plug_idle(self._obj, False, False)
+        self._idlequeue.set_read_timeout(self._obj.fd, 0.05)
+        self._idlequeue.remove_timeout(self._obj.fd)
+        self.assertIsNone(self._idlequeue._time_source_id)
+
+        self._iterate(0.2)
+        self.assertEqual(self._obj.events, [])
+
+    def test_alarm(self) -> None:
+        alarms: list[bool] = []
+        self._idlequeue.set_alarm(lambda: alarms.append(True), 0.05)
+
+        context = GLib.MainContext.default()
+        deadline = time.monotonic() + 2
+        while not alarms and time.monotonic() < deadline:
+            context.iteration(False)
+
+        self.assertEqual(alarms, [True])
+        self.assertIsNone(self._idlequeue._time_source_id)
+
+    def test_readable(self) -> None:
+        self._idlequeue.plug_idle(self._obj, False, True)
+        self._sock2.send(b'data')
+
+        self._iterate(2)
+        self.assertEqual(self._obj.events, ['in'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from gajim.common.util.classes import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self) -> None:
+        cache: LRUCache[str, int] = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+
+    def test_size_func(self) -> None:
+        evicted: list[str] = []
+        cache: LRUCache[str, bytes] = LRUCache(
+            10,
+            size_func=len,
+            on_evict=lambda key, _value: evicted.append(key))
+
+        cache.set('a', b'12345')
+        cache.set('b', b'1234')
+        cache.set('c', b'123')
+        self.assertEqual(evicted, ['a'])
+        self.assertEqual(cache.cache_info().size, 7)
+
+        # The newest value is kept even if it exceeds the budget
+        cache.set('d', b'12345678901')
+        self.assertEqual(evicted, ['a', 'b', 'c'])
+        self.assertEqual(len(cache), 1)
+
+        cache.pop('d')
+        self.assertEqual(cache.cache_info().size, 0)
+
+    def test_cache_info(self) -> None:
+        cache: LRUCache[str, int] = LRUCache(2)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        info = cache.cache_info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.length, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import unittest
+
+from nbxmpp.protocol import JID
+
+from gajim.common.settings import Settings
+
+ACCOUNT = 'testacc1'
+CONTACT = JID.from_string('contact@domain.org')
+ROOM = JID.from_string('room@conference.domain.org')
+
+LEGACY_ACCOUNT_SETTINGS = {
+    'account': {
+        'active': True,
+        'address': 'user@domain.org',
+        'priority': 5,
+    },
+    'contact': {
+        str(CONTACT): {'speller_language': 'de'},
+    },
+    'group_chat': {
+        str(ROOM): {'mute_until': '2024-01-01'},
+    },
+}
+
+V6_SQL = '''
+    CREATE TABLE settings (
+            name TEXT UNIQUE,
+            settings TEXT
+    );
+
+    CREATE TABLE account_settings (
+            account TEXT UNIQUE,
+            settings TEXT
+    );
+
+    INSERT INTO settings(name, settings) VALUES ('app', '{}');
+    INSERT INTO settings(name, settings) VALUES ('soundevents', '{}');
+    INSERT INTO settings(name, settings) VALUES ('status_presets', '{}');
+    INSERT INTO settings(name, settings) VALUES ('proxies', '{}');
+    INSERT INTO settings(name, settings) VALUES ('plugins', '{}');
+    INSERT INTO settings(name, settings) VALUES ('workspaces', '{}');
+
+    PRAGMA user_version=6;
+'''
+
+
+def load_settings(con: sqlite3.Connection) -> Settings:
+    # Settings(in_memory=True) skips migrations, load and migrate the
+    # given database like a settings file
+    settings = Settings(in_memory=True)
+    con.row_factory = settings._namedtuple_factory  # pyright: ignore
+    settings._con = con  # pyright: ignore
+    settings._load_settings()  # pyright: ignore
+    settings._load_account_settings()  # pyright: ignore
+    settings._migrate()  # pyright: ignore
+    return settings
+
+
+class SettingsMigrationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._con = sqlite3.connect(':memory:')
+        self._con.executescript(V6_SQL)
+        self._con.execute(
+            'INSERT INTO account_settings(account, settings) VALUES(?, ?)',
+            (ACCOUNT, json.dumps(LEGACY_ACCOUNT_SETTINGS)))
+        self._con.commit()
+
+    def tearDown(self) -> None:
+        self._con.close()
+
+    def _assert_legacy_values(self, settings: Settings) -> None:
+        self.assertEqual(settings.get_accounts(), [ACCOUNT])
+        self.assertTrue(settings.get_account_setting(ACCOUNT, 'active'))
+        self.assertEqual(
+            settings.get_account_setting(ACCOUNT, 'address'),
+            'user@domain.org')
+        self.assertEqual(
+            settings.get_account_setting(ACCOUNT, 'priority'), 5)
+        self.assertEqual(
+            settings.get_contact_setting(
+                ACCOUNT, CONTACT, 'speller_language'), 'de')
+        self.assertEqual(
+            settings.get_group_chat_setting(ACCOUNT, ROOM, 'mute_until'),
+            '2024-01-01')
+
+    def test_migrate_v6(self) -> None:
+        settings = load_settings(self._con)
+        self.assertEqual(settings._get_user_version(), 7)  # pyright: ignore
+        self._assert_legacy_values(settings)
+
+        tables = {row.name for row in self._con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn('account_settings', tables)
+
+        # Migrating is done only once, values are read from the new tables
+        self._assert_legacy_values(load_settings(self._con))
+
+    def test_round_trip(self) -> None:
+        settings = load_settings(self._con)
+        settings.set_account_setting(ACCOUNT, 'priority', 10)
+        settings.set_account_setting(ACCOUNT, 'active', None)
+        settings.set_contact_setting(
+            ACCOUNT, CONTACT, 'mute_until', '2025-01-01')
+        settings.set_contact_setting(
+            ACCOUNT, CONTACT, 'speller_language', None)
+        settings.set_group_chat_setting(
+            ACCOUNT, ROOM, 'speller_language', 'en')
+        settings.save()
+
+        count = self._con.execute(
+            'SELECT COUNT(*) AS count FROM account_setting_values'
+        ).fetchone().count
+        # address, priority, one contact and two group chat settings
+        self.assertEqual(count, 5)
+
+        settings = load_settings(self._con)
+        self.assertEqual(
+            settings.get_account_setting(ACCOUNT, 'priority'), 10)
+        self.assertFalse(settings.get_account_setting(ACCOUNT, 'active'))
+        self.assertEqual(
+            settings.get_account_setting(ACCOUNT, 'address'),
+            'user@domain.org')
+        self.assertEqual(
+            settings.get_contact_setting(
+                ACCOUNT, CONTACT, 'speller_language'), '')
+        self.assertEqual(
+            settings.get_contact_setting(ACCOUNT, CONTACT, 'mute_until'),
+            '2025-01-01')
+        self.assertEqual(
+            settings.get_group_chat_setting(ACCOUNT, ROOM, 'mute_until'),
+            '2024-01-01')
+        self.assertEqual(
+            settings.get_group_chat_setting(
+                ACCOUNT, ROOM, 'speller_language'),
+            'en')
+
+    def test_remove_account(self) -> None:
+        settings = load_settings(self._con)
+        settings.add_account('testacc2')
+        settings.set_account_setting('testacc2', 'priority', 1)
+        settings.remove_account(ACCOUNT)
+        settings.save()
+
+        settings = load_settings(self._con)
+        self.assertEqual(settings.get_accounts(), ['testacc2'])
+        self.assertEqual(
+            settings.get_account_setting('testacc2', 'priority'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -513,6 +513,13 @@
     ('(scheme:body)', ['scheme:body']),
     ('/scheme:body', ['scheme:body']),
     ('!scheme:body', ['scheme:body']),
+    ('not _http://example.org or x+http://example.org', []),
+    ('see http://example.org/user@example.org',
+     ['http://example.org/user@example.org']),
+    ('ask some!one@example.org', ['some!one@example.org']),
+    ('x:y@example.org', []),
+    ('http://a.org,\nuser@b.org, (see http://c.org/)',
+     ['http://a.org', 'user@b.org', 'http://c.org/']),
 ]
 
 
@@ -558,6 +565,24 @@ def test_uris_with_text(self):
             hlinks = process_uris(text)
             self.assertEqual([link.text for link in hlinks], results, text)
 
+    def test_find_byte_index(self):
+        self.assertEqual(styling.find_byte_index('abc', 2), 2)
+        self.assertEqual(styling.find_byte_index('aä€😀b', 1), 2)
+        self.assertEqual(styling.find_byte_index('aä€😀b', 3), 9)
+        self.assertEqual(styling.find_byte_index('aä€😀b', 4), 10)
+        self.assertRaises(ValueError, styling.find_byte_index, 'abc', 3)
+
+    def test_process_cached(self):
+        text = '*strong* https://example.org'
+        self.assertIs(styling.process(text), styling.process(text))
+
+    def test_process_uncached(self):
+        text = '*strong* https://example.org/uncached'
+        result = styling.process(text, cache=False)
+        self.assertIsNot(styling.process(text, cache=False), result)
+        self.assertIsNot(styling.process(text), result)
+        self.assertEqual(result.blocks, styling.process(text).blocks)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import Any
+
+import unittest
+from collections.abc import Hashable
+from unittest.mock import patch
+
+from nbxmpp.protocol import JID
+
+from gajim.common import task_manager
+from gajim.common.task_manager import Task
+from gajim.common.task_manager import TaskManager
+
+
+class DummyTask(Task):
+    def __init__(self,
+                 account: str,
+                 jid: str,
+                 coalesce_key: Hashable | None = None
+                 ) -> None:
+
+        Task.__init__(self, account=account, jid=JID.from_string(jid))
+        self.executed = False
+        self._coalesce_key = coalesce_key
+
+    def execute(self) -> None:
+        self.executed = True
+
+    def preconditions_met(self) -> bool:
+        return True
+
+    def get_coalesce_key(self) -> Hashable | None:
+        return self._coalesce_key
+
+
+class TaskManagerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # Freeze the time, so rate budgets are not refilled
+        patcher = patch.object(task_manager.time, 'monotonic',
+                               return_value=1000.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._manager = TaskManager()
+
+    def _add_tasks(self, count: int, **kwargs: Any) -> list[DummyTask]:
+        tasks: list[DummyTask] = []
+        for num in range(count):
+            server = kwargs.get('server', f'server{num}.org')
+            task = DummyTask(kwargs.get('account', 'acc1'),
+                             f'user{num}@{server}',
+                             kwargs.get('coalesce_key'))
+            self._manager.add_task(task)
+            tasks.append(task)
+        return tasks
+
+    @staticmethod
+    def _executed(tasks: list[DummyTask]) -> list[DummyTask]:
+        return [task for task in tasks if task.executed]
+
+    def test_concurrency_limits(self) -> None:
+        tasks_a = self._add_tasks(5, server='a.org')
+        tasks_b = self._add_tasks(5, server='b.org', account='acc2')
+        self._manager._process_queue()
+
+        max_per_server = task_manager.MAX_RUNNING_TASKS_PER_SERVER
+        self.assertEqual(len(self._executed(tasks_a)), max_per_server)
+        self.assertEqual(len(self._executed(tasks_b)), max_per_server)
+
+        tasks_a[0].set_finished()
+        self._manager._process_queue()
+        self.assertEqual(len(self._executed(tasks_a)), max_per_server + 1)
+
+        tasks = self._add_tasks(20, account='acc3')
+        self._manager._process_queue()
+        self.assertEqual(len(self._executed(tasks)),
+                         task_manager.MAX_RUNNING_TASKS_PER_ACCOUNT)
+
+    def test_parked_tasks(self) -> None:
+        tasks = self._add_tasks(10, server='a.org')
+        self._manager._process_queue()
+
+        # Blocked tasks are parked until the server budget has room
+        max_per_server = task_manager.MAX_RUNNING_TASKS_PER_SERVER
+        self.assertEqual(self._manager._queue, [])
+        self.assertEqual(self._manager.get_stats().queued,
+                         10 - max_per_server)
+
+        # Other servers are not held up by them
+        other_task = self._add_tasks(1, server='b.org')[0]
+        self._manager._process_queue()
+        self.assertTrue(other_task.executed)
+
+        other_task.set_finished()
+        self._manager._process_queue()
+        self.assertEqual(len(self._executed(tasks)), max_per_server)
+
+        tasks[0].set_finished()
+        self._manager._process_queue()
+        self.assertEqual(len(self._executed(tasks)), max_per_server + 1)
+        self.assertEqual(self._manager.get_stats().queued,
+                         10 - max_per_server - 1)
+
+    def test_rate_limit(self) -> None:
+        tasks = self._add_tasks(20)
+        for _num in range(5):
+            self._manager._process_queue()
+            for task in self._executed(tasks):
+                task.set_finished()
+
+        self.assertEqual(len(self._executed(tasks)), task_manager.RATE_BURST)
+        self.assertIsNotNone(self._manager._source_id)
+
+    def test_coalesce(self) -> None:
+        task1, task2 = self._add_tasks(2, coalesce_key='hash')
+        self._manager._process_queue()
+        self.assertTrue(task1.executed)
+        self.assertFalse(task2.executed)
+
+        # Parked until task1 is finished
+        self.assertEqual(self._manager._queue, [])
+        self.assertIn('hash', self._manager._parked_by_key)
+
+        task1.set_finished()
+        self._manager._process_queue()
+        self.assertTrue(task2.executed)
+
+    def test_deduplicate(self) -> None:
+        task1, task2 = (DummyTask('acc1', 'user@server.org'),
+                        DummyTask('acc1', 'user@server.org'))
+        self._manager.add_task(task1)
+        self._manager.add_task(task2)
+        self._manager._process_queue()
+
+        self.assertTrue(task1.is_obsolete())
+        self.assertFalse(task1.executed)
+        self.assertTrue(task2.executed)
+
+        task2.set_finished()
+        stats = self._manager.get_stats()
+        self.assertEqual(stats.queued, 0)
+        self.assertEqual(stats.running, 0)
+        self.assertEqual(stats.max_queued, 2)
+        self.assertEqual(stats.executed, 1)
+        self.assertEqual(stats.finished, 1)
+        self.assertEqual(stats.obsolete, 1)
+        self.assertEqual(stats.deduplicated, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
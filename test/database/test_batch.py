@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import unittest
+from datetime import datetime
+from datetime import timezone
+
+from nbxmpp.protocol import JID
+from sqlalchemy.exc import IntegrityError
+
+from gajim.common import app
+from gajim.common.settings import Settings
+from gajim.common.storage.archive.const import ChatDirection
+from gajim.common.storage.archive.const import MessageState
+from gajim.common.storage.archive.const import MessageType
+from gajim.common.storage.archive.models import Message
+from gajim.common.storage.archive.models import Receipt
+from gajim.common.storage.archive.storage import MessageArchiveStorage
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._archive = MessageArchiveStorage(in_memory=True)
+        self._archive.init()
+
+        self._account = 'testacc1'
+        self._remote_jid = JID.from_string('remote@jid.org')
+        self._init_settings()
+
+    def tearDown(self) -> None:
+        self._archive.end_batch()
+
+    def _init_settings(self) -> None:
+        app.settings = Settings(in_memory=True)
+        app.settings.init()
+        app.settings.add_account('testacc1')
+        app.settings.set_account_setting(
+            'testacc1', 'address', 'user@domain.org')
+
+    def _create_message(self, message_id: str, stanza_id: str) -> Message:
+        return Message(
+            account_=self._account,
+            remote_jid_=self._remote_jid,
+            resource='res',
+            type=MessageType.GROUPCHAT,
+            direction=ChatDirection.INCOMING,
+            timestamp=datetime.now(timezone.utc),
+            state=MessageState.ACKNOWLEDGED,
+            id=message_id,
+            stanza_id=stanza_id,
+            text='message',
+        )
+
+    def test_batch_returns_pks(self) -> None:
+        self._archive.begin_batch()
+
+        pk1 = self._archive.insert_object(self._create_message('1', 's1'))
+        pk2 = self._archive.insert_object(self._create_message('2', 's2'))
+
+        self.assertNotEqual(pk1, -1)
+        self.assertEqual(pk2, pk1 + 1)
+
+        message = self._archive.get_message_with_pk(pk2)
+        assert message is not None
+        self.assertEqual(message.id, '2')
+
+        self.assertTrue(self._archive.check_if_stanza_id_exists(
+            self._account, self._remote_jid, 's1'))
+
+        self._archive.end_batch()
+
+        message = self._archive.get_message_with_pk(pk1)
+        assert message is not None
+        self.assertEqual(message.stanza_id, 's1')
+
+    def test_batch_conflict_keeps_other_rows(self) -> None:
+        timestamp = datetime.fromtimestamp(1, timezone.utc)
+
+        self._archive.begin_batch()
+
+        pk = self._archive.insert_object(self._create_message('1', 's1'))
+
+        receipt = Receipt(
+            account_=self._account,
+            remote_jid_=self._remote_jid,
+            id='1',
+            timestamp=timestamp,
+        )
+        self.assertNotEqual(self._archive.insert_object(receipt), -1)
+
+        receipt = Receipt(
+            account_=self._account,
+            remote_jid_=self._remote_jid,
+            id='1',
+            timestamp=timestamp,
+        )
+        self.assertEqual(self._archive.insert_object(receipt), -1)
+
+        receipt = Receipt(
+            account_=self._account,
+            remote_jid_=self._remote_jid,
+            id='1',
+            timestamp=timestamp,
+        )
+        with self.assertRaises(IntegrityError):
+            self._archive.insert_object(receipt, ignore_on_conflict=False)
+
+        self._archive.commit_batch()
+
+        message = self._archive.get_message_with_pk(pk)
+        assert message is not None
+        assert message.receipt is not None
+        self.assertEqual(message.receipt.timestamp, timestamp)
+
+    def test_nested_batch(self) -> None:
+        self._archive.begin_batch()
+        self._archive.begin_batch()
+
+        self._archive.insert_object(self._create_message('1', 's1'))
+        self._archive.end_batch()
+        self.assertIsNotNone(self._archive._batch_session)
+
+        self._archive.end_batch()
+        self.assertIsNone(self._archive._batch_session)
+
+        self.assertTrue(self._archive.check_if_stanza_id_exists(
+            self._account, self._remote_jid, 's1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
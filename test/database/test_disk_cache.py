@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from gi.repository import GLib
+from nbxmpp.const import AvatarState
+from nbxmpp.protocol import JID
+
+from gajim.common import app
+from gajim.common.disk_cache import DiskCacheManager
+from gajim.common.modules.vcard_avatars import VCardAvatars
+from gajim.common.settings import Settings
+from gajim.common.storage.cache import CacheStorage
+from gajim.common.storage.cache import DiskCacheRow
+
+KIB = 1024
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        app.settings = Settings(in_memory=True)
+        app.settings.init()
+        app.settings.set('disk_cache_max_size', 1)
+
+        app.storage.cache = CacheStorage(in_memory=True)
+        app.storage.cache.init()
+
+        self._dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._dir.name)
+        self._manager = DiskCacheManager()
+        self._manager._dirs = {'avatars': self._path}
+
+    def tearDown(self) -> None:
+        app.shutdown_thread_pool()
+        app.storage.cache.shutdown()
+        self._dir.cleanup()
+
+    def _create_file(self, name: str, size: int, age: int) -> None:
+        path = self._path / name
+        path.write_bytes(b'\0' * size)
+        timestamp = time.time() - age
+        os.utime(path, (timestamp, timestamp))
+
+    def _run_until_evicted(self) -> None:
+        context = GLib.MainContext.default()
+        deadline = time.monotonic() + 5
+        while self._manager._evicted_count == 0:
+            self.assertLess(time.monotonic(), deadline)
+            context.iteration(False)
+
+    def test_storage(self) -> None:
+        cache = app.storage.cache
+        cache.touch_disk_cache_file('avatars', 'a', 10, last_access=2)
+        cache.touch_disk_cache_file('avatars', 'b', 20, last_access=1)
+        cache.touch_disk_cache_file('bob', 'c', 30, last_access=3)
+
+        # A read access keeps the known size
+        cache.touch_disk_cache_file('avatars', 'b', last_access=4)
+
+        self.assertEqual(
+            [(row.name, row.size) for row in cache.get_disk_cache_lru()],
+            [('a', 10), ('c', 30), ('b', 20)])
+
+        usage = {row.kind: (row.files, row.size)
+                 for row in cache.get_disk_cache_usage()}
+        self.assertEqual(usage, {'avatars': (2, 30), 'bob': (1, 30)})
+
+        # Rows of vanished files are removed, unless they were touched
+        # while scanning
+        cache.sync_disk_cache_files(
+            [DiskCacheRow('avatars', 'a', 15, 0),
+             DiskCacheRow('avatars', 'd', 40, 0)],
+            scan_started=4)
+
+        self.assertEqual(
+            [(row.name, row.size, row.last_access)
+             for row in cache.get_disk_cache_lru()],
+            [('d', 40, 0), ('a', 15, 2), ('b', 20, 4)])
+
+    def test_evict_least_recently_used(self) -> None:
+        self._create_file('a', 600 * KIB, 300)
+        self._create_file('b', 600 * KIB, 200)
+        self._create_file('c', 600 * KIB, 100)
+
+        self._manager._start_scan()
+        self._run_until_evicted()
+
+        self.assertEqual(sorted(os.listdir(self._path)), ['c'])
+        self.assertEqual(
+            [row.name for row in app.storage.cache.get_disk_cache_lru()],
+            ['c'])
+
+        stats = self._manager.get_stats()
+        self.assertEqual(stats.size, 600 * KIB)
+        self.assertEqual(stats.evicted_count, 2)
+        self.assertEqual(stats.evicted_size, 1200 * KIB)
+
+    def test_protected_files(self) -> None:
+        self._create_file('a', 600 * KIB, 300)
+        self._create_file('b', 600 * KIB, 200)
+        self._create_file('c', 600 * KIB, 100)
+
+        self._manager.register_protected_files_func(
+            lambda: [('avatars', 'a')])
+
+        self._manager._start_scan()
+        self._run_until_evicted()
+
+        self.assertEqual(sorted(os.listdir(self._path)), ['a'])
+
+    def test_evicted_avatar_is_requested_again(self) -> None:
+        self._create_file('sha1', 600 * KIB, 300)
+        self._create_file('sha2', 600 * KIB, 200)
+        self._create_file('sha3', 600 * KIB, 100)
+
+        self._manager._start_scan()
+        self._run_until_evicted()
+        self.assertEqual(sorted(os.listdir(self._path)), ['sha3'])
+
+        client = MagicMock()
+        client.account = 'testacc1'
+        contact = client.get_module('Contacts').get_contact.return_value
+        module = VCardAvatars(client)
+        jid = JID.from_string('contact@domain.org')
+
+        avatar_storage = MagicMock()
+        avatar_storage.avatar_exists = (
+            lambda sha: (self._path / sha).is_file())
+
+        with patch.object(app, 'app', MagicMock(avatar_storage=avatar_storage)), \
+                patch.object(app, 'task_manager') as task_manager:
+
+            # The contact still has the evicted avatar set
+            contact.avatar_sha = 'sha1'
+            module._process_update(jid, AvatarState.ADVERTISED, 'sha1', False)
+            self.assertEqual(task_manager.add_task.call_count, 1)
+
+            contact.avatar_sha = 'sha3'
+            module._process_update(jid, AvatarState.ADVERTISED, 'sha3', False)
+            self.assertEqual(task_manager.add_task.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
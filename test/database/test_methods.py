@@ -16,11 +16,14 @@
 from gajim.common.storage.archive.const import ChatDirection
 from gajim.common.storage.archive.const import MessageState
 from gajim.common.storage.archive.const import MessageType
+from gajim.common.storage.archive.models import Account
 from gajim.common.storage.archive.models import Encryption
 from gajim.common.storage.archive.models import MAMArchiveState
 from gajim.common.storage.archive.models import Message
 from gajim.common.storage.archive.models import MessageError
 from gajim.common.storage.archive.models import Moderation
+from gajim.common.storage.archive.models import Receipt
+from gajim.common.storage.archive.models import Remote
 from gajim.common.storage.archive.storage import MessageArchiveStorage
 from gajim.common.util.datetime import utc_now
 
@@ -385,6 +388,75 @@ def test_remove_history(self) -> None:
             result = s.scalar(select(Message))
             self.assertIsNone(result)
 
+    def test_cleanup_chat_history(self) -> None:
+        app.settings.set_account_setting(
+            'testacc1', 'chat_history_max_age', 3600)
+
+        remote_jid = JID.from_string('remote1@jid.org')
+        old = utc_now() - timedelta(hours=2)
+
+        self._insert_messages(
+            'testacc1', remote_jid=remote_jid, timestamp=old, count=5)
+        self._insert_messages('testacc1', remote_jid=remote_jid, count=1)
+        self._insert_messages(
+            'testacc2', remote_jid=remote_jid, timestamp=old, count=1)
+
+        correction = Message(
+            account_='testacc1',
+            remote_jid_=remote_jid,
+            resource='res1',
+            type=MessageType.CHAT,
+            direction=ChatDirection.INCOMING,
+            timestamp=utc_now(),
+            state=MessageState.ACKNOWLEDGED,
+            id='correctionid1',
+            correction_id='messageid1',
+            text='correction',
+        )
+        self._archive.insert_object(correction)
+
+        # Same id, but not a correction of the expired message
+        correction = Message(
+            account_='testacc1',
+            remote_jid_=remote_jid,
+            resource='res1',
+            type=MessageType.CHAT,
+            direction=ChatDirection.OUTGOING,
+            timestamp=utc_now(),
+            state=MessageState.ACKNOWLEDGED,
+            id='correctionid2',
+            correction_id='messageid1',
+            text='correction',
+        )
+        self._archive.insert_object(correction)
+
+        receipt = Receipt(
+            account_='testacc1',
+            remote_jid_=remote_jid,
+            id='messageid2',
+            timestamp=utc_now(),
+        )
+        self._archive.insert_object(receipt)
+
+        self.assertTrue(self._archive.cleanup_chat_history(limit=3))
+        self.assertFalse(self._archive.cleanup_chat_history(limit=3))
+
+        with self._archive.get_session() as s:
+            messages = s.scalars(select(Message)).all()
+            self.assertEqual(
+                {(m.id, m.fk_account_pk) for m in messages},
+                {('messageid0', 1), ('messageid0', 2), ('correctionid2', 1)},
+            )
+
+            self.assertIsNone(s.scalar(select(Receipt)))
+
+    def test_vacuum(self) -> None:
+        self.assertIsNone(self._archive.get_last_vacuum())
+        self.assertFalse(self._archive.run_incremental_vacuum())
+
+        self._archive.vacuum()
+        self.assertIsNotNone(self._archive.get_last_vacuum())
+
     def test_check_if_stanza_id_exists(self) -> None:
         remote_jid = JID.from_string('remote1@jid.org')
         m = Message(
@@ -433,6 +505,22 @@ def test_check_if_message_id_exists(self) -> None:
             'testacc1', remote_jid, 'xxx')
         self.assertFalse(result)
 
+    def test_read_does_not_insert(self) -> None:
+        remote_jid = JID.from_string('unknown@jid.org')
+
+        self.assertFalse(self._archive.check_if_stanza_id_exists(
+            'testacc1', remote_jid, 'stanzaid123'))
+        self.assertIsNone(self._archive.get_last_conversation_row(
+            'testacc1', remote_jid))
+        self.assertEqual(self._archive.get_recent_muc_nicks(
+            'testacc1', remote_jid), set())
+        self.assertEqual(list(self._archive.search_archive(
+            'testacc1', remote_jid, 'test')), [])
+
+        with self._archive.get_session() as s:
+            self.assertIsNone(s.scalar(select(Remote)))
+            self.assertIsNone(s.scalar(select(Account)))
+
 
 if __name__ == '__main__':
     unittest.main()
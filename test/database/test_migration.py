@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import sqlalchemy as sa
+from nbxmpp.protocol import JID
+
+from gajim.common import app
+from gajim.common.settings import Settings
+from gajim.common.storage.archive import migration
+from gajim.common.storage.archive.models import Message
+from gajim.common.storage.archive.storage import MessageArchiveStorage
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        app.settings = Settings(in_memory=True)
+        app.settings.init()
+        app.settings.add_account('testacc1')
+        app.settings.set_account_setting(
+            'testacc1', 'address', 'user@domain.org')
+
+        self._dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._dir.name) / 'logs.db'
+        self._create_legacy_db(12)
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _create_legacy_db(self, count: int) -> None:
+        engine = sa.create_engine(f'sqlite:///{self._path}')
+        migration.MigrationBase.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(sa.insert(migration.Jids), [
+                {'jid_id': 1, 'jid': 'user@domain.org', 'type': 0},
+                {'jid_id': 2, 'jid': 'remote@jid.org', 'type': 0},
+            ])
+            conn.execute(sa.insert(migration.Logs), [
+                {
+                    'account_id': 1,
+                    'jid_id': 2,
+                    'time': float(num),
+                    'kind': 4,
+                    'message': f'message{num}',
+                    'message_id': f'id{num}',
+                    'stanza_id': f'stanza{num}',
+                } for num in range(count)
+            ])
+            conn.execute(sa.text('PRAGMA user_version=7'))
+        engine.dispose()
+
+    def _get_message_texts(self, archive: MessageArchiveStorage) -> list[str]:
+        with archive.get_engine().connect() as conn:
+            return list(conn.scalars(
+                sa.select(Message.text).order_by(Message.timestamp)))
+
+    def test_backup(self) -> None:
+        archive = MessageArchiveStorage(path=self._path)
+        archive.init()
+        archive.shutdown()
+
+        backups = list(Path(self._dir.name).glob('logs.db.*.bak'))
+        self.assertEqual(len(backups), 1)
+
+        engine = sa.create_engine(f'sqlite:///{backups[0]}')
+        with engine.connect() as conn:
+            count = conn.scalar(sa.text('SELECT count(*) FROM logs'))
+        engine.dispose()
+        self.assertEqual(count, 12)
+
+    def test_resume(self) -> None:
+        process_row = migration.Migration._process_message_row
+        processed: list[int] = []
+
+        def _process_row(self_: migration.Migration,
+                         conn: sa.Connection,
+                         log_row: migration.Logs) -> None:
+            if len(processed) == 7:
+                raise RuntimeError('interrupted')
+            processed.append(log_row.log_line_id)
+            process_row(self_, conn, log_row)
+
+        with patch.object(migration, 'MIGRATION_CHUNK_SIZE', 5), \
+                patch.object(migration.Migration,
+                             '_process_message_row',
+                             _process_row):
+            archive = MessageArchiveStorage(path=self._path)
+            with self.assertRaises(RuntimeError):
+                archive.init()
+            archive.shutdown()
+
+        # Only the first chunk was committed
+        engine = sa.create_engine(f'sqlite:///{self._path}')
+        with engine.connect() as conn:
+            last_pk = conn.scalar(sa.text(
+                'SELECT last_pk FROM migration_checkpoint WHERE version = 8'))
+            count = conn.scalar(sa.text('SELECT count(*) FROM message'))
+        engine.dispose()
+        self.assertEqual(last_pk, processed[4])
+        self.assertEqual(count, 5)
+
+        archive = MessageArchiveStorage(path=self._path)
+        archive.init()
+
+        # Only the interrupted migration made a backup
+        backups = list(Path(self._dir.name).glob('logs.db.*.bak'))
+        self.assertEqual(len(backups), 1)
+
+        self.assertEqual(
+            self._get_message_texts(archive),
+            [f'message{num}' for num in range(12)])
+
+        with archive.get_engine().connect() as conn:
+            remotes = list(conn.scalars(sa.text('SELECT jid FROM remote')))
+        self.assertEqual(remotes, [str(JID.from_string('remote@jid.org'))])
+        archive.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
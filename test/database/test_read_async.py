@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from typing import Any
+
+import tempfile
+import unittest
+from collections.abc import Sequence
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from pathlib import Path
+
+from gi.repository import GLib
+from nbxmpp.protocol import JID
+
+from gajim.common import app
+from gajim.common.settings import Settings
+from gajim.common.storage.archive.const import ChatDirection
+from gajim.common.storage.archive.const import MessageState
+from gajim.common.storage.archive.const import MessageType
+from gajim.common.storage.archive.models import Message
+from gajim.common.storage.archive.storage import MessageArchiveStorage
+
+
+class ReadAsyncTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._init_settings()
+
+        self._dir = tempfile.TemporaryDirectory()
+        self._archive = MessageArchiveStorage(
+            path=Path(self._dir.name) / 'archive.db')
+        self._archive.init()
+
+        self._account = 'testacc1'
+        self._remote_jid = JID.from_string('remote@jid.org')
+
+    def tearDown(self) -> None:
+        self._archive.shutdown()
+        self._dir.cleanup()
+
+    def _init_settings(self) -> None:
+        app.settings = Settings(in_memory=True)
+        app.settings.init()
+        app.settings.add_account('testacc1')
+        app.settings.set_account_setting(
+            'testacc1', 'address', 'user@domain.org')
+
+    def _insert_messages(self, count: int) -> None:
+        timestamp = datetime.fromtimestamp(0, timezone.utc)
+        for num in range(count):
+            message = Message(
+                account_=self._account,
+                remote_jid_=self._remote_jid,
+                resource='res',
+                type=MessageType.CHAT,
+                direction=ChatDirection.INCOMING,
+                timestamp=timestamp + timedelta(seconds=num),
+                state=MessageState.ACKNOWLEDGED,
+                id=f'messageid{num}',
+                text='message',
+            )
+            self._archive.insert_object(message)
+
+    def _load(self, before: bool, timestamp: datetime) -> Any:
+        results: list[Sequence[Message] | None] = []
+        self._archive.get_conversation_before_after_async(
+            self._account,
+            self._remote_jid,
+            before,
+            timestamp,
+            5,
+            results.append,
+        )
+
+        context = GLib.MainContext.default()
+        while not results:
+            context.iteration(True)
+        return results[0]
+
+    def test_load_before_after(self) -> None:
+        self._insert_messages(10)
+
+        messages = self._load(True, datetime.now(timezone.utc))
+        self.assertEqual(
+            [m.id for m in messages],
+            [f'messageid{num}' for num in range(9, 4, -1)])
+
+        messages = self._load(False, datetime.fromtimestamp(0, timezone.utc))
+        self.assertEqual(
+            [m.id for m in messages],
+            [f'messageid{num}' for num in range(1, 6)])
+
+    def test_load_sees_batch(self) -> None:
+        self._archive.begin_batch()
+        self._insert_messages(3)
+
+        messages = self._load(True, datetime.now(timezone.utc))
+        self.assertEqual(len(messages), 3)
+
+        self._archive.end_batch()
+
+    def test_in_memory(self) -> None:
+        self._archive.shutdown()
+        self._archive = MessageArchiveStorage(in_memory=True)
+        self._archive.init()
+        self._insert_messages(3)
+
+        results: list[Sequence[Message] | None] = []
+        self._archive.get_conversation_before_after_async(
+            self._account,
+            self._remote_jid,
+            True,
+            datetime.now(timezone.utc),
+            5,
+            results.append,
+        )
+
+        # The callback is always called from the main loop
+        self.assertEqual(results, [])
+
+        messages = self._load(True, datetime.now(timezone.utc))
+        self.assertEqual(len(messages), 3)
+
+    def test_read_session(self) -> None:
+        self._archive.begin_batch()
+        self._insert_messages(3)
+
+        # Rows of the batch are committed before reading
+        messages = self._archive.get_conversation_before_after(
+            self._account,
+            self._remote_jid,
+            True,
+            datetime.now(timezone.utc),
+            5)
+        self.assertEqual(len(messages), 3)
+        self.assertIsNone(self._archive._batch_session)
+
+        self._archive.end_batch()
+
+    def test_read_session_is_read_only(self) -> None:
+        unknown_jid = JID.from_string('unknown@jid.org')
+        messages = self._archive.get_conversation_before_after(
+            self._account,
+            unknown_jid,
+            True,
+            datetime.now(timezone.utc),
+            5)
+        self.assertEqual(messages, [])
+
+        days = self._archive.get_days_containing_messages(
+            self._account, unknown_jid, 2024, 1)
+        self.assertEqual(days, [])
+
+        self.assertNotIn(unknown_jid, self._archive._jid_pks)
+
+
+if __name__ == '__main__':
+    unittest.main()
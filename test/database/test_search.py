@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import unittest
+
+from nbxmpp.protocol import JID
+
+from gajim.common import app
+from gajim.common.settings import Settings
+from gajim.common.storage.archive.const import ChatDirection
+from gajim.common.storage.archive.const import MessageState
+from gajim.common.storage.archive.const import MessageType
+from gajim.common.storage.archive.models import Message
+from gajim.common.storage.archive.storage import MessageArchiveStorage
+
+from .util import mk_utc_dt
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._archive = MessageArchiveStorage(in_memory=True)
+        self._archive.init()
+
+        self._account = 'testacc1'
+        self._remote_jid = JID.from_string('remote@jid.org')
+        self._init_settings()
+
+    def _init_settings(self) -> None:
+        app.settings = Settings(in_memory=True)
+        app.settings.init()
+        app.settings.add_account('testacc1')
+        app.settings.set_account_setting(
+            'testacc1', 'address', 'user@domain.org')
+
+    def _insert_message(
+        self,
+        message_id: str,
+        text: str,
+        timestamp: int,
+        correction_id: str | None = None,
+    ) -> int:
+        message = Message(
+            account_=self._account,
+            remote_jid_=self._remote_jid,
+            resource='res',
+            type=MessageType.CHAT,
+            direction=ChatDirection.INCOMING,
+            timestamp=mk_utc_dt(timestamp),
+            state=MessageState.ACKNOWLEDGED,
+            id=message_id,
+            text=text,
+            correction_id=correction_id,
+        )
+        return self._archive.insert_object(message)
+
+    def _search(self, query: str) -> list[int]:
+        return [
+            message.pk
+            for message in self._archive.search_archive(
+                self._account, self._remote_jid, query
+            )
+        ]
+
+    def test_search_words_and_prefix(self) -> None:
+        pk1 = self._insert_message('1', 'Hello world', 1)
+        pk2 = self._insert_message('2', 'The world is round', 2)
+        self._insert_message('3', 'Something else', 3)
+
+        # Newest first, like the search view groups them
+        self.assertEqual(self._search('world'), [pk2, pk1])
+        self.assertEqual(self._search('hello wor'), [pk1])
+        self.assertEqual(self._search('héllo'), [pk1])
+        self.assertEqual(self._search('missing'), [])
+
+    def test_search_corrections(self) -> None:
+        pk = self._insert_message('1', 'Helo wrld', 1)
+        self._insert_message('2', 'Hello world', 2, correction_id='1')
+
+        self.assertEqual(self._search('wrld'), [pk])
+        self.assertEqual(self._search('world'), [pk])
+        # The message and its correction match, it is returned once
+        self.assertEqual(self._search('he'), [pk])
+
+    def test_search_after_delete(self) -> None:
+        pk = self._insert_message('1', 'Hello world', 1)
+        self._archive.delete_message(pk)
+
+        self.assertEqual(self._search('hello'), [])
+
+    def test_search_punctuation(self) -> None:
+        pk = self._insert_message('1', 'What?!', 1)
+
+        self.assertEqual(self._search('?!'), [pk])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -126,6 +126,7 @@ def add_archive_messages() -> None:
 configpaths.set_config_root(tempfile.gettempdir())
 configpaths.init()
 
+app.disk_cache = MagicMock()
 app.preview_manager = PreviewManager()
 
 win = ConversationViewTest()
@@ -0,0 +1,78 @@
+import unittest
+
+from gajim.common.const import Direction
+
+from gajim.gtk.debug_console import StanzaBuffer
+
+
+def _all(_entry):
+    return True
+
+
+class Test(unittest.TestCase):
+
+    def test_ring_buffer(self):
+        stanzas = StanzaBuffer(3, 1000)
+        for num in range(5):
+            stanzas.add(
+                'acc', 'Account', 'incoming', 'iq', f'<iq id="{num}"/>')
+
+        self.assertEqual(len(stanzas), 3)
+        self.assertEqual([e.seq for e in stanzas.get_last(10, _all)],
+                         [2, 3, 4])
+        self.assertEqual([e.seq for e in stanzas.get_before(4, 1, _all)],
+                         [3])
+        self.assertEqual(stanzas.get_before(2, 10, _all), [])
+
+        stanzas = StanzaBuffer(10, 10)
+        stanzas.add('acc', 'Account', 'incoming', None, '12345678')
+        stanzas.add('acc', 'Account', 'incoming', None, '1234')
+        self.assertEqual(len(stanzas), 1)
+        self.assertEqual(stanzas.size, 4)
+
+    def test_filter(self):
+        stanzas = StanzaBuffer(10, 1000)
+        stanzas.add('acc1', 'Account', 'incoming', 'iq', '<iq/>')
+        stanzas.add('acc2', 'Account', 'outgoing', 'message', '<message/>')
+        stanzas.add('acc1', 'Account', 'outgoing', 'iq', '<iq/>')
+
+        entries = stanzas.get_last(
+            10, lambda entry: entry.account == 'acc1')
+        self.assertEqual([e.seq for e in entries], [0, 2])
+
+    def test_find(self):
+        stanzas = StanzaBuffer(10, 1000)
+        stanzas.add('acc', 'Account', 'incoming', 'iq', '<iq>Foo foo</iq>')
+        stanzas.add('acc', 'Account', 'incoming', 'iq', '<iq/>')
+        stanzas.add('acc', 'Account', 'incoming', 'iq', '<iq>foo</iq>')
+
+        result = stanzas.find('FOO', None, Direction.NEXT, _all)
+        assert result is not None
+        self.assertEqual((result[0].seq, result[1]), (0, 4))
+
+        result = stanzas.find('foo', (0, 4), Direction.NEXT, _all)
+        assert result is not None
+        self.assertEqual((result[0].seq, result[1]), (0, 8))
+
+        result = stanzas.find('foo', (0, 8), Direction.NEXT, _all)
+        assert result is not None
+        self.assertEqual((result[0].seq, result[1]), (2, 4))
+
+        # Wraps around
+        result = stanzas.find('foo', (2, 4), Direction.NEXT, _all)
+        assert result is not None
+        self.assertEqual((result[0].seq, result[1]), (0, 4))
+
+        result = stanzas.find('foo', (0, 4), Direction.PREV, _all)
+        assert result is not None
+        self.assertEqual((result[0].seq, result[1]), (2, 4))
+
+        result = stanzas.find('foo', (0, 8), Direction.PREV, _all)
+        assert result is not None
+        self.assertEqual((result[0].seq, result[1]), (0, 4))
+
+        self.assertIsNone(stanzas.find('bar', None, Direction.NEXT, _all))
+
+
+if __name__ == '__main__':
+    unittest.main()
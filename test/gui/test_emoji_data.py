@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from gajim.gtk import emoji_data_gtk
+from gajim.gtk.emoji_data_gtk import EmojiIndex
+from gajim.gtk.emoji_data_gtk import get_emoji_index
+
+EMOJI_DATA = {
+    'cat': {'cat': '🐈'},
+    'cat face': {'cat face': '🐱'},
+    'face': {
+        'cat face': '🐱',
+        'grinning face': '😀',
+    },
+    'grinning face': {'grinning face': '😀'},
+    'happy': {
+        'cat face': '🐱',
+        'grinning face': '😀',
+    },
+    'pet': {'cat': '🐈'},
+}
+
+
+class Test(unittest.TestCase):
+    def tearDown(self) -> None:
+        emoji_data_gtk.get_emoji_data.cache_clear()
+        get_emoji_index.cache_clear()
+
+    def test_find_prefix(self) -> None:
+        index = EmojiIndex(EMOJI_DATA)
+
+        # Short names first, each emoji only once
+        matches = index.find('ca', 10)
+        self.assertEqual([match.emoji for match in matches], ['🐈', '🐱'])
+        self.assertEqual([match.short_name for match in matches],
+                         ['cat', 'cat face'])
+
+        # Keyword matches follow short name matches
+        matches = index.find('', 10)
+        self.assertEqual([match.emoji for match in matches],
+                         ['🐈', '🐱', '😀'])
+
+        matches = index.find('ha', 10)
+        self.assertEqual([match.emoji for match in matches], ['🐱', '😀'])
+        self.assertEqual({match.keyword for match in matches}, {'happy'})
+
+        self.assertEqual(index.find('dog', 10), [])
+        self.assertEqual(len(index.find('', 2)), 2)
+
+    def test_lazy_loading(self) -> None:
+        get_emoji_index.cache_clear()
+        emoji_data_gtk.get_emoji_data.cache_clear()
+
+        with patch.object(emoji_data_gtk, 'load_emoji_data',
+                          return_value=EMOJI_DATA) as load:
+            self.assertEqual(load.call_count, 0)
+
+            index = get_emoji_index()
+            self.assertEqual(load.call_count, 1)
+            self.assertEqual(index.find('pe', 10)[0].emoji, '🐈')
+
+            # The data is loaded and indexed only once
+            self.assertIs(get_emoji_index(), index)
+            self.assertEqual(load.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock
+
+from gajim.common import app
+from gajim.common.settings import Settings
+
+from gajim.gtk.control import ChatControl
+
+
+def _get_adjustment() -> MagicMock:
+    # Scrolled to the top of a conversation with a scrollbar
+    adj = MagicMock()
+    adj.get_upper = MagicMock(return_value=1000)
+    adj.get_page_size = MagicMock(return_value=100)
+    adj.get_value = MagicMock(return_value=0)
+    return adj
+
+
+class Test(unittest.TestCase):
+    def setUp(self) -> None:
+        app.window = MagicMock()
+        app.settings = Settings(in_memory=True)
+        app.settings.init()
+
+        app.storage.events = MagicMock()
+        app.storage.events.load = MagicMock(return_value=[])
+
+        self._control = ChatControl()
+        self._control._contact = MagicMock()
+        self._view = self._control._scrolled_view
+        self._view.set_history_complete(True, False)
+
+    def test_failed_request(self) -> None:
+        # The archive calls back with None if reading failed
+        app.storage.archive = MagicMock()
+        read = app.storage.archive.get_conversation_before_after_async
+        read.side_effect = lambda *args: args[-1](None)
+
+        adj = _get_adjustment()
+        self._view._on_adj_value_changed(adj, None)
+        self.assertEqual(read.call_count, 1)
+        self.assertIsNone(self._view._requesting)
+        self.assertIsNone(self._control._history_request)
+
+        # The upper did not change, scrolling again requests history
+        self._view._on_adj_value_changed(adj, None)
+        self.assertEqual(read.call_count, 2)
+
+    def test_empty_request(self) -> None:
+        app.storage.archive = MagicMock()
+        read = app.storage.archive.get_conversation_before_after_async
+        read.side_effect = lambda *args: args[-1]([])
+
+        self._view._on_adj_value_changed(_get_adjustment(), None)
+        self.assertEqual(read.call_count, 1)
+        self.assertIsNone(self._view._requesting)
+        self.assertIsNone(self._control._history_request)
+        # There is nothing more to load before the first row
+        self.assertTrue(self._view._upper_complete)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@
 from gajim.common import app
 
 from gajim.gtk.groupchat_nick_completion import GroupChatNickCompletion
+from gajim.gtk.groupchat_nick_completion import NickIndex
 
 
 class Test(unittest.TestCase):
@@ -25,8 +26,8 @@ def test_generate_suggestions(self):
         app.get_client = MagicMock()
 
         app.storage.archive = MagicMock()
-        app.storage.archive.get_recent_muc_nicks = MagicMock(
-            return_value=['fooo'])
+        app.storage.archive.get_recent_muc_nicks_async = MagicMock(
+            side_effect=lambda _account, _jid, callback: callback({'fooo'}))
 
         gen = GroupChatNickCompletion()
         contact = MagicMock()
@@ -43,6 +44,24 @@ def test_generate_suggestions(self):
         r = gen._generate_suggestions(prefix='m')
         self.assertEqual(r, [])
 
+        # Recent nicknames are only loaded once per group chat
+        gen.switch_contact(contact)
+        app.storage.archive.get_recent_muc_nicks_async.assert_called_once()
+
+    def test_nick_index(self):
+        index = NickIndex(['Bob', 'alice', 'bobby', 'Carol'])
+        self.assertEqual(list(index.iter_prefix('bo')), ['Bob', 'bobby'])
+        self.assertEqual(list(index.iter_prefix('')),
+                         ['alice', 'Bob', 'bobby', 'Carol'])
+
+        index.add('BOBO')
+        index.add('BOBO')
+        index.remove('Bob')
+        index.remove('unknown')
+        self.assertEqual(list(index.iter_prefix('BOB')), ['bobby', 'BOBO'])
+        self.assertNotIn('Bob', index)
+        self.assertEqual(len(index), 4)
+
 
 if __name__ == '__main__':
     unittest.main()